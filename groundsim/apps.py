@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class GroundsimConfig(AppConfig):
+    name = 'groundsim'
+
+    def ready(self):
+        import groundsim.signals
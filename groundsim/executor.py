@@ -0,0 +1,34 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+
+class PoolSaturated(Exception):
+    pass
+
+# work on pool threads closes the database connections it opened, the threads
+# outlive the request that submitted it
+def call_closing_connections(p_function, *args):
+    try:
+        return p_function(*args)
+    finally:
+        close_old_connections()
+
+# Bounded pool for simulation work. Missions held by the session store live in
+# this process, so work runs on threads rather than worker processes.
+class SimulationExecutor():
+    def __init__(self, p_workers, p_queue_limit):
+        self.executor = ThreadPoolExecutor(max_workers=p_workers, thread_name_prefix="groundsim-sim")
+        self.slots = threading.BoundedSemaphore(p_workers + p_queue_limit)
+
+    # admitted work keeps its slot until it finishes, even if the request is gone
+    async def run(self, p_function, *args, p_admit=True):
+        if p_admit and not self.slots.acquire(blocking=False):
+            raise PoolSaturated()
+        future = self.executor.submit(call_closing_connections, p_function, *args)
+        if p_admit:
+            future.add_done_callback(lambda x: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+SimulationPool = SimulationExecutor(settings.SIMULATION_POOL_WORKERS, settings.SIMULATION_POOL_QUEUE)
@@ -0,0 +1,138 @@
+import os
+import csv
+import sys
+import json
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from groundsim.mse import core_api
+from groundsim.mse.core_api import create_mission_instance, simulate_mission_steps, execute_mission_action
+from groundsim.mse.core_sim import CMSE_SceEng
+from groundsim.mse.core_tlm import TELEMETRY_CHANNELS, CHANNEL_NAMES
+from groundsim.mse.lib_splice import OBJECT_EXTENSION
+
+# Manifest format:
+# {
+#   "missions": [
+#     {
+#       "name": "student_01",
+#       "scenario_id": 1,                    # 0 for a free mission
+#       "norad_id": 44878,                   # free missions only
+#       "start_date": "2020,11,28,20,26,16", # free missions only
+#       "scripts": ["scripts/task_1.splc"],  # relative to the manifest file, .splc or .splb
+#       "actions": [[395, "take_photo"]],    # elapsed seconds, action type
+#       "duration": 400,
+#       "step": 5
+#     }
+#   ]
+# }
+DEFAULT_STEP = 5
+RESULT_COLUMNS = ["name", "score", "points_to_win", "completed", "elapsed", "wall_time", "error"]
+
+# .splb objects are passed on as they are, load_user_task decodes them
+def read_script_file(p_filename):
+    if p_filename.endswith(OBJECT_EXTENSION):
+        with open(p_filename, "rb") as f:
+            return f.read()
+    with open(p_filename, "r") as f:
+        data = f.read().split("\n")
+    return [x for x in data if len(x.strip())>0]
+
+def parse_start_date(p_str_date):
+    split_date = [int(x) for x in p_str_date.split(',')]
+    return datetime(split_date[0], split_date[1], split_date[2], split_date[3], split_date[4], split_date[5])
+
+# runs in the parent process, all database reads happen here. A job that
+# cannot be prepared keeps its error and is reported without running.
+def prepare_mission_job(p_config, p_base_dir):
+    job = {"name": p_config.get("name", ""), "error": ""}
+    try:
+        scenario_id = p_config.get("scenario_id", 0)
+        if scenario_id == 0:
+            start_date = parse_start_date(p_config["start_date"])
+        else:
+            start_date = None
+        job["mission"] = create_mission_instance(p_config.get("norad_id", 0), scenario_id, start_date)
+        job["scripts"] = [read_script_file(os.path.join(p_base_dir, x)) for x in p_config.get("scripts", [])]
+        job["actions"] = sorted(p_config.get("actions", []), key=lambda x: x[0])
+        job["duration"] = p_config["duration"]
+        job["step"] = p_config.get("step", DEFAULT_STEP)
+    except Exception as e:
+        job["error"] = "%s: %s" % (type(e).__name__, e)
+    return job
+
+# headless missions keep no telemetry history, workers do not spill it to disk
+def init_worker():
+    core_api.SatelliteSimulator.telemetry_store = None
+
+def run_mission_job(p_job):
+    sce_sim = CMSE_SceEng()
+    result = {"name": p_job["name"], "elapsed": 0, "error": p_job["error"]}
+    if len(result["error"])>0:
+        result.update({"score": 0, "points_to_win": 0, "completed": False, "wall_time": 0})
+        return result
+    mission = p_job["mission"]
+    start_time = time.time()
+    try:
+        for item in p_job["scripts"]:
+            mission = sce_sim.load_obdh_program(mission, item)
+        actions = list(p_job["actions"])
+        elapsed = 0
+        while elapsed < p_job["duration"]:
+            step = min(p_job["step"], p_job["duration"] - elapsed)
+            mission = simulate_mission_steps(mission, step)
+            elapsed = elapsed + step
+            while len(actions)>0 and actions[0][0] <= elapsed:
+                mission = execute_mission_action(mission, actions.pop(0)[1])
+            # actions taken on the last step are scored as well
+            if elapsed >= p_job["duration"]:
+                mission["scenario"] = sce_sim.evaluate_progress(mission)
+        result["elapsed"] = elapsed
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+    result["wall_time"] = round(time.time() - start_time, 3)
+    result["score"] = mission["scenario"]["progress"]
+    result["points_to_win"] = mission["scenario"].get("points_to_win", 0)
+    result["completed"] = result["points_to_win"] > 0 and result["score"] >= result["points_to_win"]
+    telemetry = mission["satellite"]["telemetry"]
+    for i in range(0, len(TELEMETRY_CHANNELS)):
+        result[CHANNEL_NAMES[i]] = telemetry[TELEMETRY_CHANNELS[i][0]][TELEMETRY_CHANNELS[i][1]]
+    return result
+
+def write_results(p_results, p_stream):
+    writer = csv.DictWriter(p_stream, fieldnames=RESULT_COLUMNS + CHANNEL_NAMES)
+    writer.writeheader()
+    for item in p_results:
+        writer.writerow(item)
+
+class Command(BaseCommand):
+    help = 'Run a manifest of missions headless across a process pool and write a results table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', type=str)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--output', type=str, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['manifest'], "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError('Unable to read manifest: %s' % e)
+        base_dir = os.path.dirname(os.path.abspath(options['manifest']))
+        jobs = [prepare_mission_job(x, base_dir) for x in manifest["missions"]]
+        self.stderr.write('Running %s missions on %s workers...' % (len(jobs), options['workers']))
+        start_time = time.time()
+        # forked workers must not share the parent database connection
+        connections.close_all()
+        with Pool(processes=options['workers'], initializer=init_worker) as pool:
+            results = pool.map(run_mission_job, jobs, chunksize=1)
+        if options['output'] is None:
+            write_results(results, sys.stdout)
+        else:
+            with open(options['output'], "w", newline="") as f:
+                write_results(results, f)
+        failed = len([x for x in results if len(x["error"])>0])
+        self.stderr.write(self.style.SUCCESS('Finished %s missions (%s failed) in %.1f seconds' % (len(results), failed, time.time() - start_time)))
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-19 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groundsim', '0010_satelliteorbittrack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissionSession',
+            fields=[
+                ('mission_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('payload', models.BinaryField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2 on 2026-10-19 13:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groundsim', '0011_missionsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissionBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='satelliteinstance',
+            name='geometry_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='groundsim.missionblob'),
+        ),
+        migrations.AddField(
+            model_name='satelliteinstance',
+            name='instruments_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='groundsim.missionblob'),
+        ),
+        migrations.AddField(
+            model_name='satelliteinstance',
+            name='subsystems_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='groundsim.missionblob'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groundsim', '0012_missionblob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='missioneventlog',
+            index=models.Index(fields=['mission_ref', 'timestamp', 'id'], name='mission_log_time_idx'),
+        ),
+    ]
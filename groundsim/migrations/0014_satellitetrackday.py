@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-19 14:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groundsim', '0013_missioneventlog_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SatelliteTrackDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('step', models.IntegerField(default=5)),
+                ('samples', models.IntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('satellite_ref', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='groundsim.satellite')),
+            ],
+            options={
+                'unique_together': {('satellite_ref', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-19 16:40
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_catalog_version(apps, schema_editor):
+    CatalogVersion = apps.get_model('groundsim', 'CatalogVersion')
+    CatalogVersion.objects.get_or_create(name='catalog', defaults={'version': 0, 'modified': timezone.now().replace(microsecond=0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groundsim', '0014_satellitetrackday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('version', models.IntegerField(default=0)),
+                ('modified', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
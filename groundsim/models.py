@@ -11,11 +11,19 @@ class Satellite(models.Model):
     config_geometry = models.CharField(blank=True, max_length=4096)
     config_instrument = models.CharField(blank=True, max_length=4096)
 
+# content-addressed JSON of a saved mission section, shared between missions
+class MissionBlob(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)
+    content = models.TextField()
+
 class SatelliteInstance(models.Model):
     satellite_id = models.IntegerField(default=0) # should be a primary key?
     geometry = models.CharField(blank=True, max_length=4096)
     subsystems = models.CharField(blank=True, max_length=4096)
     instruments = models.CharField(blank=True, max_length=4096)
+    geometry_ref = models.ForeignKey(MissionBlob, on_delete=models.PROTECT, null=True, related_name='+')
+    subsystems_ref = models.ForeignKey(MissionBlob, on_delete=models.PROTECT, null=True, related_name='+')
+    instruments_ref = models.ForeignKey(MissionBlob, on_delete=models.PROTECT, null=True, related_name='+')
 
 class SatelliteOrbitTrack(models.Model):
     satellite_ref = models.ForeignKey(Satellite, on_delete=models.CASCADE, null=True)
@@ -24,6 +32,18 @@ class SatelliteOrbitTrack(models.Model):
     longitude = models.FloatField(null=True, blank=True)
     altitude = models.FloatField(null=True, blank=True)
 
+# one day of a satellite orbit track, stored as .npy column files in TRACK_DIR
+class SatelliteTrackDay(models.Model):
+    satellite_ref = models.ForeignKey(Satellite, on_delete=models.CASCADE)
+    day = models.DateField()
+    step = models.IntegerField(default=5)
+    samples = models.IntegerField(default=0)
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+
+    class Meta:
+        unique_together = [['satellite_ref', 'day']]
+
 class UserInstance(models.Model):
     user = models.CharField(max_length=128, null=True)
     email = models.CharField(max_length=128, null=True, unique=True)
@@ -52,6 +72,24 @@ class MissionEventLog(models.Model):
    timestamp = models.DateTimeField(null=True, blank=True)
    message = models.CharField(blank=True, max_length=255)
 
+   # logs are read per mission in (timestamp, id) order, see get_mission_logs
+   class Meta:
+       indexes = [
+           models.Index(fields=['mission_ref', 'timestamp', 'id'], name='mission_log_time_idx'),
+       ]
+
+# server-side mission state, spilled from the in-memory session store
+class MissionSession(models.Model):
+    mission_id = models.CharField(max_length=32, primary_key=True)
+    payload = models.BinaryField()
+    updated = models.DateTimeField(auto_now=True)
+
+# catalog version shared by all server and manage.py processes, bumped by the
+# satellite and scenario signals, see CMSE_CatalogCache
+class CatalogVersion(models.Model):
+    name = models.CharField(max_length=32, primary_key=True)
+    version = models.IntegerField(default=0)
+    modified = models.DateTimeField()
 
 
 admin.site.register(Satellite)
@@ -61,3 +99,7 @@ admin.site.register(UserInstance)
 admin.site.register(MissionScenario)
 admin.site.register(MissionEventLog)
 admin.site.register(SatelliteOrbitTrack)
+admin.site.register(SatelliteTrackDay)
+admin.site.register(MissionSession)
+admin.site.register(MissionBlob)
+admin.site.register(CatalogVersion)
@@ -1,16 +1,34 @@
 import json
+import copy
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import secrets
 from hashlib import sha256
+from django.conf import settings
+from django.db import transaction
 from groundsim.models import (
     Satellite,
     SatelliteInstance,
     MissionInstance,
     MissionEventLog,
     MissionScenario,
+    MissionBlob,
     UserInstance
 )
 from groundsim.mse.core_sim import CMSE_Env, CMSE_Sat, CMSE_SceEng
+from groundsim.mse.core_tlm import CMSE_TlmStore
+from groundsim.executor import call_closing_connections
+from groundsim.mse.core_ses import CMSE_SessionStore
+from groundsim.mse.core_cat import CatalogCache
+from groundsim.mse.core_trk import CMSE_TrackStore
+from groundsim.mse.lib_delta import make_delta
+from groundsim.mse.sys_obdh import export_vm_subsystems, import_vm_subsystems, has_batch_lanes, get_vm_profile, set_vm_profiling, reset_vm_profile, drain_vm_log, set_vm_log_level
+from groundsim.mse.lib_astro import get_orbital_data
 from groundsim.mse.lib_utils import datetime_to_mission_timer, mission_timer_to_datetime
 
+# every n-th step version is sent as a full mission instead of a delta
+DELTA_KEYFRAME_INTERVAL = 100
+
 ################################################################################
 ############################# DATABASE I/O ACTIONS #############################
 ################################################################################
@@ -45,33 +63,11 @@ def get_satellite_list():
     return resp_sats
 
 def get_tle_data(norad_id):
-    satellite_record = Satellite.objects.get(norad_id=norad_id)
-    return {
-        "line_1":satellite_record.satellite_tle1,
-        "line_2":satellite_record.satellite_tle2
-    }
+    return CatalogCache.get_tle_data(norad_id)
 
 def get_scenario_data(p_scenario_id):
     try:
-        scenario_obj = MissionScenario.objects.get(scenario_id=p_scenario_id)
-        scenario_data = {
-            "scenario_id":scenario_obj.scenario_id,
-            "objectives":[],
-            "progress":0,
-            "fp_precision":0.001,
-            "start_date":{
-                "year":scenario_obj.start_date.year,
-                "month":scenario_obj.start_date.month,
-                "day":scenario_obj.start_date.day,
-                "hour":scenario_obj.start_date.hour,
-                "min":scenario_obj.start_date.minute,
-                "sec": scenario_obj.start_date.second
-            },
-            "mission_name": scenario_obj.mission_name,
-            "description": scenario_obj.description,
-            "initial_setup": json.loads(scenario_obj.initial_setup),
-            "objectives": json.loads(scenario_obj.objectives)
-        }
+        scenario_data = CatalogCache.get_scenario_data(p_scenario_id)
     except MissionScenario.DoesNotExist:
         scenario_data =  {
             "scenario_id":0,
@@ -81,31 +77,71 @@ def get_scenario_data(p_scenario_id):
 
 def get_satellite_config(p_norad_id):
     try:
-        satellite_record = Satellite.objects.get(norad_id=p_norad_id)
-        satellite_obj = {
-            "config_instruments":json.loads(satellite_record.config_instrument)
-        }
+        satellite_obj = CatalogCache.get_satellite_config(p_norad_id)
     except Satellite.DoesNotExist:
         satellite_obj = None
     return satellite_obj
 
-def get_mission_logs(hash_id):
-    # load all messages for a given mission
-    json_data = {"status":"ok", "event_logs":[]}
-    db_records = MissionEventLog.objects.get(mission_hash=hash_id)
-    for item in db_records:
-        json_data["event_logs"].append([item.timestamp, item.message])
+# mission logs are paged by a (timestamp, id) cursor, never by offset
+LOG_PAGE_SIZE = 100
+LOG_PAGE_MAX = 1000
+LOG_EXPORT_CHUNK = 2000
+
+# cursors are URL safe: microseconds since the epoch and record id
+LOG_CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_log_cursor(p_record):
+    return "%i_%i" % ((p_record.timestamp - LOG_CURSOR_EPOCH) // timedelta(microseconds=1), p_record.id)
+
+def decode_log_cursor(p_cursor):
+    timestamp, record_id = p_cursor.split("_")
+    return LOG_CURSOR_EPOCH + timedelta(microseconds=int(timestamp)), int(record_id)
+
+def query_mission_logs(hash_id, p_start=None, p_end=None, p_text=None, p_after=None):
+    records = MissionEventLog.objects.filter(mission_ref_id=hash_id, timestamp__isnull=False)
+    if p_start is not None:
+        records = records.filter(timestamp__gte=p_start)
+    if p_end is not None:
+        records = records.filter(timestamp__lte=p_end)
+    if p_text is not None:
+        records = records.filter(message__icontains=p_text)
+    if p_after is not None:
+        timestamp, record_id = decode_log_cursor(p_after)
+        records = records.filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, id__lte=record_id)
+    return records.order_by("timestamp", "id")
+
+def get_mission_logs(hash_id, p_start=None, p_end=None, p_text=None, p_after=None, p_limit=LOG_PAGE_SIZE):
+    # load one page of messages for a given mission
+    p_limit = max(1, min(p_limit, LOG_PAGE_MAX))
+    records = list(query_mission_logs(hash_id, p_start, p_end, p_text, p_after)[:p_limit+1])
+    json_data = {"status":"ok", "event_logs":[], "next":None}
+    for item in records[:p_limit]:
+        json_data["event_logs"].append([item.timestamp.isoformat(), item.message])
+    if len(records) > p_limit:
+        json_data["next"] = encode_log_cursor(records[p_limit-1])
     return json_data
 
-def write_mission_logs(p_environment):
-    if p_environment["hash_id"] is not None:
-        hash_id = p_environment["hash_id"]
-        mission_record = MissionInstance.objects.get(mission_hash=hash_id)
-        event_record = MissionEventLog()
-        event_record.mission_ref = mission_record
-        event_record.timestamp = mission_timer_to_datetime(p_environment["current_date"])
-        event_record.message = p_event_string
-        event_record.save()
+# yields lists of records, each chunk is a separate keyset query
+def export_mission_logs(hash_id, p_start=None, p_end=None, p_text=None):
+    after = None
+    while True:
+        records = list(query_mission_logs(hash_id, p_start, p_end, p_text, after)[:LOG_EXPORT_CHUNK])
+        if len(records) == 0:
+            return
+        yield records
+        if len(records) < LOG_EXPORT_CHUNK:
+            return
+        after = encode_log_cursor(records[-1])
+
+# p_events are the log_buffer entries added during the last step, plus the
+# OBDH messages drained from the Splice VM log ring
+def write_mission_logs(p_environment, p_events=None):
+    if p_environment["hash_id"] is not None and p_events:
+        timestamp = mission_timer_to_datetime(p_environment["current_date"])
+        MissionEventLog.objects.bulk_create([
+            MissionEventLog(mission_ref_id=p_environment["hash_id"], timestamp=timestamp, message=item[1][:255])
+            for item in p_events
+        ])
     if len(p_environment["event_logs"])>10:
         p_environment["event_logs"].pop(0)
     return p_environment
@@ -154,65 +190,290 @@ def create_mission_instance(p_norad_id, p_scenario_id, p_start_date):
     mission["scenario"] = ScenarioEngine.initialize_scenario(mission, scenario_data)
     return mission
 
-def simulate_mission_steps(p_mission, steps):
-    p_mission["environment"] = EnvironmentSimulator.evolve_environment(p_mission["environment"], steps)
+# OBDH log messages go to the event log table only, not to the mission payload
+def get_obdh_log_events(p_mission):
+    splice_vm, messages, dropped = drain_vm_log(p_mission["satellite"]["subsystems"]["obdh"]["splice_vm"])
+    events = [[None, "OBDH %s" % x] for x in messages]
+    if dropped>0:
+        events.append([None, "OBDH %i log messages dropped" % dropped])
+    return events
+
+# log_count counts every event logged, the events of a step are found by their
+# position from the end of the log buffer, which keeps the last 10 only
+def get_new_events(p_environment, p_log_count):
+    count = p_environment.get("log_count", 0) - p_log_count
+    if count<=0:
+        return []
+    return p_environment["log_buffer"][-count:]
+
+def evolve_mission(p_mission, steps, p_orbital_data=None):
+    p_mission["environment"] = EnvironmentSimulator.evolve_environment(p_mission["environment"], steps, p_orbital_data)
     p_mission["satellite"] = SatelliteSimulator.evolve_satellite(p_mission, steps)
+    return p_mission
+
+def simulate_mission_steps(p_mission, steps, p_orbital_data=None):
+    log_count = p_mission["environment"].get("log_count", 0)
+    p_mission = evolve_mission(p_mission, steps, p_orbital_data)
+    return finish_mission_steps(p_mission, get_new_events(p_mission["environment"], log_count))
+
+# p_events are the log buffer entries added by the step
+def finish_mission_steps(p_mission, p_events):
+    p_mission = mark_sections_dirty(p_mission, ["subsystems", "instruments"])
     p_mission["scenario"] = ScenarioEngine.evaluate_progress(p_mission)
-    p_mission["environment"] = write_mission_logs(p_mission["environment"])
+    p_mission["environment"] = write_mission_logs(p_mission["environment"], p_events + get_obdh_log_events(p_mission))
+    p_mission["environment"]["step_version"] = p_mission["environment"].get("step_version", 0) + 1
+    return p_mission
+
+# missions with the same TLE and date after the step share one propagation
+def get_orbital_key(p_environment, p_steps):
+    date = EnvironmentSimulator.increment_mission_timer(p_environment["current_date"], p_steps)
+    tle_data = p_environment["tle_data"]
+    return (tle_data["line_1"], tle_data["line_2"], json.dumps(date, sort_keys=True))
+
+def get_step_orbital_data(p_environment, p_steps):
+    date = EnvironmentSimulator.increment_mission_timer(p_environment["current_date"], p_steps)
+    return get_orbital_data(p_environment["tle_data"], date)
+
+# lockstep only pays off when some program runs in enough VMs to be batched,
+# missions that cannot be inspected are left to the per-mission path
+def use_mission_lockstep(p_missions):
+    if not settings.SIMULATION_BATCH_VM:
+        return False
+    try:
+        return has_batch_lanes([x["satellite"]["subsystems"]["obdh"]["splice_vm"] for x in p_missions])
+    except Exception:
+        return False
+
+# returns the stepped mission, or the exception raised while stepping it
+def simulate_mission_batch(p_missions, p_steps):
+    orbital_keys = [get_orbital_key(x["environment"], p_steps) for x in p_missions]
+    propagations = {}
+    for i in range(0, len(p_missions)):
+        if orbital_keys[i] not in propagations:
+            propagations[orbital_keys[i]] = BatchPool.submit(call_closing_connections, get_step_orbital_data, p_missions[i]["environment"], p_steps)
+    if use_mission_lockstep(p_missions):
+        return simulate_mission_lockstep(p_missions, p_steps, [propagations[x] for x in orbital_keys])
+    steps = []
+    for i in range(0, len(p_missions)):
+        try:
+            orbital_data = propagations[orbital_keys[i]].result()
+        except Exception as e:
+            steps.append(e)
+            continue
+        steps.append(BatchPool.submit(call_closing_connections, simulate_mission_steps, p_missions[i], p_steps, orbital_data))
+    results = []
+    for item in steps:
+        if isinstance(item, Exception):
+            results.append(item)
+            continue
+        try:
+            results.append(item.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+# Satellites are stepped together in this thread, so Splice VMs running the
+# same program share vm_execute_batch. p_propagations are the orbital data
+# futures, one per mission.
+def simulate_mission_lockstep(p_missions, p_steps, p_propagations):
+    results = [None] * len(p_missions)
+    log_counts = [None] * len(p_missions)
+    for i in range(0, len(p_missions)):
+        try:
+            log_counts[i] = p_missions[i]["environment"].get("log_count", 0)
+            p_missions[i]["environment"] = EnvironmentSimulator.evolve_environment(p_missions[i]["environment"], p_steps, p_propagations[i].result())
+        except Exception as e:
+            results[i] = e
+    running = [i for i in range(0, len(p_missions)) if results[i] is None]
+    errors = SatelliteSimulator.evolve_satellites([p_missions[i] for i in running], p_steps)
+    for i, error in zip(running, errors):
+        if error is not None:
+            results[i] = error
+            continue
+        try:
+            results[i] = finish_mission_steps(p_missions[i], get_new_events(p_missions[i]["environment"], log_counts[i]))
+        except Exception as e:
+            results[i] = e
+    return results
+
+# p_base is the mission as held by the client at version p_since
+def get_step_response(p_base, p_mission, p_since):
+    version = p_mission["environment"]["step_version"]
+    base_version = p_base["environment"].get("step_version", 0)
+    if p_since != base_version or version % DELTA_KEYFRAME_INTERVAL == 0:
+        return {"status":"ok", "keyframe":True, "version":version, "mission_instance":p_mission}
+    return {
+        "status":"ok",
+        "keyframe":False,
+        "base_version":base_version,
+        "version":version,
+        "delta":make_delta(p_base, p_mission)
+    }
+
+
+# yields a start frame at once, then one frame per simulated interval
+def stream_mission_steps(p_mission, p_steps, p_interval, p_send_mission=True):
+    environment = p_mission["environment"]
+    yield {
+        "type":"start",
+        "version":environment.get("step_version", 0),
+        "elapsed_timer":environment["elapsed_timer"],
+        "steps":p_steps
+    }
+    # the request is one step: the scenario, event log and version are only
+    # updated once, after the last interval
+    events = []
+    remaining = p_steps
+    while remaining > 0:
+        step = min(p_interval, remaining)
+        telemetry = copy.deepcopy(p_mission["satellite"]["telemetry"])
+        log_count = p_mission["environment"].get("log_count", 0)
+        p_mission = evolve_mission(p_mission, step)
+        remaining = remaining - step
+        step_events = get_new_events(p_mission["environment"], log_count)
+        events.extend(step_events)
+        yield {
+            "type":"progress",
+            "elapsed_timer":p_mission["environment"]["elapsed_timer"],
+            "remaining":remaining,
+            "ground_track":p_mission["environment"]["ground_track"],
+            "telemetry":make_delta(telemetry, p_mission["satellite"]["telemetry"]),
+            "events":step_events
+        }
+    p_mission = finish_mission_steps(p_mission, events)
+    frame = {"type":"end", "version":p_mission["environment"]["step_version"]}
+    if p_send_mission:
+        frame["mission_instance"] = p_mission
+    yield frame
+
+# Satellite sections are stored as shared blobs, written only when changed.
+# Code changing a section marks it in environment["dirty_sections"], a mission
+# without marks is treated as changed everywhere. Marks are only trusted on
+# missions held by the session store, for client-posted missions all sections
+# are hashed. A section is written when its digest differs from the blob the
+# stored satellite record points to.
+SAVED_SECTIONS = ["geometry", "subsystems", "instruments"]
+
+def mark_sections_dirty(p_mission, p_sections):
+    dirty_sections = p_mission["environment"].get("dirty_sections", None)
+    if dirty_sections is not None:
+        p_mission["environment"]["dirty_sections"] = [x for x in SAVED_SECTIONS if x in dirty_sections or x in p_sections]
     return p_mission
 
+def get_section_digest(p_section):
+    content = json.dumps(p_section, sort_keys=True, separators=(',', ':'))
+    return sha256(content.encode('utf-8')).hexdigest(), content
+
+# Splice VMs are saved in their exported state format, see sys_obdh
+def get_saved_section(p_satellite, p_name):
+    if p_name == "subsystems":
+        return export_vm_subsystems(p_satellite[p_name])
+    return p_satellite[p_name]
+
+def write_section_blob(p_digest, p_content):
+    record, created = MissionBlob.objects.get_or_create(digest=p_digest, defaults={"content":p_content})
+    return record
+
+# hash ids are random, knowing a mission id does not give its saved record
+def get_mission_hash():
+    return secrets.token_hex(32)
 
 # check if mission record already exists before saving
-def save_mission(p_mission, p_user, p_email):
-    if p_mission["environment"]["user"] is None and p_mission["environment"]["email"] is None:
-        hash_id = sha256(json.dumps(p_mission).encode('utf-8')).hexdigest()
-        user_record = write_user(p_user, p_email)
-        user_record.save()
-        mission_record = MissionInstance()
-        satellite_record = SatelliteInstance()
-        p_mission["environment"]["user"] = p_user
-        p_mission["environment"]["email"] = p_email
-        p_mission["environment"]["hash_id"] = hash_id
-        mission_record.mission_hash = hash_id
-        mission_record.user_ref = user_record
+def save_mission(p_mission, p_user, p_email, p_trusted=False):
+    environment = p_mission["environment"]
+    dirty_names = SAVED_SECTIONS
+    if p_trusted and environment.get("dirty_sections", None) is not None:
+        dirty_names = environment["dirty_sections"]
+    with transaction.atomic():
+        if environment["user"] is None and environment["email"] is None:
+            hash_id = get_mission_hash()
+            mission_record = MissionInstance(mission_hash=hash_id)
+            mission_record.user_ref = write_user(p_user, p_email)
+            mission_record.scenario_ref = MissionScenario.objects.filter(scenario_id=p_mission["scenario"]["scenario_id"]).first()
+            satellite_record = None
+        else:
+            hash_id = environment["hash_id"]
+            mission_record = MissionInstance.objects.select_related("satellite_ref").get(mission_hash=hash_id)
+            satellite_record = mission_record.satellite_ref
+        if satellite_record is None:
+            satellite_record = SatelliteInstance()
+            dirty_names = SAVED_SECTIONS
+        changed = False
+        for name in dirty_names:
+            digest, content = get_section_digest(get_saved_section(p_mission["satellite"], name))
+            if getattr(satellite_record, name + "_ref_id") != digest:
+                setattr(satellite_record, name + "_ref", write_section_blob(digest, content))
+                changed = True
+        if changed:
+            satellite_record.satellite_id = environment["norad_id"]
+            satellite_record.save()
+        mission_record.norad_id = environment["norad_id"]
+        mission_record.start_date = mission_timer_to_datetime(environment["start_date"])
+        mission_record.mission_timer = environment["elapsed_timer"]
+        mission_record.tle_line_1 = environment["tle_data"]["line_1"]
+        mission_record.tle_line_2 = environment["tle_data"]["line_2"]
+        mission_record.satellite_ref = satellite_record
         mission_record.save()
-    else:
-        hash_id = p_mission["environment"]["hash_id"]
-        mission_record = MissionInstance.objects.get(
-            mission_hash=hash_id
-        )
-        satellite_record = mission_record.satellite_ref
-        # hash_id = sha256(json.dumps(p_mission).encode('utf-8')).hexdigest()
-    satellite_record.satellite_id = p_mission["environment"]["norad_id"]
-    satellite_record.geometry = json.dumps(p_mission["satellite"]["geometry"])
-    satellite_record.subsystems = json.dumps(p_mission["satellite"]["subsystems"])
-    satellite_record.instruments = json.dumps(p_mission["satellite"]["instruments"])
-    satellite_record.save()
-    mission_record.norad_id = p_mission["environment"]["norad_id"]
-    mission_record.start_date = mission_timer_to_datetime(p_mission["environment"]["start_date"])
-    mission_record.mission_timer = p_mission["environment"]["elapsed_timer"]
-    mission_record.tle_line_1 = p_mission["environment"]["tle_data"]["line_1"]
-    mission_record.tle_line_2 = p_mission["environment"]["tle_data"]["line_2"]
-    mission_record.satellite_ref = satellite_record
-    mission_record.mission_hash = hash_id
-    mission_record.save()
+    # the mission only records what was committed
+    if environment["user"] is None and environment["email"] is None:
+        environment["user"] = p_user
+        environment["email"] = p_email
+        environment["hash_id"] = hash_id
+    environment.pop("saved_sections", None)
+    environment["dirty_sections"] = []
     return {"status":"ok", "mission_instance":p_mission}
 
 def load_mission(hash_id):
     mission = {}
     mission_record = MissionInstance.objects.get(mission_hash=hash_id)
     tle_data = get_tle_data(mission_record.norad_id)
-    scenario_data = get_scenario_data(mission_record.scenario_ref.scenario_id)
+    scenario_id = mission_record.scenario_ref.scenario_id if mission_record.scenario_ref is not None else 0
+    scenario_data = get_scenario_data(scenario_id)
     mission["environment"] = EnvironmentSimulator.create_mission_environment(mission_record.norad_id, mission_record.start_date, tle_data)
     mission["satellite"] = SatelliteSimulator.load_mission_satellite(mission_record.satellite_ref)
     mission["scenario"] = ScenarioEngine.initialize_scenario(mission, scenario_data)
     return mission
 
+# missions posted by clients hold exported or JSON decoded Splice VMs
+def import_posted_mission(p_mission):
+    if isinstance(p_mission, dict) and "satellite" in p_mission:
+        p_mission["satellite"]["subsystems"] = import_vm_subsystems(p_mission["satellite"]["subsystems"])
+    return p_mission
+
 def execute_mission_action(p_mission, p_action):
     p_mission = ScenarioEngine.execute_mission_action(p_mission, p_action)
-    return p_mission
+    return mark_sections_dirty(p_mission, SAVED_SECTIONS)
+
+def get_orbit_track(p_norad_id, p_start, p_end, p_points):
+    return TrackStore.query(p_norad_id, p_start, p_end, p_points)
+
+def get_telemetry_history(p_mission_id, p_start, p_end, p_points, p_method, p_channels=None):
+    return TelemetryStore.query(p_mission_id, p_start, p_end, p_points, p_method, p_channels)
+
+# p_level None only reads the log level and messages
+def set_mission_log_level(p_mission, p_level=None):
+    splice_vm = p_mission["satellite"]["subsystems"]["obdh"]["splice_vm"]
+    if p_level is not None:
+        splice_vm = set_vm_log_level(splice_vm, p_level)
+        p_mission = mark_sections_dirty(p_mission, ["subsystems"])
+    return {"status":"ok", "log_level":splice_vm["VFLAGS"]["VM_LOG_LEVEL"], "logs":list(splice_vm["VBUS"]["INST_LOGS"]["OUT"])}
+
+# p_enabled and p_reset are applied before the profile is read, None keeps it as is
+def get_mission_profile(p_mission, p_enabled=None, p_reset=False):
+    splice_vm = p_mission["satellite"]["subsystems"]["obdh"]["splice_vm"]
+    if p_reset:
+        splice_vm = reset_vm_profile(splice_vm)
+    if p_enabled is not None:
+        splice_vm = set_vm_profiling(splice_vm, p_enabled)
+    if p_reset or p_enabled is not None:
+        p_mission = mark_sections_dirty(p_mission, ["subsystems"])
+    return {"status":"ok", "profile":get_vm_profile(splice_vm)}
 
 # Initialiaze on start
+TelemetryStore = CMSE_TlmStore(settings.TELEMETRY_DIR)
+TrackStore = CMSE_TrackStore(settings.TRACK_DIR)
+SessionStore = CMSE_SessionStore(settings.MISSION_SESSION_CAPACITY, settings.MISSION_SESSION_SPILL_STEPS)
+BatchPool = ThreadPoolExecutor(max_workers=settings.SIMULATION_POOL_WORKERS, thread_name_prefix="groundsim-batch")
 EnvironmentSimulator = CMSE_Env()
-SatelliteSimulator = CMSE_Sat()
+SatelliteSimulator = CMSE_Sat(TelemetryStore)
 ScenarioEngine = CMSE_SceEng()
@@ -0,0 +1,166 @@
+import copy
+import json
+import time
+import threading
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from groundsim.models import Satellite, MissionScenario, CatalogVersion
+
+################################################################################
+############################ CATALOG CACHE #####################################
+################################################################################
+# Read-through cache of satellite and scenario rows, parsed once. Callers get
+# deep copies, since scenario data is modified in place when a mission is
+# initialized. The model signals in groundsim/signals.py bump the catalog
+# version row in the same transaction as the change. Reads check that row at
+# most once per sync interval, so writes from other processes (init_db, admin)
+# drop the cached entries too, changes made here are seen at once. The version
+# doubles as the catalog version used for response caching.
+CATALOG_VERSION_NAME = "catalog"
+# seconds between two checks of the catalog version
+DEFAULT_SYNC_INTERVAL = 1
+
+class CMSE_CatalogCache():
+    def __init__(self, p_sync_interval=DEFAULT_SYNC_INTERVAL):
+        self.satellites = {}
+        self.scenarios = {}
+        self.responses = {}
+        self.generation = None
+        self.sync_interval = p_sync_interval
+        self.state = None
+        self.synced = 0
+        self.lock = threading.Lock()
+
+    # reads the shared catalog version, entries cached for another version are
+    # dropped, returns the version and the time of the last catalog change
+    def sync(self):
+        with self.lock:
+            if self.state is not None and time.monotonic() - self.synced < self.sync_interval:
+                return self.state
+        row = CatalogVersion.objects.filter(name=CATALOG_VERSION_NAME).values_list("version", "modified").first()
+        if row is None:
+            row = (0, None)
+        with self.lock:
+            if row[0] != self.generation:
+                self.satellites.clear()
+                self.scenarios.clear()
+                self.responses.clear()
+                self.generation = row[0]
+            self.state = row
+            self.synced = time.monotonic()
+        return row
+
+    # rows read before an invalidation are not stored
+    def store(self, p_table, p_key, p_value, p_generation):
+        with self.lock:
+            if p_generation == self.generation:
+                p_table[p_key] = p_value
+
+    # entries are never modified once stored, returns the entry and the
+    # catalog version it was read for
+    def get_satellite_entry(self, p_norad_id):
+        generation = self.sync()[0]
+        with self.lock:
+            entry = self.satellites.get(p_norad_id, None)
+        if entry is None:
+            record = Satellite.objects.get(norad_id=p_norad_id)
+            entry = {
+                "tle_data": {
+                    "line_1":record.satellite_tle1,
+                    "line_2":record.satellite_tle2
+                },
+                "config_instrument":record.config_instrument
+            }
+            self.store(self.satellites, p_norad_id, entry, generation)
+        return entry, generation
+
+    def get_tle_data(self, p_norad_id):
+        return copy.deepcopy(self.get_satellite_entry(p_norad_id)[0]["tle_data"])
+
+    # instrument config is parsed on first use and stored as a new entry,
+    # parse errors are not cached
+    def get_satellite_config(self, p_norad_id):
+        entry, generation = self.get_satellite_entry(p_norad_id)
+        if "config_instruments" not in entry:
+            entry = dict(entry)
+            entry["config_instruments"] = json.loads(entry["config_instrument"])
+            self.store(self.satellites, p_norad_id, entry, generation)
+        return {"config_instruments":copy.deepcopy(entry["config_instruments"])}
+
+    def get_scenario_data(self, p_scenario_id):
+        generation = self.sync()[0]
+        with self.lock:
+            scenario_data = self.scenarios.get(p_scenario_id, None)
+        if scenario_data is None:
+            scenario_obj = MissionScenario.objects.get(scenario_id=p_scenario_id)
+            scenario_data = {
+                "scenario_id":scenario_obj.scenario_id,
+                "objectives":[],
+                "progress":0,
+                "fp_precision":0.001,
+                "start_date":{
+                    "year":scenario_obj.start_date.year,
+                    "month":scenario_obj.start_date.month,
+                    "day":scenario_obj.start_date.day,
+                    "hour":scenario_obj.start_date.hour,
+                    "min":scenario_obj.start_date.minute,
+                    "sec": scenario_obj.start_date.second
+                },
+                "mission_name": scenario_obj.mission_name,
+                "description": scenario_obj.description,
+                "initial_setup": json.loads(scenario_obj.initial_setup),
+                "objectives": json.loads(scenario_obj.objectives)
+            }
+            self.store(self.scenarios, p_scenario_id, scenario_data, generation)
+        return copy.deepcopy(scenario_data)
+
+    # ETag value for catalog responses, the same in every process. The change
+    # time tells apart versions of a database that was created again.
+    def get_version_tag(self, p_state):
+        if p_state[1] is None:
+            return "%i" % p_state[0]
+        return "%i-%i" % (p_state[0], p_state[1].timestamp())
+
+    # response bodies are rebuilt once per catalog version
+    def get_response(self, p_key, p_builder):
+        generation = self.sync()[0]
+        with self.lock:
+            cached = self.responses.get(p_key, None)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        body = p_builder()
+        self.store(self.responses, p_key, [generation, body], generation)
+        return body
+
+    # runs in the transaction of the catalog change, other processes see the
+    # new version together with the changed rows
+    def bump_version(self):
+        modified = timezone.now().replace(microsecond=0)
+        updated = CatalogVersion.objects.filter(name=CATALOG_VERSION_NAME).update(version=F("version") + 1, modified=modified)
+        if updated == 0:
+            CatalogVersion.objects.get_or_create(name=CATALOG_VERSION_NAME, defaults={"version":1, "modified":modified})
+
+    # the next read checks the version again
+    def invalidate_satellite(self, p_norad_id):
+        with self.lock:
+            self.satellites.pop(p_norad_id, None)
+            self.state = None
+        self.bump_version()
+
+    def invalidate_scenario(self, p_scenario_id):
+        with self.lock:
+            self.scenarios.pop(p_scenario_id, None)
+            self.state = None
+        self.bump_version()
+
+    # drops the entries of this process only, they are read again on next use
+    def clear(self):
+        with self.lock:
+            self.satellites.clear()
+            self.scenarios.clear()
+            self.responses.clear()
+            self.generation = None
+            self.state = None
+
+CatalogCache = CMSE_CatalogCache(settings.CATALOG_SYNC_INTERVAL)
@@ -0,0 +1,176 @@
+import json
+import zlib
+import threading
+from itertools import islice
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from groundsim.models import MissionSession
+from groundsim.mse.sys_obdh import export_vm_subsystems, import_vm_subsystems
+
+# missions kept in memory, least recently used ones are spilled to the database
+DEFAULT_SESSION_CAPACITY = 512
+# checkouts of a mission between two spills to the database
+DEFAULT_SESSION_SPILL_STEPS = 20
+# mission locks are striped by id so the lock table never grows
+LOCK_STRIPES = 64
+
+################################################################################
+############################ SESSION ENCODING ##################################
+################################################################################
+# Splice VMs are spilled in their exported state format, which keeps int keys
+def encode_session(p_mission):
+    if "satellite" in p_mission:
+        p_mission = dict(p_mission)
+        p_mission["satellite"] = dict(p_mission["satellite"])
+        p_mission["satellite"]["subsystems"] = export_vm_subsystems(p_mission["satellite"]["subsystems"])
+    return zlib.compress(json.dumps(p_mission, separators=(',', ':')).encode('utf-8'))
+
+def decode_session(p_payload):
+    mission = json.loads(zlib.decompress(bytes(p_payload)).decode('utf-8'))
+    if "satellite" in mission:
+        mission["satellite"]["subsystems"] = import_vm_subsystems(mission["satellite"]["subsystems"])
+    return mission
+
+################################################################################
+############################ MISSION SESSION STORE #############################
+################################################################################
+# Missions are keyed by environment["mission_id"]. A mission is only read or
+# modified while its lock is held, see checkout(). Missions are written to the
+# database when they are added, every p_spill_steps checkouts, when they are
+# evicted and on flush(). A checkout marks its mission dirty until the next
+# spill, a failed checkout reads the mission back from its last spill.
+class CMSE_SessionStore():
+    def __init__(self, p_capacity=DEFAULT_SESSION_CAPACITY, p_spill_steps=DEFAULT_SESSION_SPILL_STEPS):
+        self.capacity = p_capacity
+        self.spill_steps = p_spill_steps
+        self.missions = OrderedDict()
+        self.dirty = {}
+        self.locks = [threading.Lock() for x in range(0, LOCK_STRIPES)]
+        self.store_lock = threading.Lock()
+
+    def get_stripe(self, p_mission_id):
+        return zlib.crc32(p_mission_id.encode('utf-8')) % LOCK_STRIPES
+
+    def get_lock(self, p_mission_id):
+        return self.locks[self.get_stripe(p_mission_id)]
+
+    def spill(self, p_mission_id, p_mission):
+        MissionSession.objects.update_or_create(
+            mission_id=p_mission_id,
+            defaults={"payload":encode_session(p_mission)}
+        )
+
+    # called with the mission lock held
+    def spill_dirty(self, p_mission_id):
+        with self.store_lock:
+            mission = self.missions.get(p_mission_id, None)
+            dirty = self.dirty.get(p_mission_id, 0)
+        if mission is not None and dirty > 0:
+            self.spill(p_mission_id, mission)
+        with self.store_lock:
+            self.dirty.pop(p_mission_id, None)
+
+    # the least recently used missions are spilled if dirty and dropped from
+    # memory. Missions whose lock is held, by this thread too, stay for now.
+    def evict(self):
+        skipped = 0
+        while True:
+            with self.store_lock:
+                if len(self.missions) - skipped <= self.capacity:
+                    return
+                mission_id = next(islice(self.missions, skipped, None))
+            lock = self.get_lock(mission_id)
+            if not lock.acquire(blocking=False):
+                skipped = skipped + 1
+                continue
+            try:
+                self.spill_dirty(mission_id)
+                with self.store_lock:
+                    self.missions.pop(mission_id, None)
+            finally:
+                lock.release()
+
+    # spills all dirty missions, e.g. on shutdown
+    def flush(self):
+        with self.store_lock:
+            mission_ids = list(self.dirty.keys())
+        for mission_id in mission_ids:
+            with self.get_lock(mission_id):
+                self.spill_dirty(mission_id)
+
+    def put(self, p_mission):
+        mission_id = p_mission["environment"]["mission_id"]
+        with self.get_lock(mission_id):
+            self.spill(mission_id, p_mission)
+            with self.store_lock:
+                self.missions[mission_id] = p_mission
+                self.missions.move_to_end(mission_id)
+                self.dirty.pop(mission_id, None)
+        self.evict()
+        return mission_id
+
+    def get(self, p_mission_id):
+        with self.store_lock:
+            if p_mission_id in self.missions:
+                self.missions.move_to_end(p_mission_id)
+                return self.missions[p_mission_id]
+        session = MissionSession.objects.filter(mission_id=p_mission_id).first()
+        if session is None:
+            return None
+        mission = decode_session(session.payload)
+        with self.store_lock:
+            self.missions[p_mission_id] = mission
+        self.evict()
+        return mission
+
+    # a checkout that raised may have left the mission half modified, it is
+    # read again from its last spilled state
+    def release(self, p_mission_id, p_mission, p_failed):
+        if p_mission is None:
+            return
+        with self.store_lock:
+            if p_failed:
+                self.missions.pop(p_mission_id, None)
+                self.dirty.pop(p_mission_id, None)
+                return
+            dirty = self.dirty.get(p_mission_id, 0) + 1
+            self.dirty[p_mission_id] = dirty
+        if dirty >= self.spill_steps:
+            self.spill_dirty(p_mission_id)
+
+    # yields the mission (None if unknown) with its lock held, the mission is
+    # marked dirty when the checkout ends
+    @contextmanager
+    def checkout(self, p_mission_id):
+        with self.get_lock(p_mission_id):
+            mission = self.get(p_mission_id)
+            try:
+                yield mission
+            except BaseException:
+                self.release(p_mission_id, mission, True)
+                raise
+            self.release(p_mission_id, mission, False)
+
+    # locks are taken once each and in stripe order, so batches cannot deadlock
+    @contextmanager
+    def checkout_many(self, p_mission_ids):
+        stripes = sorted(set([self.get_stripe(x) for x in p_mission_ids]))
+        with ExitStack() as stack:
+            for item in stripes:
+                stack.enter_context(self.locks[item])
+            missions = [self.get(x) for x in p_mission_ids]
+            try:
+                yield missions
+            except BaseException:
+                for mission_id, mission in zip(p_mission_ids, missions):
+                    self.release(mission_id, mission, True)
+                raise
+            for mission_id, mission in zip(p_mission_ids, missions):
+                self.release(mission_id, mission, False)
+
+    def discard(self, p_mission_id):
+        with self.get_lock(p_mission_id):
+            with self.store_lock:
+                self.missions.pop(p_mission_id, None)
+                self.dirty.pop(p_mission_id, None)
+            MissionSession.objects.filter(mission_id=p_mission_id).delete()
@@ -1,4 +1,5 @@
 import json
+from uuid import uuid4
 from datetime import datetime, timezone, timedelta
 from groundsim.mse.lib_utils import (
     parse_tle_lines,
@@ -9,7 +10,7 @@ from groundsim.mse.lib_utils import (
 )
 from groundsim.mse.lib_astro import get_orbital_data, time_since_periapsis
 from groundsim.mse.sys_adcs import initialize_adcs_subsystem, simulate_adcs_subsystem
-from groundsim.mse.sys_obdh import initialize_obdh_subsystem, simulate_obdh_subsystem, load_command_script
+from groundsim.mse.sys_obdh import initialize_obdh_subsystem, simulate_obdh_each, simulate_obdh_batch, load_command_script, import_vm_subsystems
 from groundsim.mse.sys_comm import initialize_comm_subsystem, simulate_comm_subsystem
 from groundsim.mse.sys_power import initialize_power_subsystem
 from groundsim.mse.sys_payload import get_imager_frame, take_imager_snapshot, initialize_payload_instruments, simulate_payload_instruments
@@ -20,6 +21,7 @@ from groundsim.mse.sys_payload import get_imager_frame, take_imager_snapshot, in
 class CMSE_Env():
     def create_mission_environment(self, p_norad_id, p_start_date, tle_data):
         environment = {}
+        environment["mission_id"] = uuid4().hex
         environment["norad_id"] = p_norad_id
         environment["current_date"] = p_start_date
         environment["start_date"] = environment["current_date"]
@@ -34,7 +36,9 @@ class CMSE_Env():
         environment["hash_id"] = None
         environment["mission_selected"] = None
         environment["log_buffer"] = []
+        environment["log_count"] = 0
         environment["event_logs"] = []
+        environment["step_version"] = 0
         return environment
 
     def increment_mission_timer(self, p_mission_timer, p_seconds):
@@ -48,6 +52,7 @@ class CMSE_Env():
         # save event  if mission exists in DB - TBD
         timestamp = mission_timer_to_str(p_environment["current_date"])
         p_environment["log_buffer"].append([timestamp, p_event_string])
+        p_environment["log_count"] = p_environment.get("log_count", 0) + 1
         p_environment["event_logs"].append([timestamp, p_event_string])
         # keep length of the buffer at 10
         if len(p_environment["log_buffer"])>10:
@@ -55,13 +60,16 @@ class CMSE_Env():
         return p_environment
 
     # at 1 second resolution
-    def evolve_environment(self, p_environment, p_seconds):
+    # p_orbital_data may be shared between missions with the same TLE and time
+    def evolve_environment(self, p_environment, p_seconds, p_orbital_data=None):
         p_environment["elapsed_timer"] = p_environment["elapsed_timer"] + p_seconds
         p_environment["current_date"] = self.increment_mission_timer(
             p_environment["current_date"],
             p_seconds
         )
-        orbital_data = get_orbital_data(p_environment["tle_data"], p_environment["current_date"])
+        orbital_data = p_orbital_data
+        if orbital_data is None:
+            orbital_data = get_orbital_data(p_environment["tle_data"], p_environment["current_date"])
         p_environment["orbit_vector"] = [float(x) for x in orbital_data["gcrs_vector"]]
         p_environment["ground_track"] = {
             "lat": orbital_data["lat"],
@@ -85,6 +93,9 @@ class CMSE_Env():
 ################################################################################
 
 class CMSE_Sat():
+    def __init__(self, p_telemetry_store=None):
+        self.telemetry_store = p_telemetry_store
+
     # load physical model from database
     def initialize_satellite_geometry(self):
         sat_geometry = {}
@@ -159,7 +170,8 @@ class CMSE_Sat():
                 "obdh_status":"OK",
                 "cpu_load": 0.0,
                 "storage_capacity":100.0,
-                "tasks_running":[]
+                "tasks_running":[],
+                "budget_overruns":0
             },
             "thermal": {
                 "chassis_temp": 0.0,
@@ -170,11 +182,17 @@ class CMSE_Sat():
         }
         return telemetry
 
+    # records saved before blob storage keep their sections inline
+    def load_satellite_section(self, p_blob, p_inline):
+        if p_blob is not None:
+            return json.loads(p_blob.content)
+        return json.loads(p_inline)
+
     def load_mission_satellite(self, satellite_record):
         satellite = {
-            "geometry":json.loads(satellite_record.geometry),
-            "subsystems":json.loads(satellite_record.subsystems),
-            "instruments":json.loads(satellite_record.instruments),
+            "geometry":self.load_satellite_section(satellite_record.geometry_ref, satellite_record.geometry),
+            "subsystems":import_vm_subsystems(self.load_satellite_section(satellite_record.subsystems_ref, satellite_record.subsystems)),
+            "instruments":self.load_satellite_section(satellite_record.instruments_ref, satellite_record.instruments),
             "telemetry":self.initialize_satellite_telemetry(),
         }
         return satellite
@@ -215,6 +233,7 @@ class CMSE_Sat():
                 "2": {"name":"cpu_load","value":p_mission["satellite"]["telemetry"]["obdh"]["cpu_load"]},
                 "3": {"name":"storage_capacity","value":p_mission["satellite"]["telemetry"]["obdh"]["storage_capacity"]},
                 "4": {"name":"tasks_running","value":p_mission["satellite"]["telemetry"]["obdh"]["tasks_running"]},
+                "5": {"name":"budget_overruns","value":p_mission["satellite"]["telemetry"]["obdh"].get("budget_overruns", 0)},
             },
             "adcs":{
                 "1": {"name":"gyro_rpm","value":p_mission["satellite"]["telemetry"]["adcs"]["gyro_rpm"]},
@@ -225,18 +244,60 @@ class CMSE_Sat():
         }
         return telemetry_object
 
-    # simulate each subsystem at 1 sec resolution
+    # simulate each subsystem at 1 sec resolution, errors are raised
     def evolve_satellite(self, p_mission, p_seconds):
-        p_mission["satellite"]["location"] = self.get_satellite_position(p_mission)
-        p_mission["satellite"]["formatted_telemetry"] = self.get_satellite_telemetry(p_mission)
-
-        # simulate subsystems
-        for i in range (0, p_seconds):
-            p_mission["satellite"]["subsystems"]["adcs"], p_mission["satellite"]["subsystems"]["dbus"] = simulate_adcs_subsystem(p_mission["satellite"]["subsystems"]["adcs"], p_mission, 1)
-            p_mission["satellite"]["subsystems"]["obdh"], p_mission["satellite"]["subsystems"]["dbus"] = simulate_obdh_subsystem(p_mission["satellite"]["subsystems"]["obdh"], p_mission, 1)
-            p_mission, p_mission["satellite"]["subsystems"]["dbus"] = simulate_payload_instruments(p_mission, p_mission["satellite"]["subsystems"]["dbus"], 1)
+        error = self.evolve_satellites([p_mission], p_seconds, simulate_obdh_each)[0]
+        if error is not None:
+            raise error
         return p_mission["satellite"]
 
+    # Steps many missions together, one second at a time. p_simulate_obdh steps
+    # the OBDH subsystems of the missions still running for one second and
+    # returns their errors; simulate_obdh_batch runs VMs with the same program
+    # through vm_execute_batch. Returns the exception raised for each mission,
+    # None where it was stepped fine.
+    def evolve_satellites(self, p_missions, p_seconds, p_simulate_obdh=simulate_obdh_batch):
+        errors = [None] * len(p_missions)
+        for i in range(0, len(p_missions)):
+            try:
+                p_missions[i]["satellite"]["location"] = self.get_satellite_position(p_missions[i])
+                p_missions[i]["satellite"]["formatted_telemetry"] = self.get_satellite_telemetry(p_missions[i])
+            except Exception as e:
+                errors[i] = e
+        for step in range(0, p_seconds):
+            errors = self.evolve_subsystems(p_missions, errors, p_simulate_obdh, p_seconds - step - 1)
+        return errors
+
+    # one second of the ADCS, OBDH and payload subsystems, then telemetry is
+    # recorded. p_remaining is the number of seconds still to run in the step.
+    def evolve_subsystems(self, p_missions, p_errors, p_simulate_obdh, p_remaining):
+        for i in range(0, len(p_missions)):
+            if p_errors[i] is not None:
+                continue
+            mission = p_missions[i]
+            try:
+                mission["satellite"]["subsystems"]["adcs"], mission["satellite"]["subsystems"]["dbus"] = simulate_adcs_subsystem(mission["satellite"]["subsystems"]["adcs"], mission, 1)
+            except Exception as e:
+                p_errors[i] = e
+        running = [i for i in range(0, len(p_missions)) if p_errors[i] is None]
+        obdh_errors = p_simulate_obdh([p_missions[i] for i in running])
+        for i, error in zip(running, obdh_errors):
+            p_errors[i] = error
+            if error is not None:
+                continue
+            mission = p_missions[i]
+            try:
+                mission, mission["satellite"]["subsystems"]["dbus"] = simulate_payload_instruments(mission, mission["satellite"]["subsystems"]["dbus"], 1)
+                if self.telemetry_store is not None:
+                    self.telemetry_store.record(
+                        mission["environment"]["mission_id"],
+                        mission["environment"]["elapsed_timer"] - p_remaining,
+                        mission["satellite"]["telemetry"]
+                    )
+            except Exception as e:
+                p_errors[i] = e
+        return p_errors
+
 ################################################################################
 ########################### MISSION SCENARIO ENGINE ############################
 ################################################################################
@@ -244,30 +305,69 @@ class CMSE_SceEng():
     def initialize_scenario(self, p_mission, p_scenario_data):
         p_mission["scenario"] = p_scenario_data
         p_mission["scenario"]["progress"] = 0
+        # imager snapshots already scored, only newer ones are evaluated
+        p_mission["scenario"]["snapshot_mark"] = 0
         points_to_win = 0
         for item in p_mission["scenario"]["objectives"]:
+            item["completed"] = False
             points_to_win += item["score_points"]
         # once acculumated points reach or exceed this value, the scenario is considered completed
         p_mission["scenario"]["points_to_win"] = points_to_win
         return p_mission["scenario"]
 
+    def is_snapshot_matching(self, p_snapshot, p_objective, p_fp_precision):
+        result = fp_equals(p_snapshot["image_box"]["top"], p_objective["definition"]["top"], p_fp_precision)
+        result = result and fp_equals(p_snapshot["image_box"]["left"], p_objective["definition"]["left"], p_fp_precision)
+        result = result and fp_equals(p_snapshot["image_box"]["bottom"], p_objective["definition"]["bottom"], p_fp_precision)
+        result = result and fp_equals(p_snapshot["image_box"]["right"], p_objective["definition"]["right"], p_fp_precision)
+        return result
+
     def is_objective_completed(self, p_mission, p_objective):
         fp_precision = p_mission["scenario"]["initial_setup"]["fp_precision"]
         result = False
         if p_objective["type"] == "take_photo":
             for item in p_mission["satellite"]["instruments"]["imager"]["buffer"]:
-                result = fp_equals(item["image_box"]["top"], p_objective["definition"]["top"], fp_precision)
-                result = result and fp_equals(item["image_box"]["left"], p_objective["definition"]["left"], fp_precision)
-                result = result and fp_equals(item["image_box"]["bottom"], p_objective["definition"]["bottom"], fp_precision)
-                result = result and fp_equals(item["image_box"]["right"], p_objective["definition"]["right"], fp_precision)
+                result = self.is_snapshot_matching(item, p_objective, fp_precision)
                 if result:
                     return result
         return result
 
+    # fp_equals compares magnitudes, so boxes are binned by |top|, |left|
+    def get_index_cell(self, p_box, p_fp_precision):
+        return int(abs(p_box["top"])//p_fp_precision), int(abs(p_box["left"])//p_fp_precision)
+
+    def build_objective_index(self, p_objectives, p_fp_precision):
+        index = {}
+        for item in p_objectives:
+            if item["type"] == "take_photo" and not item.get("completed", False):
+                cell = self.get_index_cell(item["definition"], p_fp_precision)
+                index.setdefault(cell, []).append(item)
+        return index
+
+    def find_matching_objectives(self, p_index, p_snapshot, p_fp_precision):
+        result = []
+        cell = self.get_index_cell(p_snapshot["image_box"], p_fp_precision)
+        for d_top in (-1, 0, 1):
+            for d_left in (-1, 0, 1):
+                for item in p_index.get((cell[0]+d_top, cell[1]+d_left), []):
+                    if self.is_snapshot_matching(p_snapshot, item, p_fp_precision):
+                        result.append(item)
+        return result
+
     def evaluate_progress(self, p_mission):
-        for item in p_mission["scenario"]["objectives"]:
-            if self.is_objective_completed(p_mission, item):
-                p_mission["scenario"]["progress"] += item["score_points"]
+        snapshots = p_mission["satellite"]["instruments"]["imager"]["buffer"]
+        snapshot_mark = p_mission["scenario"].get("snapshot_mark", 0)
+        if snapshot_mark >= len(snapshots):
+            return p_mission["scenario"]
+        fp_precision = p_mission["scenario"]["initial_setup"]["fp_precision"] if len(p_mission["scenario"]["objectives"])>0 else 0
+        if fp_precision > 0:
+            index = self.build_objective_index(p_mission["scenario"]["objectives"], fp_precision)
+            for snapshot in snapshots[snapshot_mark:]:
+                for item in self.find_matching_objectives(index, snapshot, fp_precision):
+                    if not item.get("completed", False):
+                        item["completed"] = True
+                        p_mission["scenario"]["progress"] += item["score_points"]
+        p_mission["scenario"]["snapshot_mark"] = len(snapshots)
         return p_mission["scenario"]
 
     def execute_mission_action(self, p_mission, p_action):
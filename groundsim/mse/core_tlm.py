@@ -0,0 +1,278 @@
+import os
+import re
+import threading
+import numpy as np
+from collections import OrderedDict
+
+################################################################################
+############################ TELEMETRY DEFINITIONS #############################
+################################################################################
+# numeric telemetry channels, recorded once per simulated second
+TELEMETRY_CHANNELS = [
+    ["power", "battery_level"],
+    ["power", "battery_input"],
+    ["power", "battery_output"],
+    ["power", "solar_panel_output"],
+    ["thermal", "chassis_temp"],
+    ["thermal", "solar_panel_temp"],
+    ["thermal", "obdh_board_temp"],
+    ["thermal", "battery_temp"],
+    ["obdh", "cpu_load"],
+    ["obdh", "storage_capacity"],
+    ["adcs", "gyro_rpm"],
+]
+CHANNEL_NAMES = ["%s.%s" % (x[0], x[1]) for x in TELEMETRY_CHANNELS]
+
+# one hour of samples per ring buffer, spilled to disk as a chunk when full
+DEFAULT_RING_CAPACITY = 3600
+# missions kept in memory, least recently used ones are spilled and dropped
+DEFAULT_MAX_MISSIONS = 256
+
+DOWNSAMPLE_LTTB = "lttb"
+DOWNSAMPLE_MINMAX = "minmax"
+
+################################################################################
+############################ DOWNSAMPLING FUNCTIONS ############################
+################################################################################
+# Largest-Triangle-Three-Buckets, keeps first and last samples
+def downsample_lttb(p_time, p_values, p_points):
+    n = len(p_time)
+    if p_points >= n or p_points < 3:
+        return p_time, p_values
+    edges = np.linspace(1, n-1, p_points-1).astype(int)
+    selected = np.empty(p_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n-1
+    a = 0
+    for i in range(0, p_points-2):
+        start = edges[i]
+        end = edges[i+1]
+        if i+2 < len(edges):
+            next_end = edges[i+2]
+        else:
+            next_end = n
+        avg_t = p_time[end:next_end].mean()
+        avg_v = p_values[end:next_end].mean()
+        t = p_time[start:end]
+        v = p_values[start:end]
+        area = np.abs((p_time[a]-avg_t)*(v-p_values[a]) - (p_time[a]-t)*(avg_v-p_values[a]))
+        a = start + int(np.argmax(area))
+        selected[i+1] = a
+    return p_time[selected], p_values[selected]
+
+# keeps minimum and maximum of each bucket, in time order
+def downsample_minmax(p_time, p_values, p_points):
+    n = len(p_time)
+    buckets = p_points//2
+    if p_points >= n or buckets < 1:
+        return p_time, p_values
+    edges = np.linspace(0, n, buckets+1).astype(int)
+    selected = []
+    for i in range(0, buckets):
+        start = edges[i]
+        end = edges[i+1]
+        if end <= start:
+            continue
+        i_min = start + int(np.argmin(p_values[start:end]))
+        i_max = start + int(np.argmax(p_values[start:end]))
+        if i_min == i_max:
+            selected.append(i_min)
+        else:
+            selected.extend(sorted([i_min, i_max]))
+    return p_time[selected], p_values[selected]
+
+DOWNSAMPLERS = {
+    DOWNSAMPLE_LTTB: downsample_lttb,
+    DOWNSAMPLE_MINMAX: downsample_minmax,
+}
+
+################################################################################
+############################ TELEMETRY RING BUFFERS ############################
+################################################################################
+MISSION_ID_PATTERN = re.compile("[0-9a-f]{32}")
+
+# Row 0 of a ring/chunk is the mission elapsed time, rows 1.. are the channels.
+# Rings, the pending blocks and the chunk lists are shared by the simulation
+# threads and guarded by the lock, chunk files are written and read outside it.
+# A spilled block stays pending in memory until its chunk file is written, so
+# readers never miss samples. A ring array is only ever appended to, a spill
+# hands it over and the ring gets a new one.
+class CMSE_TlmStore():
+    def __init__(self, p_spill_dir, p_capacity=DEFAULT_RING_CAPACITY, p_max_missions=DEFAULT_MAX_MISSIONS):
+        self.spill_dir = p_spill_dir
+        self.capacity = p_capacity
+        self.max_missions = p_max_missions
+        self.rings = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    # mission ids come from clients, only uuid hex names may become a path
+    def get_mission_dir(self, p_mission_id):
+        mission_id = str(p_mission_id)
+        if MISSION_ID_PATTERN.fullmatch(mission_id) is None:
+            raise ValueError("Invalid mission id: %s" % mission_id)
+        spill_dir = os.path.realpath(self.spill_dir)
+        mission_dir = os.path.realpath(os.path.join(spill_dir, mission_id))
+        if os.path.dirname(mission_dir) != spill_dir:
+            raise ValueError("Invalid mission id: %s" % mission_id)
+        return mission_dir
+
+    # chunk files are named by the first and last timestamp they hold
+    def scan_chunks(self, p_mission_id):
+        chunks = []
+        mission_dir = self.get_mission_dir(p_mission_id)
+        if os.path.isdir(mission_dir):
+            for name in os.listdir(mission_dir):
+                if name.endswith(".npy"):
+                    t_range = name[:-4].split("_")
+                    chunks.append([int(t_range[0]), int(t_range[1]), os.path.join(mission_dir, name)])
+        chunks.sort()
+        return chunks
+
+    # called with the lock held, evicted rings are added to p_spills
+    def get_ring(self, p_mission_id, p_spills):
+        if p_mission_id in self.rings:
+            self.rings.move_to_end(p_mission_id)
+            return self.rings[p_mission_id]
+        ring = {
+            "data": None,
+            "size": 0,
+            "chunks": self.scan_chunks(p_mission_id)
+        }
+        self.rings[p_mission_id] = ring
+        while len(self.rings) > self.max_missions:
+            mission_id, evicted = self.rings.popitem(last=False)
+            self.take_spill(mission_id, evicted, p_spills)
+        return ring
+
+    # called with the lock held, the ring samples become a pending block
+    def take_spill(self, p_mission_id, p_ring, p_spills):
+        size = p_ring["size"]
+        if size == 0:
+            return p_ring
+        data = p_ring["data"][:, :size]
+        block = [int(data[0][0]), int(data[0][size-1]), data]
+        self.pending.setdefault(p_mission_id, []).append(block)
+        p_spills.append([p_mission_id, block])
+        p_ring["data"] = None
+        p_ring["size"] = 0
+        return p_ring
+
+    # called without the lock, files are renamed into place once complete
+    def write_spills(self, p_spills):
+        for mission_id, block in p_spills:
+            mission_dir = self.get_mission_dir(mission_id)
+            os.makedirs(mission_dir, exist_ok=True)
+            path = os.path.join(mission_dir, "%010i_%010i.npy" % (block[0], block[1]))
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, block[2])
+            os.replace(path + ".tmp", path)
+            with self.lock:
+                blocks = self.pending.get(mission_id, [])
+                discarded = not any([x is block for x in blocks])
+                if not discarded:
+                    blocks = [x for x in blocks if x is not block]
+                    if len(blocks) > 0:
+                        self.pending[mission_id] = blocks
+                    else:
+                        del self.pending[mission_id]
+                    ring = self.rings.get(mission_id, None)
+                    if ring is not None and path not in [x[2] for x in ring["chunks"]]:
+                        ring["chunks"].append([block[0], block[1], path])
+            # the mission was discarded while the block was written
+            if discarded:
+                os.remove(path)
+
+    def record(self, p_mission_id, p_time, p_telemetry):
+        spills = []
+        with self.lock:
+            ring = self.get_ring(p_mission_id, spills)
+            if ring["size"] == self.capacity:
+                ring = self.take_spill(p_mission_id, ring, spills)
+            if ring["data"] is None:
+                ring["data"] = np.empty((len(TELEMETRY_CHANNELS)+1, self.capacity), dtype=np.float64)
+            i = ring["size"]
+            data = ring["data"]
+            data[0][i] = p_time
+            row = 1
+            for item in TELEMETRY_CHANNELS:
+                data[row][i] = p_telemetry[item[0]][item[1]]
+                row = row + 1
+            ring["size"] = i + 1
+        self.write_spills(spills)
+
+    # flush all in-memory samples to disk, e.g. on shutdown
+    def flush(self):
+        spills = []
+        with self.lock:
+            for mission_id, ring in self.rings.items():
+                self.take_spill(mission_id, ring, spills)
+        self.write_spills(spills)
+
+    def discard(self, p_mission_id):
+        with self.lock:
+            self.rings.pop(p_mission_id, None)
+            self.pending.pop(p_mission_id, None)
+        for item in self.scan_chunks(p_mission_id):
+            if os.path.exists(item[2]):
+                os.remove(item[2])
+
+    # reads never allocate a ring, unknown missions are served from disk
+    def read_range(self, p_mission_id, p_start, p_end):
+        with self.lock:
+            ring = self.rings.get(p_mission_id, None)
+            chunks = list(ring["chunks"]) if ring is not None else None
+            pending = list(self.pending.get(p_mission_id, []))
+            current = ring["data"][:, :ring["size"]] if ring is not None and ring["size"] > 0 else None
+        if chunks is None:
+            chunks = self.scan_chunks(p_mission_id)
+        # a block just written may be both on disk and still pending
+        stored = set([(x[0], x[1]) for x in chunks])
+        blocks = []
+        for item in chunks:
+            if item[1] < p_start or item[0] > p_end:
+                continue
+            try:
+                blocks.append([item[0], np.load(item[2], mmap_mode="r")])
+            except FileNotFoundError:
+                continue
+        for item in pending:
+            if (item[0], item[1]) in stored or item[1] < p_start or item[0] > p_end:
+                continue
+            blocks.append([item[0], item[2]])
+        if current is not None:
+            blocks.append([current[0][0], current])
+        blocks.sort(key=lambda x: x[0])
+        result = []
+        for t_first, block in blocks:
+            i_start = np.searchsorted(block[0], p_start, side="left")
+            i_end = np.searchsorted(block[0], p_end, side="right")
+            if i_end > i_start:
+                result.append(np.array(block[:, i_start:i_end]))
+        if len(result) == 0:
+            return np.empty((len(TELEMETRY_CHANNELS)+1, 0), dtype=np.float64)
+        return np.concatenate(result, axis=1)
+
+    def query(self, p_mission_id, p_start, p_end, p_points, p_method=DOWNSAMPLE_LTTB, p_channels=None):
+        if p_method not in DOWNSAMPLERS:
+            raise ValueError("Unknown downsampling method: %s" % p_method)
+        if p_channels is None:
+            p_channels = CHANNEL_NAMES
+        data = self.read_range(p_mission_id, p_start, p_end)
+        series = {}
+        for name in p_channels:
+            row = CHANNEL_NAMES.index(name) + 1
+            time_values, channel_values = DOWNSAMPLERS[p_method](data[0], data[row], p_points)
+            series[name] = {
+                "time": [int(x) for x in time_values],
+                "value": [float(x) for x in channel_values]
+            }
+        return {
+            "status":"ok",
+            "mission_id":p_mission_id,
+            "start":p_start,
+            "end":p_end,
+            "samples":int(data.shape[1]),
+            "method":p_method,
+            "series":series
+        }
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+from datetime import datetime, timezone
+from groundsim.models import SatelliteTrackDay
+
+################################################################################
+############################ ORBIT TRACK STORE #################################
+################################################################################
+# time is in unix seconds (int64), positions are float32 degrees/km
+TRACK_COLUMNS = ["time", "lat", "lng", "alt"]
+UTC_DAY = 86400
+
+def unix_to_datetime(p_time):
+    return datetime.fromtimestamp(int(p_time), tz=timezone.utc)
+
+def datetime_to_unix(p_datetime):
+    return int(p_datetime.timestamp())
+
+# One directory of column files per satellite and UTC day, indexed by
+# SatelliteTrackDay rows. Columns are read back memory mapped.
+class CMSE_TrackStore():
+    def __init__(self, p_track_dir):
+        self.track_dir = p_track_dir
+
+    def get_day_dir(self, p_norad_id, p_day):
+        return os.path.join(self.track_dir, str(p_norad_id), p_day.strftime("%Y%m%d"))
+
+    def read_day(self, p_norad_id, p_day):
+        day_dir = self.get_day_dir(p_norad_id, p_day)
+        return {name:np.load(os.path.join(day_dir, name + ".npy"), mmap_mode="r") for name in TRACK_COLUMNS}
+
+    # samples from p_columns replace stored samples at or after their start
+    def write_day(self, p_satellite, p_day, p_columns, p_step):
+        record = SatelliteTrackDay.objects.filter(satellite_ref=p_satellite, day=p_day).first()
+        if record is not None:
+            stored = self.read_day(p_satellite.norad_id, p_day)
+            keep = np.searchsorted(stored["time"], p_columns["time"][0], side="left")
+            p_columns = {name:np.concatenate([stored[name][:keep], p_columns[name]]) for name in TRACK_COLUMNS}
+        else:
+            record = SatelliteTrackDay(satellite_ref=p_satellite, day=p_day)
+        day_dir = self.get_day_dir(p_satellite.norad_id, p_day)
+        os.makedirs(day_dir, exist_ok=True)
+        for name in TRACK_COLUMNS:
+            path = os.path.join(day_dir, name + ".npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, p_columns[name])
+            os.replace(path + ".tmp", path)
+        record.step = p_step
+        record.samples = len(p_columns["time"])
+        record.first_timestamp = unix_to_datetime(p_columns["time"][0])
+        record.last_timestamp = unix_to_datetime(p_columns["time"][-1])
+        record.save()
+        return record
+
+    # splits the columns at UTC day boundaries
+    def write_track(self, p_satellite, p_columns, p_step):
+        days = p_columns["time"] // UTC_DAY
+        boundaries = np.flatnonzero(np.diff(days)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(days)]])
+        for i in range(0, len(starts)):
+            day = unix_to_datetime(days[starts[i]] * UTC_DAY).date()
+            columns = {name:p_columns[name][starts[i]:ends[i]] for name in TRACK_COLUMNS}
+            self.write_day(p_satellite, day, columns, p_step)
+
+    def get_last_timestamp(self, p_satellite):
+        record = SatelliteTrackDay.objects.filter(satellite_ref=p_satellite).order_by("-day").first()
+        if record is None:
+            return None
+        return record.last_timestamp
+
+    def read_range(self, p_norad_id, p_start, p_end):
+        records = list(SatelliteTrackDay.objects.filter(
+            satellite_ref_id=p_norad_id,
+            last_timestamp__gte=p_start,
+            first_timestamp__lte=p_end
+        ).order_by("day"))
+        start_time = datetime_to_unix(p_start)
+        end_time = datetime_to_unix(p_end)
+        blocks = {name:[] for name in TRACK_COLUMNS}
+        for record in records:
+            columns = self.read_day(p_norad_id, record.day)
+            i_start = np.searchsorted(columns["time"], start_time, side="left")
+            i_end = np.searchsorted(columns["time"], end_time, side="right")
+            for name in TRACK_COLUMNS:
+                blocks[name].append(np.array(columns[name][i_start:i_end]))
+        if len(records) == 0:
+            return {"time":np.empty(0, dtype=np.int64), "lat":np.empty(0, dtype=np.float32), "lng":np.empty(0, dtype=np.float32), "alt":np.empty(0, dtype=np.float32)}
+        return {name:np.concatenate(blocks[name]) for name in TRACK_COLUMNS}
+
+    # every n-th sample, so at most p_points are returned
+    def query(self, p_norad_id, p_start, p_end, p_points):
+        columns = self.read_range(p_norad_id, p_start, p_end)
+        samples = len(columns["time"])
+        stride = max(1, -(-samples // max(1, p_points)))
+        return {
+            "status":"ok",
+            "norad_id":p_norad_id,
+            "samples":samples,
+            "time":[int(x) for x in columns["time"][::stride]],
+            "lat":[float(x) for x in columns["lat"][::stride]],
+            "lng":[float(x) for x in columns["lng"][::stride]],
+            "alt":[float(x) for x in columns["alt"][::stride]],
+        }
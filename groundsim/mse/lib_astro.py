@@ -102,3 +102,29 @@ def compute_orbit_track(tle_data, p_start_date, p_end_date, p_step):
          }
          result.append(data)
     return result
+
+################################################################################
+# vectorized orbit track: p_count samples every p_step seconds after p_start_date
+# returns columns time (unix seconds), lat, lng, alt
+################################################################################
+def compute_orbit_columns(tle_data, p_start_date, p_count, p_step):
+    ts = load.timescale()
+    satellite = EarthSatellite(tle_data["line_1"], tle_data["line_2"], "Satellite", ts)
+    offsets = (np.arange(p_count, dtype=np.int64) + 1) * p_step
+    time_instants = ts.utc(
+        p_start_date["year"],
+        p_start_date["month"],
+        p_start_date["day"],
+        p_start_date["hour"],
+        p_start_date["min"],
+        p_start_date["sec"] + offsets,
+    )
+    subpoint = satellite.at(time_instants).subpoint()
+    start_time = int(mission_timer_to_datetime(p_start_date).timestamp())
+    return {
+        "time":start_time + offsets,
+        "lat":subpoint.latitude.degrees.astype(np.float32),
+        "lng":subpoint.longitude.degrees.astype(np.float32),
+        "alt":subpoint.elevation.km.astype(np.float32),
+    }
+
@@ -0,0 +1,86 @@
+import json
+import gzip
+
+################################################################################
+############################ WIRE CODECS ######################################
+################################################################################
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_BINARY = "application/x-groundsim-mission"
+
+# binary payload: magic, format version, gzip of [key table, tree]
+BINARY_MAGIC = b"GSM"
+BINARY_VERSION = 1
+BINARY_COMPRESS_LEVEL = 1
+
+def encode_json(p_data):
+    return json.dumps(p_data).encode('utf-8')
+
+def decode_json(p_payload):
+    return json.loads(p_payload)
+
+# Dict keys are replaced by their index in a per-payload key table, written in
+# base 36. The table is a JSON list, so integer keys (e.g. VRAM task ids) keep
+# their type, unlike plain JSON.
+def pack_keys(p_value, p_table, p_index):
+    if isinstance(p_value, dict):
+        packed = {}
+        for key, value in p_value.items():
+            if key not in p_index:
+                p_index[key] = len(p_table)
+                p_table.append(key)
+            packed[int_to_base36(p_index[key])] = pack_keys(value, p_table, p_index)
+        return packed
+    if isinstance(p_value, (list, tuple)):
+        return [pack_keys(x, p_table, p_index) for x in p_value]
+    return p_value
+
+def unpack_keys(p_value, p_table):
+    if isinstance(p_value, dict):
+        return {p_table[int(key, 36)]:unpack_keys(value, p_table) for key, value in p_value.items()}
+    if isinstance(p_value, list):
+        return [unpack_keys(x, p_table) for x in p_value]
+    return p_value
+
+def int_to_base36(p_value):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        result = digits[p_value % 36] + result
+        p_value = p_value // 36
+        if p_value == 0:
+            return result
+
+def encode_binary(p_data):
+    table = []
+    tree = pack_keys(p_data, table, {})
+    body = json.dumps([table, tree], separators=(',', ':')).encode('utf-8')
+    return BINARY_MAGIC + bytes([BINARY_VERSION]) + gzip.compress(body, compresslevel=BINARY_COMPRESS_LEVEL)
+
+def decode_binary(p_payload):
+    p_payload = bytes(p_payload)
+    if p_payload[0:3] != BINARY_MAGIC:
+        raise ValueError("Not a binary mission payload")
+    if p_payload[3] != BINARY_VERSION:
+        raise ValueError("Unsupported binary mission payload version: %i" % p_payload[3])
+    table, tree = json.loads(gzip.decompress(p_payload[4:]))
+    return unpack_keys(tree, table)
+
+CODECS = {
+    CONTENT_TYPE_JSON: {"encode":encode_json, "decode":decode_json},
+    CONTENT_TYPE_BINARY: {"encode":encode_binary, "decode":decode_binary},
+}
+
+def get_codec(p_content_type):
+    if p_content_type is None:
+        return None
+    return CODECS.get(p_content_type.split(";")[0].strip().lower(), None)
+
+# first registered media type listed in an Accept header, None if there is none
+def negotiate_codec(p_accept):
+    if p_accept is None:
+        return None, None
+    for item in p_accept.split(","):
+        content_type = item.split(";")[0].strip().lower()
+        if content_type in CODECS:
+            return content_type, CODECS[content_type]
+    return None, None
@@ -0,0 +1,85 @@
+################################################################################
+########################## JSON PATCH STYLE DIFFERENCES ########################
+################################################################################
+# Operations follow RFC 6902 naming ("add", "remove", "replace") and paths are
+# JSON pointers. Lists that only grew at the end are sent as appends ("/-").
+
+def escape_pointer_token(p_token):
+    return str(p_token).replace("~", "~0").replace("/", "~1")
+
+def unescape_pointer_token(p_token):
+    return p_token.replace("~1", "/").replace("~0", "~")
+
+def diff_list(p_old, p_new, p_path, p_ops):
+    old_len = len(p_old)
+    new_len = len(p_new)
+    if new_len >= old_len and p_new[:old_len] == p_old:
+        for item in p_new[old_len:]:
+            p_ops.append({"op":"add", "path":p_path + "/-", "value":item})
+    elif new_len == old_len:
+        for i in range(0, new_len):
+            if p_old[i] != p_new[i]:
+                diff_value(p_old[i], p_new[i], "%s/%i" % (p_path, i), p_ops)
+    else:
+        p_ops.append({"op":"replace", "path":p_path, "value":p_new})
+    return p_ops
+
+def diff_dict(p_old, p_new, p_path, p_ops):
+    for key in p_old:
+        if key not in p_new:
+            p_ops.append({"op":"remove", "path":p_path + "/" + escape_pointer_token(key)})
+    for key, value in p_new.items():
+        path = p_path + "/" + escape_pointer_token(key)
+        if key not in p_old:
+            p_ops.append({"op":"add", "path":path, "value":value})
+        elif p_old[key] != value:
+            diff_value(p_old[key], value, path, p_ops)
+    return p_ops
+
+def diff_value(p_old, p_new, p_path, p_ops):
+    if isinstance(p_old, dict) and isinstance(p_new, dict):
+        return diff_dict(p_old, p_new, p_path, p_ops)
+    if isinstance(p_old, list) and isinstance(p_new, list):
+        return diff_list(p_old, p_new, p_path, p_ops)
+    p_ops.append({"op":"replace", "path":p_path, "value":p_new})
+    return p_ops
+
+# both documents are expected to be plain JSON data (dicts with string keys)
+def make_delta(p_old, p_new):
+    ops = []
+    if p_old != p_new:
+        diff_value(p_old, p_new, "", ops)
+    return ops
+
+def resolve_pointer(p_document, p_tokens):
+    target = p_document
+    for token in p_tokens:
+        if isinstance(target, list):
+            target = target[int(token)]
+        else:
+            target = target[token]
+    return target
+
+def apply_delta(p_document, p_ops):
+    for item in p_ops:
+        if item["path"] == "":
+            p_document = item["value"]
+            continue
+        tokens = [unescape_pointer_token(x) for x in item["path"].split("/")[1:]]
+        parent = resolve_pointer(p_document, tokens[:-1])
+        key = tokens[-1]
+        if isinstance(parent, list):
+            if key == "-":
+                parent.append(item["value"])
+            elif item["op"] == "remove":
+                parent.pop(int(key))
+            elif item["op"] == "add":
+                parent.insert(int(key), item["value"])
+            else:
+                parent[int(key)] = item["value"]
+        else:
+            if item["op"] == "remove":
+                del parent[key]
+            else:
+                parent[key] = item["value"]
+    return p_document
@@ -1,4 +1,10 @@
+import mmap
+import zlib
 import struct
+import hashlib
+import threading
+from functools import lru_cache
+from collections import OrderedDict
 ################################################################################
 ################################# VM DEFINITIONS ###############################
 ################################################################################
@@ -378,9 +384,58 @@ def decode_parameter(p_param):
 def decode_register(p_rreg):
     return decode_symbol(REGISTERS, p_rreg)
 
+################################################################################
+############################## INSTRUCTION SCHEMAS #############################
+################################################################################
+# operand kinds: name used in error messages and symbol table, None for numbers
+K_REGISTER = ("register", REGISTERS)
+K_PREFIX = ("prefix", PREFIXES)
+K_OPERATOR = ("operator", OPERATORS)
+K_INSTRUMENT = ("instrument", INSTRUMENTS)
+K_PARAMETER = ("parameter", PARAMETERS)
+K_ACTION = ("action", ACTIONS)
+K_ADDRESS = ("address", None)
+K_UNUSED = ("unused", None) # not read, the byte is 0
+
+# Opcode and [byte, kind] per operand, operands follow the opcode in order.
+# A dict kind is selected by the value of the first operand (None: others).
+INSTRUCTION_SCHEMAS = {
+    "OP_NOP": [OP_NOP, []],
+    "OP_HLT": [OP_HLT, []],
+    "OP_LEA": [OP_LEA, [[1, K_REGISTER], [2, K_ADDRESS], [3, K_ADDRESS]]],
+    "OP_MOV": [OP_MOV, [[1, K_PREFIX], [2, K_REGISTER], [3, {PRE_MOV_REG: K_REGISTER, PRE_MOV_RAM: K_ADDRESS, None: K_UNUSED}]]],
+    "OP_CMP": [OP_CMP, [[1, K_OPERATOR], [2, {TSX_EQ: K_ADDRESS, TSX_NE: K_ADDRESS, None: K_REGISTER}], [3, K_REGISTER]]],
+    "OP_GET": [OP_GET, [[1, K_INSTRUMENT], [2, K_PARAMETER], [3, K_REGISTER]]],
+    "OP_SET": [OP_SET, [[1, K_INSTRUMENT], [2, K_PARAMETER], [3, K_REGISTER]]],
+    "OP_ACT": [OP_ACT, [[1, K_INSTRUMENT], [2, K_ACTION], [3, K_REGISTER]]],
+    "OP_STR": [OP_STR, [[1, K_PREFIX], [3, K_REGISTER]]],
+    "OP_FMA": [OP_FMA, [[1, K_REGISTER], [2, K_REGISTER], [3, K_REGISTER]]],
+    "OP_FSD": [OP_FSD, [[1, K_REGISTER], [2, K_REGISTER], [3, K_REGISTER]]],
+    "OP_SIN": [OP_SIN, [[1, K_PREFIX], [2, K_REGISTER], [3, K_REGISTER]]],
+    "OP_COS": [OP_COS, [[1, K_PREFIX], [2, K_REGISTER], [3, K_REGISTER]]],
+    "OP_TAN": [OP_TAN, [[1, K_PREFIX], [2, K_REGISTER], [3, K_REGISTER]]],
+    "OP_POW": [OP_POW, [[1, K_PREFIX], [2, K_REGISTER], [3, K_REGISTER]]],
+    "OP_NOR": [OP_NOR, [[1, K_REGISTER], [2, K_REGISTER], [3, K_REGISTER]]],
+}
+
+def get_operand_kind(p_kind, p_first):
+    if isinstance(p_kind, dict):
+        return p_kind.get(p_first, p_kind[None])
+    return p_kind
+
+def encode_float_word(p_value):
+    return struct.unpack('<I', struct.pack('<f', p_value))[0]
+
 ################################################################################
 ############################## SOURCE LINE DECODER #############################
 ################################################################################
+# Unknown symbols are packed as -1, see decode_symbol. assemble_source reports
+# them instead.
+def decode_operand(p_kind, p_data):
+    if p_kind is K_ADDRESS:
+        return decode_address(p_data)
+    return decode_symbol(p_kind[1], p_data)
+
 def process_code_line(p_str, p_mode):
     line_values = p_str.split(",")
     if p_mode == 0:
@@ -392,113 +447,22 @@ def process_code_line(p_str, p_mode):
         p_mode = p_mode + 1
         return [p_mode, bytecode]
     if p_mode == 1:
-        opcode = line_values[0]
-        if opcode == "OP_NOP":
-            bytecode = pack4x8to32(OP_NOP, OP_NOP, OP_NOP, OP_NOP)
-            return [p_mode, bytecode]
-        if opcode == "OP_HLT":
-            bytecode = pack4x8to32(OP_HLT, OP_NOP, OP_NOP, OP_NOP)
+        if line_values[0] not in INSTRUCTION_SCHEMAS:
+            raise Exception("Unrecognized instruction")
+        opcode, operands = INSTRUCTION_SCHEMAS[line_values[0]]
+        word = [opcode, 0, 0, 0]
+        for i in range(0, len(operands)):
+            kind = get_operand_kind(operands[i][1], word[1])
+            if kind is not K_UNUSED:
+                word[operands[i][0]] = decode_operand(kind, line_values[i+1])
+        if opcode == OP_HLT:
             p_mode = p_mode + 1
-            return [p_mode, bytecode]
-        if opcode == "OP_LEA":
-            op_a = decode_register(line_values[1])
-            op_b = decode_address(line_values[2])
-            op_c = decode_address(line_values[3])
-            bytecode = pack4x8to32(OP_LEA, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_MOV":
-            op_a = decode_prefix(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c =0
-            if op_a == PRE_MOV_REG:
-                op_c = decode_register(line_values[3])
-            elif op_a == PRE_MOV_RAM:
-                op_c= decode_address(line_values[3])
-            bytecode = pack4x8to32(OP_MOV, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_CMP":
-            op_a = decode_operator(line_values[1])
-            op_c = decode_register(line_values[3])
-            if (op_a == TSX_EQ) | (op_a == TSX_NE):
-                op_b = decode_address(line_values[2])
-            else:
-                op_b = decode_register(line_values[2])
-            bytecode = pack4x8to32(OP_CMP, op_a, op_b, op_c);
-            return [p_mode, bytecode]
-        if opcode == "OP_GET":
-            op_a = decode_instrument(line_values[1])
-            op_b = decode_parameter(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_GET, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_SET":
-            op_a = decode_instrument(line_values[1])
-            op_b = decode_parameter(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_SET, op_a, op_b, op_c);
-            return [p_mode, bytecode]
-        if opcode == "OP_ACT":
-            op_a = decode_instrument(line_values[1])
-            op_b = decode_action(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_ACT, op_a, op_b, op_c);
-            return [p_mode, bytecode]
-        if opcode == "OP_STR":
-            op_a = decode_prefix(line_values[1])
-            op_c = decode_register(line_values[2])
-            bytecode = pack4x8to32(OP_STR, op_a, OP_NOP, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_FMA":
-            op_a = decode_register(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_FMA, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_FSD":
-            op_a = decode_register(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_FSD, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_SIN":
-            op_a = decode_prefix(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_SIN, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_COS":
-            op_a = decode_prefix(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_COS, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_TAN":
-            op_a = decode_prefix(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_TAN, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_POW":
-            op_a = decode_prefix(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_POW, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        if opcode == "OP_NOR":
-            op_a = decode_register(line_values[1])
-            op_b = decode_register(line_values[2])
-            op_c = decode_register(line_values[3])
-            bytecode = pack4x8to32(OP_NOR, op_a, op_b, op_c)
-            return [p_mode, bytecode]
-        # if unable to decode
-        raise Exception("Unrecognized instruction")
+        return [p_mode, pack4x8to32(*word)]
     if p_mode == 2:
         tail = p_str[-1]
         head = p_str[:-1]
         if tail == 'f':
-            head = float(head)
-            str_bytes = hex(struct.unpack('<I', struct.pack('<f', head))[0])
-            bytecode = int(str_bytes[2:], 16)
+            bytecode = encode_float_word(float(head))
         if tail == 'i':
             bytecode = int(head)
         return [p_mode, bytecode]
@@ -518,3 +482,218 @@ def process_program_code(p_str_list, to_hex_str=True):
         else:
             output.append(bytecode_str)
     return output
+
+################################################################################
+############################### SOURCE ASSEMBLER ###############################
+################################################################################
+# Assembles a whole task in one pass, reporting the line and column (both
+# 1-based) of the first error. Blank lines are skipped. Lines are assembled
+# once and cached, so libraries of similar scripts assemble quickly.
+LINE_CACHE_SIZE = 65536
+
+class SpliceSyntaxError(ValueError):
+    def __init__(self, p_message, p_line, p_column):
+        super().__init__("line %i, column %i: %s" % (p_line, p_column, p_message))
+        self.message = p_message
+        self.line = p_line
+        self.column = p_column
+
+# [text, column] of each comma separated field, text is stripped
+def split_fields(p_line):
+    fields = []
+    column = 1
+    for item in p_line.split(","):
+        text = item.strip()
+        if len(text)>0:
+            fields.append([text, column + len(item) - len(item.lstrip())])
+        else:
+            fields.append([text, column])
+        column = column + len(item) + 1
+    return fields
+
+def check_no_more_fields(p_fields, p_count):
+    for item in p_fields[p_count:]:
+        if len(item[0])>0:
+            raise SpliceSyntaxError("unexpected operand '%s'" % item[0], 0, item[1])
+
+def parse_byte(p_field, p_name):
+    try:
+        value = int(p_field[0])
+    except ValueError:
+        raise SpliceSyntaxError("%s '%s' is not a number" % (p_name, p_field[0]), 0, p_field[1]) from None
+    if value<0 or value>0xFF:
+        raise SpliceSyntaxError("%s %i is out of range 0..255" % (p_name, value), 0, p_field[1])
+    return value
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def assemble_header_line(p_line):
+    fields = split_fields(p_line)
+    names = ["group id", "task id", "frequency", "length"]
+    if len(fields)<len(names):
+        raise SpliceSyntaxError("task header needs group id, task id, frequency and length", 0, len(p_line) + 1)
+    check_no_more_fields(fields, len(names))
+    return pack4x8to32(*[parse_byte(fields[i], names[i]) for i in range(0, len(names))])
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def assemble_code_line(p_line):
+    fields = split_fields(p_line)
+    if fields[0][0] not in INSTRUCTION_SCHEMAS:
+        raise SpliceSyntaxError("unknown opcode '%s'" % fields[0][0], 0, fields[0][1])
+    opcode, operands = INSTRUCTION_SCHEMAS[fields[0][0]]
+    word = [opcode, 0, 0, 0]
+    for i in range(0, len(operands)):
+        kind = get_operand_kind(operands[i][1], word[1])
+        if kind is K_UNUSED:
+            continue
+        if i+1>=len(fields) or len(fields[i+1][0]) == 0:
+            raise SpliceSyntaxError("%s expects a %s as operand %i" % (fields[0][0], kind[0], i+1), 0, len(p_line) + 1 if i+1>=len(fields) else fields[i+1][1])
+        if kind is K_ADDRESS:
+            word[operands[i][0]] = parse_byte(fields[i+1], kind[0])
+        elif fields[i+1][0] in kind[1]:
+            word[operands[i][0]] = kind[1][fields[i+1][0]]
+        else:
+            raise SpliceSyntaxError("unknown %s '%s'" % (kind[0], fields[i+1][0]), 0, fields[i+1][1])
+    if opcode != OP_MOV or word[1] in (PRE_MOV_REG, PRE_MOV_RAM):
+        check_no_more_fields(fields, len(operands) + 1)
+    return pack4x8to32(*word), opcode
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def assemble_data_line(p_line):
+    text = p_line.strip()
+    column = len(p_line) - len(p_line.lstrip()) + 1
+    try:
+        if text[-1:] == "f":
+            return encode_float_word(float(text[:-1]))
+        if text[-1:] == "i":
+            return int(text[:-1])
+    except (ValueError, OverflowError):
+        raise SpliceSyntaxError("bad data word '%s'" % text, 0, column) from None
+    raise SpliceSyntaxError("data word '%s' must end with f (float) or i (integer)" % text, 0, column)
+
+# p_lines is any iterable of lines, e.g. an open file
+def assemble_lines(p_lines):
+    bytecode = []
+    mode = 0
+    line_number = 0
+    for line in p_lines:
+        line_number = line_number + 1
+        line = line.rstrip("\r\n")
+        if len(line.strip()) == 0:
+            continue
+        try:
+            if mode == 0:
+                bytecode.append(assemble_header_line(line))
+                mode = 1
+            elif mode == 1:
+                word, opcode = assemble_code_line(line)
+                bytecode.append(word)
+                if opcode == OP_HLT:
+                    mode = 2
+            else:
+                bytecode.append(assemble_data_line(line))
+        except SpliceSyntaxError as e:
+            raise SpliceSyntaxError(e.message, line_number, e.column) from None
+    if mode == 0:
+        raise SpliceSyntaxError("missing task header", line_number + 1, 1)
+    return bytecode
+
+# p_source is the task text or its lines
+def assemble_source(p_source):
+    if isinstance(p_source, str):
+        return assemble_lines(p_source.split("\n"))
+    return assemble_lines(p_source)
+
+# assembles many sources, each entry is the bytecode or the SpliceSyntaxError
+def assemble_library(p_sources):
+    results = []
+    for item in p_sources:
+        try:
+            results.append(assemble_source(item))
+        except SpliceSyntaxError as e:
+            results.append(e)
+    return results
+
+################################################################################
+############################## BINARY OBJECT FILES #############################
+################################################################################
+# .splb object: magic, format version, the task header fields (group, task,
+# frequency, length), the word count and the CRC32 of the words, followed by
+# the program words (header word included) as little-endian int64. Words are
+# 64 bits wide since data words such as "-5i" are kept as assembled.
+OBJECT_EXTENSION = ".splb"
+OBJECT_MAGIC = b"SPLB"
+OBJECT_VERSION = 1
+OBJECT_HEADER = struct.Struct("<4sBBBBBxxxII")
+
+def encode_object(p_bytecode):
+    words = struct.pack("<%iq" % len(p_bytecode), *p_bytecode)
+    fields = unpack32to4x8(p_bytecode[0])
+    return OBJECT_HEADER.pack(OBJECT_MAGIC, OBJECT_VERSION, *fields, len(p_bytecode), zlib.crc32(words)) + words
+
+# p_data can be any buffer, e.g. a memory mapped file
+def decode_object(p_data):
+    if len(p_data)<OBJECT_HEADER.size:
+        raise ValueError("Not a Splice object")
+    magic, version, group_id, task_id, freq, length, count, checksum = OBJECT_HEADER.unpack_from(p_data, 0)
+    if magic != OBJECT_MAGIC:
+        raise ValueError("Not a Splice object")
+    if version != OBJECT_VERSION:
+        raise ValueError("Unsupported Splice object version: %i" % version)
+    if count == 0 or len(p_data) != OBJECT_HEADER.size + count*8:
+        raise ValueError("Truncated Splice object")
+    words = memoryview(p_data)[OBJECT_HEADER.size:]
+    try:
+        if zlib.crc32(words) != checksum:
+            raise ValueError("Splice object checksum mismatch")
+        bytecode = list(struct.unpack_from("<%iq" % count, words, 0))
+    finally:
+        words.release()
+    if unpack32to4x8(bytecode[0]) != [group_id, task_id, freq, length]:
+        raise ValueError("Splice object header mismatch")
+    return bytecode
+
+def assemble_object(p_str_list):
+    return encode_object(assemble_program(p_str_list))
+
+def write_object_file(p_filename, p_str_list):
+    with open(p_filename, "wb") as f:
+        f.write(assemble_object(p_str_list))
+
+def load_object_file(p_filename):
+    with open(p_filename, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return decode_object(data)
+
+################################################################################
+################################ PROGRAM CACHE #################################
+################################################################################
+# Assembled programs keyed by the SHA-1 of their source, so scripts uploaded
+# again skip the assembler. Callers get their own list, task memory is
+# modified in place by the VM.
+PROGRAM_CACHE_SIZE = 1024
+program_cache = OrderedDict()
+program_cache_lock = threading.Lock()
+
+def get_source_digest(p_str_list):
+    return hashlib.sha1("\n".join(p_str_list).encode("utf-8")).digest()
+
+# p_program is either source lines or a .splb object
+def assemble_program(p_program):
+    if isinstance(p_program, (bytes, bytearray, memoryview, mmap.mmap)):
+        return decode_object(p_program)
+    digest = get_source_digest(p_program)
+    with program_cache_lock:
+        bytecode = program_cache.get(digest, None)
+        if bytecode is not None:
+            program_cache.move_to_end(digest)
+    if bytecode is None:
+        bytecode = tuple(assemble_source(p_program))
+        with program_cache_lock:
+            program_cache[digest] = bytecode
+            if len(program_cache)>PROGRAM_CACHE_SIZE:
+                program_cache.popitem(last=False)
+    return list(bytecode)
+
+def clear_program_cache():
+    with program_cache_lock:
+        program_cache.clear()
@@ -1,6 +1,9 @@
 import time
+import heapq
+import numpy as np
+from functools import lru_cache
 from math import sin, cos, tan, asin, acos, atan, pow, log
-from groundsim.mse.lib_splice import process_program_code, unpack32to4x8, unpack_float_from_int, pack_float_to_int
+from groundsim.mse.lib_splice import assemble_program, unpack32to4x8, unpack_float_from_int, pack_float_to_int
 
 ################################################################################
 ############################ SPLICE VM - DEFINITIONS ###########################
@@ -151,12 +154,14 @@ EX_CHECK_FALSE = 0x02 #CMP opcode execution result is FALSE
 EX_ACTION_FAIL = 0x03 #Opcode ok, but instrument response is not
 EX_BAD_OPERAND = 0x04 #Mismatched opcode and operand
 EX_OPC_UNKNOWN = 0x05 #Not able to decode opcode
+EX_TASK_HALTED = 0x06 #HLT opcode, the task is completed
 
 # Task status definitions
 TASK_COMPLETED = 0x000000FF # completed ok
 TASK_CON_UNMET = 0x0000007F # task condition not met, either prerequisites or frequency-wise
 TASK_ERROR_OPC = 0x0000003F # bad opcode or operand
 TASK_LOADED_OK = 0x0000001F # loaded, but not executed yet
+TASK_SUSPENDED = 0x0000000F # out of tick budget, resumes on the next tick
 TASK_NOTLOADED = 0x00000000 # no task in memory
 
 # Initial timestamp
@@ -178,8 +183,35 @@ LOG_LEVEL_INFO = 1
 LOG_LEVEL_ERROR = 2
 
 DEFAULT_VM_LOG_LEVEL = 1 # 0, 1 or 2
+# messages kept in INST_LOGS["OUT"], older ones are dropped once drained
+VM_LOG_CAPACITY = 256
 DEFAULT_VM_TIMESLICE = 1
 
+# VM task execution modes
+VM_EXEC_INTERPRET = 0
+VM_EXEC_COMPILE = 1
+DEFAULT_VM_EXEC_MODE = VM_EXEC_INTERPRET
+
+# tasks failing verification are loaded and their errors logged, or rejected
+VM_VERIFY_ANNOTATE = 0
+VM_VERIFY_REJECT = 1
+DEFAULT_VM_VERIFY = VM_VERIFY_ANNOTATE
+
+# VM profiler, off by default. cpu_load is reported against the nominal
+# instruction rate of the on-board computer.
+DEFAULT_VM_PROFILE = 0
+VM_NOMINAL_IPS = 1000
+
+# instructions run per tick before the running task is suspended, 0 = no limit
+DEFAULT_VM_TICK_BUDGET = 4096
+
+# tasks due in fewer VMs than this run through vm_execute, not vm_execute_batch
+VM_BATCH_MIN_LANES = 16
+
+# decoded programs and task headers kept in process
+DECODED_TASK_CACHE = 1024
+DECODED_HEADER_CACHE = 4096
+
 ################################################################################
 ########################## SPLICE VM - INITIALIZATION ##########################
 ################################################################################
@@ -195,12 +227,17 @@ def create_vm():
         "VRAM": {
             "TASK_CONTEXT_STATUS":{},
             "TASK_CONTEXT_WASRUN":{},
-            "PROGRAM_CODE_MEMORY":{}
+            "PROGRAM_CODE_MEMORY":{},
+            "TASK_SCHEDULE":None, # built on the next tick
+            "TASK_RESUME":None, # suspended task context
+            "BUDGET_OVERRUNS":0,
         },
         "VBUS":
         {
             "INST_LOGS":{
-                "OUT":[]
+                "OUT":[],
+                "DRAINED":0, # OUT entries already drained
+                "DROPPED":0, # entries trimmed before they were drained
             },
             "INST_ADCS":{
                 "ADCS_MODE":0,
@@ -228,6 +265,10 @@ def create_vm():
             "VM_LOG_LEVEL": DEFAULT_VM_LOG_LEVEL,
             "VM_TIMESLICE": DEFAULT_VM_TIMESLICE,
             "FP_PRECISION": 1.0E-07,
+            "VM_EXEC_MODE": DEFAULT_VM_EXEC_MODE,
+            "VM_PROFILE": DEFAULT_VM_PROFILE,
+            "VM_TICK_BUDGET": DEFAULT_VM_TICK_BUDGET,
+            "VM_VERIFY": DEFAULT_VM_VERIFY,
         }
 
     }
@@ -256,11 +297,38 @@ def halt_vm(p_splice_vm):
 ############################## SPLICE VM - BUS I/O #############################
 ################################################################################
 
-def log_message(p_splice_vm, p_str, p_error_level):
+# p_args are only formatted into p_str when the message is logged
+def log_message(p_splice_vm, p_str, p_error_level, *p_args):
     if p_error_level>=p_splice_vm["VFLAGS"]["VM_LOG_LEVEL"]:
+        if p_args:
+            p_str = p_str % p_args
         p_splice_vm["VBUS"]["INST_LOGS"]["OUT"].append("%s" % p_str)
     return p_splice_vm
 
+# OUT is a ring of VM_LOG_CAPACITY messages, trimmed once per tick
+def trim_vm_log(p_splice_vm):
+    logs = p_splice_vm["VBUS"]["INST_LOGS"]
+    excess = len(logs["OUT"]) - VM_LOG_CAPACITY
+    if excess>0:
+        del logs["OUT"][:excess]
+        drained = logs.get("DRAINED", 0)
+        logs["DROPPED"] = logs.get("DROPPED", 0) + max(0, excess - drained)
+        logs["DRAINED"] = max(0, drained - excess)
+    return p_splice_vm
+
+# returns the messages logged since the last drain and the number dropped
+def drain_vm_log(p_splice_vm):
+    logs = p_splice_vm["VBUS"]["INST_LOGS"]
+    messages = logs["OUT"][min(logs.get("DRAINED", 0), len(logs["OUT"])):]
+    dropped = logs.get("DROPPED", 0)
+    logs["DRAINED"] = len(logs["OUT"])
+    logs["DROPPED"] = 0
+    return p_splice_vm, messages, dropped
+
+def set_vm_log_level(p_splice_vm, p_level):
+    p_splice_vm["VFLAGS"]["VM_LOG_LEVEL"] = max(LOG_LEVEL_DEBUG, min(LOG_LEVEL_ERROR, p_level))
+    return p_splice_vm
+
 ################################################################################
 ########################## SPLICE VM - OPCODE DECODING #########################
 ################################################################################
@@ -336,18 +404,20 @@ def opcode_lea(p_splice_vm, p_reg_id, p_source_id, p_addr, p_group_id, p_task_id
         p_splice_vm["VCPU"]["FPU_REGISTERS"][p_reg_id] = data_float
         return p_splice_vm, EX_OPCODE_FINE;
 
+# registers are only read when the message is logged, as in compiled tasks
 def opcode_str(p_splice_vm, p_prefix, p_reg_id, p_task_info):
+    if p_prefix not in [PRE_STR_ALU, PRE_STR_FPU, PRE_STR_BIN]:
+        return p_splice_vm, EX_BAD_OPERAND
+    if LOG_LEVEL_INFO<p_splice_vm["VFLAGS"]["VM_LOG_LEVEL"]:
+        return p_splice_vm, EX_OPCODE_FINE
     if p_prefix == PRE_STR_ALU:
-        message_string = "%s%s" % (p_task_info, p_splice_vm["VCPU"]["ALU_REGISTERS"][p_reg_id])
-        p_splice_vm = log_message(p_splice_vm, message_string, LOG_LEVEL_INFO)
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_INFO, p_task_info, p_splice_vm["VCPU"]["ALU_REGISTERS"][p_reg_id])
         return p_splice_vm, EX_OPCODE_FINE
     if p_prefix == PRE_STR_FPU:
-        message_string = "%s%s" % (p_task_info, p_splice_vm["VCPU"]["FPU_REGISTERS"][p_reg_id])
-        p_splice_vm = log_message(p_splice_vm, message_string, LOG_LEVEL_INFO)
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_INFO, p_task_info, p_splice_vm["VCPU"]["FPU_REGISTERS"][p_reg_id])
         return p_splice_vm, EX_OPCODE_FINE
     if p_prefix == PRE_STR_BIN:
-        message_string = "%s%s" % (p_task_info, "{0:b}".format(p_splice_vm["VCPU"]["ALU_REGISTERS"][p_reg_id]))
-        p_splice_vm = log_message(p_splice_vm, message_string, LOG_LEVEL_INFO)
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_INFO, p_task_info, "{0:b}".format(p_splice_vm["VCPU"]["ALU_REGISTERS"][p_reg_id]))
         return p_splice_vm, EX_OPCODE_FINE
 
     return p_splice_vm, EX_BAD_OPERAND
@@ -650,8 +720,12 @@ def opcode_nor(p_splice_vm, p_reg_a, p_reg_b, p_reg_c):
 ################################################################################
 ######################### SPLICE VM - MEMORY OPERATIONS ########################
 ################################################################################
+@lru_cache(maxsize=DECODED_HEADER_CACHE)
+def decode_task_header(p_header):
+    return tuple(unpack32to4x8(p_header))
+
 def get_task_header_ids(p_header):
-    header = unpack32to4x8(p_header)
+    header = decode_task_header(p_header)
     return header[0], header[1]
 
 def set_vram_content(p_splice_vm, p_dict_name, p_header, p_data):
@@ -676,7 +750,7 @@ def advance_vm_clocks(p_splice_vm, p_seconds):
     return p_splice_vm
 
 def check_frequency(p_splice_vm, p_header):
-    header = unpack32to4x8(p_header)
+    header = decode_task_header(p_header)
     group_id = header[0]
     task_id = header[1]
     interval_code = header[2]
@@ -714,74 +788,678 @@ def get_system_time():
 ######################## SPLICE VM - EXECUTION CONTROL #########################
 ################################################################################
 
-def vm_execute(p_splice_vm, p_task):
-    decoded_header = unpack32to4x8(p_task[0])
-    group_id = decoded_header[0]
-    task_id = decoded_header[1]
-    offset = decoded_header[3]
-    ip = 1
-    next_opcode = OP_NOP
+# CMP returns a bare result, all other handlers return (vm, result)
+def execute_cmp(p_splice_vm, p_oper, p_reg_a, p_reg_b, p_group_id):
+    return p_splice_vm, opcode_cmp(p_splice_vm, p_oper, p_reg_a, p_reg_b, p_group_id)
+
+def opcode_nop(p_splice_vm):
+    return p_splice_vm, EX_OPCODE_FINE
+
+def opcode_hlt(p_splice_vm):
+    return p_splice_vm, EX_TASK_HALTED
+
+# undecodable opcodes end the task
+def opcode_unknown(p_splice_vm):
+    return p_splice_vm, EX_OPC_UNKNOWN
+
+# operand layouts, as passed by the original if-chain
+OPR_ABC = 0 # op_a, op_b, op_c
+OPR_MEM = 1 # op_a, op_b, op_c, group_id, task_id, offset
+OPR_STR = 2 # op_a, op_c, task_info
+OPR_CMP = 3 # op_a, op_b, op_c, group_id
+OPR_TRG = 4 # opcode, op_a, op_b, op_c
+OPR_NON = 5 # no operands
+
+# The opcode semantics shared by all execution paths, unknown opcodes decode
+# to opcode_unknown. The compiled, optimized and batch paths only specialize
+# instructions whose operands they have checked and call the handler for the
+# others. Every path ends tasks through terminate_task.
+OPCODE_TABLE = {
+    OP_NOP: [opcode_nop, OPR_NON],
+    OP_HLT: [opcode_hlt, OPR_NON],
+    OP_MOV: [opcode_mov, OPR_MEM],
+    OP_LEA: [opcode_lea, OPR_MEM],
+    OP_CMP: [execute_cmp, OPR_CMP],
+    OP_SET: [opcode_set, OPR_ABC],
+    OP_GET: [opcode_get, OPR_ABC],
+    OP_ACT: [opcode_act, OPR_ABC],
+    OP_STR: [opcode_str, OPR_STR],
+    OP_FMA: [opcode_fma, OPR_ABC],
+    OP_FSD: [opcode_fsd, OPR_ABC],
+    OP_SIN: [opcode_trg, OPR_TRG],
+    OP_COS: [opcode_trg, OPR_TRG],
+    OP_TAN: [opcode_trg, OPR_TRG],
+    OP_POW: [opcode_pow, OPR_ABC],
+    OP_NOR: [opcode_nor, OPR_ABC],
+}
+
+def decode_instruction(p_word, p_group_id, p_task_id, p_offset, p_task_info):
+    word = unpack32to4x8(p_word)
+    opcode = word[0]
+    debug_info = "%s%s" % (p_task_info, "{:x}".format(p_word))
+    if opcode not in OPCODE_TABLE:
+        return (p_word, opcode, opcode_unknown, (), debug_info)
+    handler, layout = OPCODE_TABLE[opcode]
+    if layout == OPR_MEM:
+        operands = (word[1], word[2], word[3], p_group_id, p_task_id, p_offset)
+    elif layout == OPR_STR:
+        operands = (word[1], word[3], p_task_info)
+    elif layout == OPR_CMP:
+        operands = (word[1], word[2], word[3], p_group_id)
+    elif layout == OPR_TRG:
+        operands = (opcode, word[1], word[2], word[3])
+    elif layout == OPR_NON:
+        operands = ()
+    else:
+        operands = (word[1], word[2], word[3])
+    return (p_word, opcode, handler, operands, debug_info)
+
+# Code words (up to the data offset, or the whole task if it has none) are
+# decoded once per distinct program. MOV can write to task memory, so each
+# word is checked against the decoded one before it is executed.
+@lru_cache(maxsize=DECODED_TASK_CACHE)
+def decode_task(p_header, p_code):
+    group_id, task_id, interval_code, offset = decode_task_header(p_header)
     task_info = "%s:%s:" % (group_id, task_id)
-    while (next_opcode!=OP_HLT) and (ip<len(p_task)):
-        word = unpack32to4x8(p_task[ip])
-        p_splice_vm = log_message(p_splice_vm, "%s%s" %(task_info, "{:x}".format(p_task[ip])), LOG_LEVEL_DEBUG)
-        next_opcode = word[0]
-        op_a = word[1]
-        op_b = word[2]
-        op_c = word[3]
-        opc_result = EX_OPC_UNKNOWN
-        if next_opcode == OP_NOP:
-            opc_result = EX_OPCODE_FINE
-        if next_opcode == OP_HLT:
-            p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_task[0], TASK_COMPLETED)
-            return p_splice_vm
-        if next_opcode == OP_MOV:
-            p_splice_vm, opcode_result = opcode_mov(p_splice_vm, op_a, op_b, op_c, group_id, task_id, offset)
-        if next_opcode == OP_LEA:
-            p_splice_vm, opcode_result = opcode_lea(p_splice_vm, op_a, op_b, op_c, group_id, task_id, offset)
-        if next_opcode == OP_STR:
-            p_splice_vm, opcode_result = opcode_str(p_splice_vm, op_a, op_c, task_info)
-        if next_opcode == OP_CMP:
-            opcode_result = opcode_cmp(p_splice_vm, op_a, op_b, op_c, group_id)
-        if next_opcode == OP_GET:
-            p_splice_vm, opcode_result = opcode_get(p_splice_vm, op_a, op_b, op_c)
-        if next_opcode == OP_SET:
-            p_splice_vm, opcode_result = opcode_set(p_splice_vm, op_a, op_b, op_c)
-        if next_opcode == OP_ACT:
-            p_splice_vm, opcode_result = opcode_act(p_splice_vm, op_a, op_b, op_c)
-        if next_opcode == OP_FMA:
-            p_splice_vm, opcode_result = opcode_fma(p_splice_vm, op_a, op_b, op_c)
-        if next_opcode == OP_FSD:
-            p_splice_vm, opcode_result = opcode_fsd(p_splice_vm, op_a, op_b, op_c)
-        if next_opcode in [OP_SIN, OP_COS, OP_TAN]:
-            p_splice_vm, opcode_result = opcode_trg(p_splice_vm, next_opcode, op_a, op_b, op_c)
-        if next_opcode == OP_POW:
-            p_splice_vm, opcode_result = opcode_pow(p_splice_vm, op_a, op_b, op_c)
-        if next_opcode == OP_NOR:
-            p_splice_vm, opcode_result = opcode_nor(p_splice_vm, op_a, op_b, op_c)
-        if opcode_result == EX_BAD_OPERAND:
-            message_string = "%s%s" % (task_info, "ERROR - Bad operand in command word!")
-            p_splice_vm = log_message(p_splice_vm, message_string, LOG_LEVEL_ERROR)
-            p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_task[0], TASK_ERROR_OPC)
-            return p_splice_vm
-        if opcode_result == EX_OPC_UNKNOWN:
-            message_string = "%s%s" % (task_info, "ERROR - Undecodable opcode!")
-            p_splice_vm = log_message(p_splice_vm, message_string, LOG_LEVEL_ERROR)
-            p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_task[0], TASK_ERROR_OPC)
-            return p_splice_vm
-        if opcode_result == EX_CHECK_FALSE:
-            message_string = "%s%s" % (task_info, "Terminating task - execution conditions not met ")
-            p_splice_vm = log_message(p_splice_vm, message_string, LOG_LEVEL_INFO)
-            p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_task[0], TASK_CON_UNMET)
-            return p_splice_vm
+    instructions = tuple([decode_instruction(x, group_id, task_id, offset, task_info) for x in p_code])
+    return group_id, task_id, offset, task_info, instructions
+
+def get_task_key(p_task):
+    offset = decode_task_header(p_task[0])[3]
+    if offset>0:
+        return p_task[0], tuple(p_task[1:offset+1])
+    return p_task[0], tuple(p_task[1:])
+
+def get_decoded_task(p_task):
+    return decode_task(*get_task_key(p_task))
+
+# logs and records the task status for results that end a task
+def terminate_task(p_splice_vm, p_header, p_task_info, p_result):
+    if p_result == EX_TASK_HALTED:
+        p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_header, TASK_COMPLETED)
+    if p_result == EX_BAD_OPERAND:
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_ERROR, p_task_info, "ERROR - Bad operand in command word!")
+        p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_header, TASK_ERROR_OPC)
+    if p_result == EX_OPC_UNKNOWN:
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_ERROR, p_task_info, "ERROR - Undecodable opcode!")
+        p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_header, TASK_ERROR_OPC)
+    if p_result == EX_CHECK_FALSE:
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_INFO, p_task_info, "Terminating task - execution conditions not met ")
+        p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_header, TASK_CON_UNMET)
+    return p_splice_vm
+
+TASK_EXIT_RESULTS = (EX_TASK_HALTED, EX_BAD_OPERAND, EX_OPC_UNKNOWN, EX_CHECK_FALSE)
+
+def vm_interpret(p_splice_vm, p_task):
+    return vm_interpret_slice(p_splice_vm, p_task, 1, float("inf"), None)[0]
+
+# Runs p_task from p_ip for at most p_budget instructions, counting executed
+# opcodes unless p_opcode_counts is None. Returns the VM, the ip to resume
+# from (0 once the task is done) and the instructions run.
+def vm_interpret_slice(p_splice_vm, p_task, p_ip, p_budget, p_opcode_counts):
+    group_id, task_id, offset, task_info, instructions = get_decoded_task(p_task)
+    decoded_end = len(instructions) + 1
+    vm_flags = p_splice_vm["VFLAGS"]
+    ip = p_ip
+    executed = 0
+    while ip<len(p_task):
+        if executed>=p_budget:
+            return p_splice_vm, ip, executed
+        if ip<decoded_end and instructions[ip-1][0] == p_task[ip]:
+            word, next_opcode, handler, operands, debug_info = instructions[ip-1]
+        else:
+            word, next_opcode, handler, operands, debug_info = decode_instruction(p_task[ip], group_id, task_id, offset, task_info)
+        if p_opcode_counts is not None:
+            p_opcode_counts[next_opcode] = p_opcode_counts.get(next_opcode, 0) + 1
+        executed = executed + 1
+        if LOG_LEVEL_DEBUG>=vm_flags["VM_LOG_LEVEL"]:
+            p_splice_vm = log_message(p_splice_vm, debug_info, LOG_LEVEL_DEBUG)
+        p_splice_vm, opcode_result = handler(p_splice_vm, *operands)
+        if opcode_result in TASK_EXIT_RESULTS:
+            return terminate_task(p_splice_vm, p_task[0], task_info, opcode_result), 0, executed
         ip = ip + 1
+    return p_splice_vm, 0, executed
+
+################################################################################
+########################### SPLICE VM - TASK VERIFIER ##########################
+################################################################################
+# Tasks are checked once when they are loaded. Each diagnostic is
+# (ip, level, message): LOG_LEVEL_ERROR where the instruction ends the task
+# (bad operand, undecodable opcode) or raises, LOG_LEVEL_INFO where it runs
+# but is only checked at run time or has no effect. Tasks without errors are
+# run from an optimized program, see optimize_task.
+
+# GET sources per instrument and parameter, with the register bank written
+GET_PARAMETERS = {
+    (INST_NMF, P_NMF_TIME): "ALU",
+    (INST_FPU, P_FPU_NIL): "FPU",
+    (INST_FPU, P_FPU_ONE): "FPU",
+    (INST_FPU, P_FPU_EXP): "FPU",
+    (INST_FPU, P_FPU_PIE): "FPU",
+    (INST_VXM, P_VXM_TIME): "ALU",
+    (INST_VXM, P_VXM_PRSN): "FPU",
+    (INST_VXM, P_VXM_TLSC): "ALU",
+    (INST_VXM, P_VXM_DBUG): "ALU",
+    (INST_IMG, P_IMG_GAIN_R): "FPU",
+    (INST_IMG, P_IMG_GAIN_G): "FPU",
+    (INST_IMG, P_IMG_GAIN_B): "FPU",
+    (INST_IMG, P_IMG_EXPOSE): "FPU",
+    (INST_IMG, P_IMG_NUMBER): "ALU",
+    (INST_GPS, P_GPS_LATT): "FPU",
+    (INST_GPS, P_GPS_LONG): "FPU",
+    (INST_GPS, P_GPS_ALTT): "FPU",
+    (INST_GPS, P_GPS_TIME): "FPU",
+    (INST_ADC, P_ADC_MODE): "ALU",
+    (INST_ADC, P_ADC_MAGX): "FPU",
+    (INST_ADC, P_ADC_MAGY): "FPU",
+    (INST_ADC, P_ADC_MAGZ): "FPU",
+}
+
+# SET targets and ACT actions, with the register bank read (None: not read).
+# Other SET pairs are ignored (compatibility), other ACT pairs are bad operands.
+SET_PARAMETERS = {
+    (INST_IMG, P_IMG_GAIN_R): "FPU",
+    (INST_IMG, P_IMG_GAIN_G): "FPU",
+    (INST_IMG, P_IMG_GAIN_B): "FPU",
+    (INST_IMG, P_IMG_EXPOSE): "FPU",
+    (INST_VXM, P_VXM_PRSN): "FPU",
+    (INST_VXM, P_VXM_TLSC): "ALU",
+    (INST_VXM, P_VXM_DBUG): "ALU",
+}
+
+# A_ADC_TOSUN is left out, its handler fails (duration is never set)
+ACT_ACTIONS = {
+    (INST_IMG, A_IMG_DO_JPG): None,
+    (INST_IMG, A_IMG_DO_RAW): None,
+    (INST_IMG, A_IMG_DO_BMP): None,
+    (INST_IMG, A_IMG_DO_PNG): None,
+    (INST_ADC, A_ADC_NADIR): "FPU",
+    (INST_ADC, A_ADC_UNSET): None,
+    (INST_ADC, A_ADC_BDOTT): None,
+    (INST_ADC, A_ADC_TRACK): None,
+}
+
+# GET reads that only touch registers, see opcode_get
+FPU_CONSTANTS = {
+    P_FPU_NIL: 0.0,
+    P_FPU_ONE: 1.0,
+    P_FPU_EXP: 2.71828,
+    P_FPU_PIE: 3.14159,
+}
+
+ADC_PARAMETER_REGISTERS = {
+    P_ADC_SUNX: ADC_SX,
+    P_ADC_SUNY: ADC_SY,
+    P_ADC_SUNZ: ADC_SZ,
+    P_ADC_ANGX: ADC_AX,
+    P_ADC_ANGY: ADC_AY,
+    P_ADC_ANGZ: ADC_AZ,
+    P_ADC_QTNA: ADC_QA,
+    P_ADC_QTNB: ADC_QB,
+    P_ADC_QTNC: ADC_QC,
+    P_ADC_QTND: ADC_QD,
+    P_ADC_MTQX: ADC_MX,
+    P_ADC_MTQY: ADC_MY,
+    P_ADC_MTQZ: ADC_MZ,
+}
+
+ALU_OPERATORS = (ALU_EQ, ALU_NE, ALU_GT, ALU_LT, ALU_GE, ALU_LE)
+FPU_OPERATORS = (FPU_EQ, FPU_NE, FPU_GT, FPU_LT)
+
+# checks a register read from p_bank, reading an ADC register through the FPU
+# bank works but is reported
+def verify_register_read(p_bank, p_reg_id):
+    if p_bank == "ALU":
+        if is_alu_register(p_reg_id):
+            return None
+        return LOG_LEVEL_ERROR, "register %02x is not an ALU register" % p_reg_id
+    if is_fpu_register(p_reg_id):
+        return None
+    if p_reg_id<0x10:
+        return LOG_LEVEL_INFO, "reads ADC register %02x" % p_reg_id
+    return LOG_LEVEL_ERROR, "register %02x is not an FPU register" % p_reg_id
+
+def verify_register_write(p_bank, p_reg_id):
+    if p_bank == "ALU" and not is_alu_register(p_reg_id):
+        return LOG_LEVEL_ERROR, "register %02x is not an ALU register" % p_reg_id
+    if p_bank == "FPU" and not is_fpu_register(p_reg_id):
+        return LOG_LEVEL_ERROR, "register %02x is not an FPU register" % p_reg_id
+    return None
+
+# returns the diagnostics for one instruction, and the task memory length
+# once it has run (MOV RAM extends the memory)
+def verify_instruction(p_opcode, p_handler, p_operands, p_task_id, p_offset, p_memory_end):
+    if p_opcode == OP_MOV:
+        prefix, reg_id, addr = p_operands[0:3]
+        if prefix == PRE_MOV_REG:
+            if is_alu_register(reg_id) and is_alu_register(addr):
+                return [], p_memory_end
+            if is_fpu_register(reg_id) and is_fpu_register(addr):
+                return [], p_memory_end
+            return [(LOG_LEVEL_ERROR, "registers %02x and %02x are not in the same bank" % (reg_id, addr))], p_memory_end
+        if prefix == PRE_MOV_RAM:
+            if reg_id>=0x20:
+                return [(LOG_LEVEL_ERROR, "register %02x is not an FPU register" % reg_id)], p_memory_end
+            return [], max(p_memory_end, addr + p_offset + 1)
+        return [(LOG_LEVEL_ERROR, "unknown MOV prefix %02x" % prefix)], p_memory_end
+    if p_opcode == OP_LEA:
+        reg_id, source_id, addr = p_operands[0:3]
+        diagnostics = [verify_register_write("ALU" if reg_id<0x10 else "FPU", reg_id)]
+        if source_id != p_task_id:
+            diagnostics.append((LOG_LEVEL_INFO, "reads task %i, checked at run time" % source_id))
+        elif addr + p_offset>=p_memory_end:
+            diagnostics.append((LOG_LEVEL_ERROR, "address %i is past the end of the task data" % addr))
+        return diagnostics, p_memory_end
+    if p_opcode == OP_CMP:
+        oper, reg_a, reg_b = p_operands[0:3]
+        if oper in ALU_OPERATORS:
+            return [verify_register_read("ALU", reg_a), verify_register_read("ALU", reg_b)], p_memory_end
+        if oper in FPU_OPERATORS:
+            return [verify_register_read("FPU", reg_a), verify_register_read("FPU", reg_b)], p_memory_end
+        if oper in (TSX_EQ, TSX_NE):
+            diagnostics = [verify_register_read("ALU", reg_b)]
+            if reg_a != p_task_id:
+                diagnostics.append((LOG_LEVEL_INFO, "checks task %i, checked at run time" % reg_a))
+            return diagnostics, p_memory_end
+        return [(LOG_LEVEL_ERROR, "unknown CMP operator %02x" % oper)], p_memory_end
+    if p_opcode == OP_GET:
+        inst_id, param_id, reg_id = p_operands
+        if (inst_id, param_id) in GET_PARAMETERS:
+            return [verify_register_write(GET_PARAMETERS[(inst_id, param_id)], reg_id)], p_memory_end
+        if inst_id == INST_ADC and param_id in ADC_PARAMETER_REGISTERS:
+            return [verify_register_write("FPU", reg_id)], p_memory_end
+        return [(LOG_LEVEL_ERROR, "GET %02x:%02x is not supported" % (inst_id, param_id))], p_memory_end
+    if p_opcode == OP_SET:
+        inst_id, param_id, reg_id = p_operands
+        if (inst_id, param_id) in SET_PARAMETERS:
+            return [verify_register_read(SET_PARAMETERS[(inst_id, param_id)], reg_id)], p_memory_end
+        return [(LOG_LEVEL_INFO, "SET %02x:%02x has no effect" % (inst_id, param_id))], p_memory_end
+    if p_opcode == OP_ACT:
+        inst_id, param_id, reg_id = p_operands
+        if (inst_id, param_id) not in ACT_ACTIONS:
+            return [(LOG_LEVEL_ERROR, "ACT %02x:%02x is not supported" % (inst_id, param_id))], p_memory_end
+        if ACT_ACTIONS[(inst_id, param_id)] is None:
+            return [], p_memory_end
+        return [verify_register_read(ACT_ACTIONS[(inst_id, param_id)], reg_id)], p_memory_end
+    if p_opcode == OP_STR:
+        prefix, reg_id = p_operands[0:2]
+        if prefix == PRE_STR_FPU:
+            return [verify_register_read("FPU", reg_id)], p_memory_end
+        if prefix in (PRE_STR_ALU, PRE_STR_BIN):
+            return [verify_register_read("ALU", reg_id)], p_memory_end
+        return [(LOG_LEVEL_ERROR, "unknown STR prefix %02x" % prefix)], p_memory_end
+    if p_opcode in (OP_FMA, OP_FSD, OP_NOR):
+        registers = p_operands[0:3]
+        if all([is_alu_register(x) for x in registers]):
+            if p_opcode == OP_FSD:
+                return [(LOG_LEVEL_INFO, "fails at run time when register %02x is 0" % registers[0])], p_memory_end
+            return [], p_memory_end
+        if p_opcode != OP_NOR and all([is_fpu_register(x) for x in registers]):
+            if p_opcode == OP_FSD:
+                return [(LOG_LEVEL_INFO, "fails at run time unless register %02x is above FP precision" % registers[1])], p_memory_end
+            return [], p_memory_end
+        return [(LOG_LEVEL_ERROR, "registers %02x, %02x and %02x are not in the same bank" % registers)], p_memory_end
+    if p_opcode in (OP_SIN, OP_COS, OP_TAN, OP_POW):
+        prefix, reg_a, reg_b = p_operands[-3:]
+        diagnostics = [verify_register_write("FPU", reg_a), verify_register_write("FPU", reg_b)]
+        if diagnostics != [None, None]:
+            return diagnostics, p_memory_end
+        if prefix == PRE_NORMAL or (p_opcode == OP_POW and prefix == PRE_INVERT):
+            return [], p_memory_end
+        if prefix == PRE_INVERT:
+            return [(LOG_LEVEL_ERROR, "inverse functions are not supported")], p_memory_end
+        return [(LOG_LEVEL_ERROR, "unknown function prefix %02x" % prefix)], p_memory_end
+    return [], p_memory_end
+
+# p_length is the task memory length, data words included
+@lru_cache(maxsize=DECODED_TASK_CACHE)
+def verify_task(p_header, p_code, p_length):
+    group_id, task_id, offset, task_info, instructions = decode_task(p_header, p_code)
+    diagnostics = []
+    memory_end = p_length
+    for ip in range(1, len(instructions) + 1):
+        word, opcode, handler, operands, debug_info = instructions[ip-1]
+        if opcode == OP_HLT:
+            return tuple(diagnostics)
+        if opcode == OP_NOP:
+            continue
+        if handler is opcode_unknown:
+            diagnostics.append((ip, LOG_LEVEL_ERROR, "undecodable opcode %02x ends the task" % opcode))
+            continue
+        results, memory_end = verify_instruction(opcode, handler, operands, task_id, offset, memory_end)
+        diagnostics.extend([(ip,) + x for x in results if x is not None])
+    diagnostics.append((len(instructions), LOG_LEVEL_INFO, "no HLT, the task is never completed"))
+    return tuple(diagnostics)
+
+# FPU loads of data words the task has not written itself, these are only
+# known once the task is loaded (negative floats cannot be loaded, see
+# unpack_float_from_int)
+def verify_task_data(p_task):
+    header, code = get_task_key(p_task)
+    group_id, task_id, offset, task_info, instructions = decode_task(header, code)
+    diagnostics = []
+    written = set()
+    for ip in range(1, len(instructions) + 1):
+        word, opcode, handler, operands, debug_info = instructions[ip-1]
+        if opcode == OP_HLT:
+            break
+        if opcode == OP_MOV and operands[0] == PRE_MOV_RAM:
+            written.add(operands[2] + offset)
+        if opcode == OP_LEA and operands[1] == task_id and is_fpu_register(operands[0]):
+            key = operands[2] + offset
+            if key<len(p_task) and key not in written and not (isinstance(p_task[key], int) and 0<=p_task[key]<0x80000000):
+                diagnostics.append((ip, LOG_LEVEL_ERROR, "data word %i cannot be loaded as a float" % operands[2]))
+    return tuple(diagnostics)
+
+def get_task_diagnostics(p_task):
+    return verify_task(*get_task_key(p_task), len(p_task)) + verify_task_data(p_task)
+
+def is_task_verified(p_task):
+    return all([x[1] != LOG_LEVEL_ERROR for x in get_task_diagnostics(p_task)])
+
+################################################################################
+########################## SPLICE VM - TASK OPTIMIZER ##########################
+################################################################################
+# Verified straight-line tasks are run as a list of [operation, operands].
+# Operand checks were done by the verifier, so register-only opcodes skip their
+# handler, constant GET loads are folded and NOPs are dropped. Operations
+# return the opcode result. Tasks logging debug messages, or setting the log
+# level, stay interpreted since each instruction has to be logged.
+def verified_call(p_splice_vm, p_handler, p_operands):
+    return p_handler(p_splice_vm, *p_operands)[1]
+
+def verified_fill(p_splice_vm, p_bank, p_reg_id, p_value):
+    p_splice_vm["VCPU"][p_bank][p_reg_id] = p_value
+    return EX_OPCODE_FINE
+
+def verified_mov(p_splice_vm, p_bank, p_reg_id, p_addr):
+    registers = p_splice_vm["VCPU"][p_bank]
+    registers[p_addr] = registers[p_reg_id]
+    return EX_OPCODE_FINE
+
+def verified_lea(p_splice_vm, p_bank, p_reg_id, p_group_id, p_task_id, p_key):
+    data = p_splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"][p_group_id][p_task_id][p_key]
+    if p_bank == "FPU_REGISTERS":
+        data = unpack_float_from_int(data)
+    p_splice_vm["VCPU"][p_bank][p_reg_id] = data
+    return EX_OPCODE_FINE
+
+def verified_fma(p_splice_vm, p_bank, p_reg_a, p_reg_b, p_reg_c):
+    registers = p_splice_vm["VCPU"][p_bank]
+    registers[p_reg_c] = registers[p_reg_c] * registers[p_reg_b]
+    registers[p_reg_c] = registers[p_reg_c] + registers[p_reg_a]
+    return EX_OPCODE_FINE
+
+def verified_nor(p_splice_vm, p_reg_a, p_reg_b, p_reg_c):
+    registers = p_splice_vm["VCPU"]["ALU_REGISTERS"]
+    registers[p_reg_c] = ~(registers[p_reg_a] | registers[p_reg_b])
+    return EX_OPCODE_FINE
+
+def verified_function(p_splice_vm, p_function, p_reg_a, p_reg_b):
+    registers = p_splice_vm["VCPU"]["FPU_REGISTERS"]
+    registers[p_reg_b] = p_function(registers[p_reg_a])
+    return EX_OPCODE_FINE
+
+def verified_pow(p_splice_vm, p_reg_a, p_reg_b):
+    registers = p_splice_vm["VCPU"]["FPU_REGISTERS"]
+    registers[p_reg_b] = pow(registers[p_reg_b], registers[p_reg_a])
+    return EX_OPCODE_FINE
+
+VERIFIED_FUNCTIONS = {
+    OP_SIN: sin,
+    OP_COS: cos,
+    OP_TAN: tan,
+}
+
+def optimize_instruction(p_opcode, p_handler, p_operands, p_header, p_task_id):
+    call = [verified_call, (p_handler, p_operands)]
+    if p_opcode == OP_MOV and p_operands[0] == PRE_MOV_REG:
+        bank = "ALU_REGISTERS" if is_alu_register(p_operands[1]) else "FPU_REGISTERS"
+        return [verified_mov, (bank, p_operands[1], p_operands[2])]
+    if p_opcode == OP_LEA and p_operands[1] == p_task_id:
+        reg_id, addr, group_id, task_id, offset = p_operands[0], p_operands[2], p_operands[3], p_operands[4], p_operands[5]
+        bank = "ALU_REGISTERS" if is_alu_register(reg_id) else "FPU_REGISTERS"
+        return [verified_lea, (bank, reg_id, group_id, task_id, addr + offset)]
+    if p_opcode == OP_CMP:
+        return [opcode_cmp, p_operands]
+    if p_opcode == OP_GET:
+        inst_id, param_id, reg_id = p_operands
+        if inst_id == INST_FPU and param_id in FPU_CONSTANTS:
+            return [verified_fill, ("FPU_REGISTERS", reg_id, FPU_CONSTANTS[param_id])]
+        if inst_id == INST_ADC and param_id in ADC_PARAMETER_REGISTERS:
+            return [verified_mov, ("FPU_REGISTERS", ADC_PARAMETER_REGISTERS[param_id], reg_id)]
+    if p_opcode == OP_FMA:
+        bank = "ALU_REGISTERS" if is_alu_register(p_operands[0]) else "FPU_REGISTERS"
+        return [verified_fma, (bank,) + p_operands]
+    if p_opcode == OP_NOR:
+        return [verified_nor, p_operands]
+    if p_opcode in VERIFIED_FUNCTIONS:
+        return [verified_function, (VERIFIED_FUNCTIONS[p_opcode], p_operands[2], p_operands[3])]
+    if p_opcode == OP_POW and p_operands[0] == PRE_NORMAL:
+        return [verified_pow, p_operands[1:3]]
+    if p_opcode == OP_POW:
+        return [verified_function, (log, p_operands[1], p_operands[2])]
+    return call
+
+# the program up to the HLT, None for tasks that have to be interpreted
+@lru_cache(maxsize=DECODED_TASK_CACHE)
+def optimize_task(p_header, p_code, p_length):
+    last = get_task_code_end(p_header, p_code)
+    if last is None:
+        return None
+    if any([x[1] == LOG_LEVEL_ERROR for x in verify_task(p_header, p_code, p_length)]):
+        return None
+    group_id, task_id, offset, task_info, instructions = decode_task(p_header, p_code)
+    program = []
+    for word, opcode, handler, operands, debug_info in instructions[0:last]:
+        if opcode == OP_SET and operands[0:2] == (INST_VXM, P_VXM_DBUG):
+            return None
+        if opcode != OP_NOP:
+            program.append(optimize_instruction(opcode, handler, operands, p_header, task_id))
+    return tuple(program)
+
+def get_optimized_task(p_task):
+    return optimize_task(*get_task_key(p_task), len(p_task))
+
+def vm_run_optimized(p_splice_vm, p_task, p_program):
+    for operation, operands in p_program:
+        opcode_result = operation(p_splice_vm, *operands)
+        if opcode_result in TASK_EXIT_RESULTS:
+            return terminate_task(p_splice_vm, p_task[0], get_decoded_task(p_task)[3], opcode_result)
     return p_splice_vm
 
+################################################################################
+########################## SPLICE VM - TASK COMPILER ###########################
+################################################################################
+# Straight-line tasks are translated to one Python function each. Register
+# files are bound to locals, register-only opcodes are inlined and the other
+# opcodes call their handlers. Tasks the compiler cannot prove equivalent
+# (no HLT, MOV writing into the code) stay interpreted.
+CMP_EXPRESSIONS = {
+    ALU_EQ: "alu[%i] == alu[%i]",
+    ALU_NE: "alu[%i] == alu[%i]", # same as ALU_EQ, see opcode_cmp
+    ALU_GT: "alu[%i] > alu[%i]",
+    ALU_LT: "alu[%i] < alu[%i]",
+    ALU_GE: "alu[%i] >= alu[%i]",
+    ALU_LE: "alu[%i] <= alu[%i]",
+    FPU_EQ: "abs(abs(fpu[%i]) - abs(fpu[%i])) < flags['FP_PRECISION']",
+    FPU_NE: "abs(abs(fpu[%i]) - abs(fpu[%i])) > flags['FP_PRECISION']",
+    FPU_GT: "fpu[%i] > fpu[%i]",
+    FPU_LT: "fpu[%i] < fpu[%i]",
+}
+
+STR_EXPRESSIONS = {
+    PRE_STR_ALU: "alu[%i]",
+    PRE_STR_FPU: "fpu[%i]",
+    PRE_STR_BIN: "'{0:b}'.format(alu[%i])",
+}
+
+TRG_FUNCTIONS = {
+    OP_SIN: "sin",
+    OP_COS: "cos",
+    OP_TAN: "tan",
+}
+
+def is_alu_register(p_reg_id):
+    return p_reg_id<0x10
+
+def is_fpu_register(p_reg_id):
+    return (p_reg_id>0x0F) and (p_reg_id<0x20)
+
+def compile_exit(p_result, p_task_info):
+    return ["return terminate_task(p_splice_vm, p_task[0], %r, %s)" % (p_task_info, p_result)]
+
+def compile_call(p_handler, p_operands, p_task_info):
+    return [
+        "p_splice_vm, opcode_result = %s(p_splice_vm, %s)" % (p_handler.__name__, ", ".join([repr(x) for x in p_operands])),
+        "if opcode_result in TASK_EXIT_RESULTS:",
+        "    return terminate_task(p_splice_vm, p_task[0], %r, opcode_result)" % p_task_info,
+    ]
+
+def compile_instruction(p_opcode, p_handler, p_operands, p_task_info):
+    if p_opcode == OP_HLT:
+        return compile_exit("EX_TASK_HALTED", p_task_info)
+    if p_opcode == OP_NOP:
+        return []
+    if p_handler is opcode_unknown:
+        return compile_exit("EX_OPC_UNKNOWN", p_task_info)
+    if p_opcode in [OP_FMA, OP_NOR]:
+        reg_a, reg_b, reg_c = p_operands
+        if is_alu_register(reg_a) and is_alu_register(reg_b) and is_alu_register(reg_c):
+            registers = "alu"
+        elif p_opcode == OP_FMA and is_fpu_register(reg_a) and is_fpu_register(reg_b) and is_fpu_register(reg_c):
+            registers = "fpu"
+        else:
+            return compile_exit("EX_BAD_OPERAND", p_task_info)
+        if p_opcode == OP_NOR:
+            return ["%s[%i] = ~(%s[%i] | %s[%i])" % (registers, reg_c, registers, reg_a, registers, reg_b)]
+        return [
+            "%s[%i] = %s[%i] * %s[%i]" % (registers, reg_c, registers, reg_c, registers, reg_b),
+            "%s[%i] = %s[%i] + %s[%i]" % (registers, reg_c, registers, reg_c, registers, reg_a),
+        ]
+    if p_opcode == OP_MOV and p_operands[0] == PRE_MOV_REG:
+        reg_id, addr = p_operands[1], p_operands[2]
+        if is_alu_register(reg_id) and is_alu_register(addr):
+            return ["alu[%i] = alu[%i]" % (addr, reg_id)]
+        if reg_id>0x0F and addr>0x0F:
+            return ["fpu[%i] = fpu[%i]" % (addr, reg_id)]
+        return compile_exit("EX_BAD_OPERAND", p_task_info)
+    if p_opcode == OP_LEA and p_operands[1] == p_operands[4]:
+        reg_id, addr, group_id, task_id, offset = p_operands[0], p_operands[2], p_operands[3], p_operands[4], p_operands[5]
+        memory = "p_splice_vm['VRAM']['PROGRAM_CODE_MEMORY'][%i][%i][%i]" % (group_id, task_id, addr + offset)
+        if is_alu_register(reg_id):
+            return ["alu[%i] = %s" % (reg_id, memory)]
+        if is_fpu_register(reg_id):
+            return ["fpu[%i] = unpack_float_from_int(%s)" % (reg_id, memory)]
+    if p_opcode == OP_GET and is_fpu_register(p_operands[2]):
+        inst_id, param_id, reg_id = p_operands
+        if inst_id == INST_FPU and param_id in FPU_CONSTANTS:
+            return ["fpu[%i] = %r" % (reg_id, FPU_CONSTANTS[param_id])]
+        if inst_id == INST_ADC and param_id in ADC_PARAMETER_REGISTERS:
+            return ["fpu[%i] = fpu[%i]" % (reg_id, ADC_PARAMETER_REGISTERS[param_id])]
+    if p_opcode == OP_CMP and p_operands[0] not in [TSX_EQ, TSX_NE]:
+        oper, reg_a, reg_b = p_operands[0], p_operands[1], p_operands[2]
+        if oper not in CMP_EXPRESSIONS:
+            return compile_exit("EX_BAD_OPERAND", p_task_info)
+        return ["if not (%s):" % (CMP_EXPRESSIONS[oper] % (reg_a, reg_b))] + ["    " + x for x in compile_exit("EX_CHECK_FALSE", p_task_info)]
+    if p_opcode == OP_STR:
+        prefix, reg_id = p_operands[0], p_operands[1]
+        if prefix not in STR_EXPRESSIONS:
+            return compile_exit("EX_BAD_OPERAND", p_task_info)
+        return [
+            "if LOG_LEVEL_INFO>=flags['VM_LOG_LEVEL']:",
+            "    out.append('%%s%%s' %% (%r, %s))" % (p_task_info, STR_EXPRESSIONS[prefix] % reg_id),
+        ]
+    if p_opcode in TRG_FUNCTIONS:
+        prefix, reg_a, reg_b = p_operands[1], p_operands[2], p_operands[3]
+        if not (is_fpu_register(reg_a) and is_fpu_register(reg_b)):
+            return compile_exit("EX_BAD_OPERAND", p_task_info)
+        if prefix == PRE_NORMAL:
+            return ["fpu[%i] = %s(fpu[%i])" % (reg_b, TRG_FUNCTIONS[p_opcode], reg_a)]
+    if p_opcode == OP_POW:
+        prefix, reg_a, reg_b = p_operands
+        if not (is_fpu_register(reg_a) and is_fpu_register(reg_b)):
+            return compile_exit("EX_BAD_OPERAND", p_task_info)
+        if prefix == PRE_NORMAL:
+            return ["fpu[%i] = pow(fpu[%i], fpu[%i])" % (reg_b, reg_b, reg_a)]
+        if prefix == PRE_INVERT:
+            return ["fpu[%i] = log(fpu[%i])" % (reg_b, reg_a)]
+        return compile_exit("EX_OPC_UNKNOWN", p_task_info)
+    return compile_call(p_handler, p_operands, p_task_info)
+
+# ip of the HLT ending a straight-line task, None for tasks that have to be
+# interpreted (no HLT, MOV writing into the code)
+def get_task_code_end(p_header, p_code):
+    group_id, task_id, offset, task_info, instructions = decode_task(p_header, p_code)
+    opcodes = [x[1] for x in instructions]
+    if OP_HLT not in opcodes:
+        return None
+    last = opcodes.index(OP_HLT) + 1
+    for item in instructions[0:last]:
+        if item[1] == OP_MOV and item[3][0] == PRE_MOV_RAM and item[3][2] + offset <= last:
+            return None
+    return last
+
+def generate_task_source(p_header, p_code):
+    last = get_task_code_end(p_header, p_code)
+    if last is None:
+        return None
+    group_id, task_id, offset, task_info, instructions = decode_task(p_header, p_code)
+    lines = [
+        "def splice_task(p_splice_vm, p_task):",
+        "    alu = p_splice_vm['VCPU']['ALU_REGISTERS']",
+        "    fpu = p_splice_vm['VCPU']['FPU_REGISTERS']",
+        "    flags = p_splice_vm['VFLAGS']",
+        "    out = p_splice_vm['VBUS']['INST_LOGS']['OUT']",
+    ]
+    for ip in range(1, last + 1):
+        word, opcode, handler, operands, debug_info = instructions[ip-1]
+        lines.append("    # %i: %08x" % (ip, word))
+        lines.append("    if LOG_LEVEL_DEBUG>=flags['VM_LOG_LEVEL']:")
+        lines.append("        out.append(%r)" % debug_info)
+        lines.extend(["    " + x for x in compile_instruction(opcode, handler, operands, task_info)])
+    return "\n".join(lines) + "\n"
+
+@lru_cache(maxsize=DECODED_TASK_CACHE)
+def compile_task(p_header, p_code):
+    source = generate_task_source(p_header, p_code)
+    if source is None:
+        return None
+    namespace = {}
+    exec(compile(source, "<splice task %x>" % p_header, "exec"), globals(), namespace)
+    return namespace["splice_task"]
+
+def get_compiled_task(p_task):
+    return compile_task(*get_task_key(p_task))
+
+def vm_execute(p_splice_vm, p_task):
+    if p_splice_vm["VFLAGS"].get("VM_EXEC_MODE", DEFAULT_VM_EXEC_MODE) == VM_EXEC_COMPILE:
+        compiled_task = get_compiled_task(p_task)
+        if compiled_task is not None:
+            return compiled_task(p_splice_vm, p_task)
+    if LOG_LEVEL_DEBUG<p_splice_vm["VFLAGS"]["VM_LOG_LEVEL"]:
+        program = get_optimized_task(p_task)
+        if program is not None:
+            return vm_run_optimized(p_splice_vm, p_task, program)
+    return vm_interpret(p_splice_vm, p_task)
+
+# p_task_code is either source lines or a .splb object
 def load_user_task(p_splice_vm, p_task_code):
-    program_bytecode = process_program_code(p_task_code, False)
+    program_bytecode = assemble_program(p_task_code)
+    task_info = get_decoded_task(program_bytecode)[3]
+    errors = [x for x in get_task_diagnostics(program_bytecode) if x[1] == LOG_LEVEL_ERROR]
+    if len(errors)>0 and p_splice_vm["VFLAGS"].get("VM_VERIFY", DEFAULT_VM_VERIFY) == VM_VERIFY_REJECT:
+        raise Exception("Task %srejected at instruction %i: %s" % (task_info, errors[0][0], errors[0][2]))
+    for item in errors:
+        p_splice_vm = log_message(p_splice_vm, "%s%s", LOG_LEVEL_ERROR, task_info, "WARNING - instruction %i: %s" % (item[0], item[2]))
     p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", program_bytecode[0], TASK_LOADED_OK)
     p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_WASRUN", program_bytecode[0], TASK_TIME_ZERO)
     p_splice_vm = set_vram_content(p_splice_vm, "PROGRAM_CODE_MEMORY", program_bytecode[0], program_bytecode)
+    p_splice_vm["VRAM"]["TASK_SCHEDULE"] = None
+    resume = p_splice_vm["VRAM"].get("TASK_RESUME", None)
+    if resume is not None and resume[0:2] == list(decode_task_header(program_bytecode[0])[0:2]):
+        p_splice_vm["VRAM"]["TASK_RESUME"] = None
+    get_optimized_task(program_bytecode)
     return p_splice_vm
 
 # flush all tasks from memory
@@ -789,25 +1467,773 @@ def clear_task_list(p_splice_vm):
     p_splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"].clear()
     p_splice_vm["VRAM"]["TASK_CONTEXT_STATUS"].clear()
     p_splice_vm["VRAM"]["TASK_CONTEXT_WASRUN"].clear()
+    p_splice_vm["VRAM"]["TASK_SCHEDULE"] = None
+    p_splice_vm["VRAM"]["TASK_RESUME"] = None
     return p_splice_vm
 
-def run_sheduled_tasks(p_splice_vm):
+# The schedule is a heap of [due_time, order, group_id, task_id] entries, one
+# per task, where order is the task position in PROGRAM_CODE_MEMORY. It is
+# derived from the task headers, statuses and last run times, and rebuilt when
+# tasks are loaded. Due tasks still run in memory order and are checked with
+# check_frequency, so tasks not due yet get TASK_CON_UNMET on the first tick
+# they are skipped, as before. Finished FREQ_ONCE tasks leave the heap.
+def get_task_interval(p_header):
+    interval_code = decode_task_header(p_header)[2]
+    if interval_code < FREQ_1MIN:
+        return interval_code
+    if (interval_code >=FREQ_1MIN) and (interval_code <FREQ_HOUR):
+        return (interval_code-59)*60
+    if (interval_code >=FREQ_HOUR) and (interval_code <FREQ_TMAX):
+        return (interval_code-118)*3600
+    return 0
+
+def build_task_schedule(p_splice_vm):
+    schedule = []
+    vm_time = get_vm_time(p_splice_vm)
+    order = 0
+    for group_id, group in p_splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"].items():
+        for task_id, task in group.items():
+            if check_frequency(p_splice_vm, task[0]) != VM_TASK_FINISHED:
+                schedule.append([vm_time, order, group_id, task_id])
+            order = order + 1
+    heapq.heapify(schedule)
+    p_splice_vm["VRAM"]["TASK_SCHEDULE"] = schedule
+    return p_splice_vm
+
+# Each tick may run VFLAGS["VM_TICK_BUDGET"] instructions. Tasks that fit in
+# the remaining budget run through vm_execute and are charged their length.
+# Longer tasks, and all tasks while profiling, run through vm_interpret_slice.
+# When the budget runs out, the task context is kept in VRAM["TASK_RESUME"] as
+# [group_id, task_id, ip, status] and the task shows
+# TASK_SUSPENDED. It resumes first on the next tick and no other task runs
+# until it has finished, so the registers it uses are left alone.
+def get_tick_budget(p_splice_vm):
+    budget = p_splice_vm["VFLAGS"].get("VM_TICK_BUDGET", DEFAULT_VM_TICK_BUDGET)
+    if budget>0:
+        return budget
+    return float("inf")
+
+def suspend_task(p_splice_vm, p_task, p_ip):
+    group_id, task_id = decode_task_header(p_task[0])[0:2]
+    status = get_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_task[0])
+    p_splice_vm["VRAM"]["TASK_RESUME"] = [group_id, task_id, p_ip, status]
+    p_splice_vm["VRAM"]["BUDGET_OVERRUNS"] = p_splice_vm["VRAM"].get("BUDGET_OVERRUNS", 0) + 1
+    return set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", p_task[0], TASK_SUSPENDED)
+
+# returns the VM and the budget used, tasks are only started with budget left
+def run_task_slice(p_splice_vm, p_task, p_ip, p_budget, p_profile):
+    length = len(p_task) - p_ip
+    opcode_counts = {}
+    start = time.perf_counter()
+    p_splice_vm, ip, executed = vm_interpret_slice(p_splice_vm, p_task, p_ip, p_budget, opcode_counts)
+    if p_profile is not None:
+        p_profile = record_task_profile(p_profile, p_task, opcode_counts, time.perf_counter() - start, p_ip == 1)
+    if ip>0:
+        p_splice_vm = suspend_task(p_splice_vm, p_task, ip)
+    if length<=p_budget:
+        return p_splice_vm, length
+    return p_splice_vm, executed
+
+def resume_task(p_splice_vm, p_budget, p_profile):
+    # states saved with the former opcode result entry are still read
+    group_id, task_id, ip, status = p_splice_vm["VRAM"]["TASK_RESUME"][0:4]
+    p_splice_vm["VRAM"]["TASK_RESUME"] = None
+    task = p_splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"].get(group_id, {}).get(task_id, None)
+    if task is None:
+        return p_splice_vm, p_budget
+    p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", task[0], status)
+    p_splice_vm, used = run_task_slice(p_splice_vm, task, ip, p_budget, p_profile)
+    return p_splice_vm, p_budget - used
+
+# Runs one tick, yielding the tasks the caller has to run whole through
+# vm_execute, or vm_execute_batch, see run_sheduled_tasks_batch
+def tick_sheduled_tasks(p_splice_vm):
+    p_splice_vm = trim_vm_log(p_splice_vm)
     # advance vm clocks
     p_splice_vm = advance_vm_clocks(p_splice_vm, p_splice_vm["VFLAGS"]["VM_TIMESLICE"])
-    # run loaded tasks
-    for item in p_splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"].items():
-        for i in item[1].items():
-            task_header = i[1][0]
+    if p_splice_vm["VRAM"].get("TASK_SCHEDULE", None) is None:
+        p_splice_vm = build_task_schedule(p_splice_vm)
+    profile = None
+    if p_splice_vm["VFLAGS"].get("VM_PROFILE", DEFAULT_VM_PROFILE):
+        profile = start_profile_tick(p_splice_vm)
+    budget = get_tick_budget(p_splice_vm)
+    # a suspended task runs first
+    resumed = p_splice_vm["VRAM"].get("TASK_RESUME", None)
+    if resumed is not None:
+        p_splice_vm, budget = resume_task(p_splice_vm, budget, profile)
+        if p_splice_vm["VRAM"]["TASK_RESUME"] is not None:
+            return
+    schedule = p_splice_vm["VRAM"]["TASK_SCHEDULE"]
+    vm_time = get_vm_time(p_splice_vm)
+    due_tasks = []
+    while len(schedule)>0 and schedule[0][0]<=vm_time:
+        due_tasks.append(heapq.heappop(schedule))
+    due_tasks.sort(key=lambda x: x[1])
+    # run due tasks, entries not handled yet go back on the heap when a task
+    # raises or the tick is closed, so the other tasks keep being scheduled
+    handled = 0
+    try:
+        for i, entry in enumerate(due_tasks):
+            handled = i
+            # out of budget, the remaining tasks stay due
+            if p_splice_vm["VRAM"].get("TASK_RESUME", None) is not None:
+                heapq.heappush(schedule, entry)
+                continue
+            task = p_splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"][entry[2]][entry[3]]
+            task_header = task[0]
+            entry[0] = vm_time
+            # a resumed task has just finished, it is checked on the next tick
+            if resumed is not None and entry[2:] == resumed[0:2]:
+                heapq.heappush(schedule, entry)
+                continue
             if get_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", task_header) > TASK_NOTLOADED:
                 freq = check_frequency(p_splice_vm, task_header)
+                if freq == VM_TASK_FINISHED:
+                    continue
                 if freq == VM_TASK_NOTREADY:
                     p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_STATUS", task_header, TASK_CON_UNMET)
+                    entry[0] = get_vram_content(p_splice_vm, "TASK_CONTEXT_WASRUN", task_header) + get_task_interval(task_header)
                 elif freq == VM_TASK_IS_READY:
-                    p_splice_vm = vm_execute(p_splice_vm, i[1])
-                    vm_time = get_vm_time(p_splice_vm)
-                    p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_WASRUN", task_header, vm_time)
+                    # the budget is used up, the task stays due for the next tick
+                    if budget<=0:
+                        heapq.heappush(schedule, entry)
+                        continue
+                    used = len(task) - 1
+                    if profile is None and used<=budget:
+                        yield task
+                    else:
+                        p_splice_vm, used = run_task_slice(p_splice_vm, task, 1, budget, profile)
+                    budget = budget - used
+                    p_splice_vm = set_vram_content(p_splice_vm, "TASK_CONTEXT_WASRUN", task_header, get_vm_time(p_splice_vm))
+            heapq.heappush(schedule, entry)
+        handled = len(due_tasks)
+    finally:
+        for entry in due_tasks[handled:]:
+            heapq.heappush(schedule, entry)
+
+def run_sheduled_tasks(p_splice_vm):
+    ticker = tick_sheduled_tasks(p_splice_vm)
+    try:
+        for task in ticker:
+            p_splice_vm = vm_execute(p_splice_vm, task)
+    finally:
+        ticker.close()
     return p_splice_vm
 
+def next_batch_task(p_ticker, p_errors, p_index):
+    try:
+        return next(p_ticker, None)
+    except Exception as e:
+        p_errors[p_index] = e
+        return None
+
+# Ticks many VMs. Due tasks with the same program are run together through
+# vm_execute_batch, each VM still runs its own tasks in its own order.
+# Returns the exception raised in each VM, None where the tick went fine.
+def run_sheduled_tasks_batch(p_splice_vms):
+    tickers = [tick_sheduled_tasks(x) for x in p_splice_vms]
+    errors = [None] * len(p_splice_vms)
+    pending = [next_batch_task(tickers[i], errors, i) for i in range(0, len(tickers))]
+    while True:
+        groups = {}
+        for i in range(0, len(pending)):
+            if pending[i] is not None:
+                groups.setdefault(get_task_key(pending[i]), []).append(i)
+        if len(groups) == 0:
+            return errors
+        for lanes in groups.values():
+            lane_errors = vm_execute_batch([p_splice_vms[i] for i in lanes], [pending[i] for i in lanes])
+            for i, error in zip(lanes, lane_errors):
+                if error is not None:
+                    errors[i] = error
+                    tickers[i].close()
+                    pending[i] = None
+                else:
+                    pending[i] = next_batch_task(tickers[i], errors, i)
+
+################################################################################
+######################## SPLICE VM - BATCH EXECUTION ###########################
+################################################################################
+# One straight-line task is run in many VMs at once. The register files are
+# gathered into lane x register matrices (FPU as float64, ALU as objects, since
+# ALU registers hold Python ints of any size). Register-only opcodes run as one
+# NumPy operation over the active lanes. Memory, bus, log and VM flag access is
+# gathered or scattered per lane, other opcodes call their handler per lane.
+# CMP and HLT clear the lanes they end. A lane the batch cannot follow exactly
+# (an operand the handler would fail on, a non-float FPU value...) leaves the
+# batch and finishes the task through vm_interpret_slice.
+
+# int or numpy values in FPU registers are left to the handlers
+BATCH_FPU_TYPES = {float}
+
+# False for VMs the batch cannot represent exactly
+def is_batch_lane(p_splice_vm):
+    alu = p_splice_vm["VCPU"]["ALU_REGISTERS"]
+    fpu = p_splice_vm["VCPU"]["FPU_REGISTERS"]
+    if len(alu) != ALU_REG_COUNT or len(fpu) != FPU_REG_COUNT:
+        return False
+    if type(p_splice_vm["VFLAGS"]["FP_PRECISION"]) is not float or type(p_splice_vm["VFLAGS"]["VM_LOG_LEVEL"]) is not int:
+        return False
+    return set(map(type, fpu)) == BATCH_FPU_TYPES
+
+# Reads the lane registers and flags from their VMs
+def load_batch_lanes(p_batch, p_lanes):
+    if len(p_lanes) == 0:
+        return
+    splice_vms = [p_batch["VMS"][x] for x in p_lanes]
+    log_levels = [x["VFLAGS"]["VM_LOG_LEVEL"] for x in splice_vms]
+    p_batch["ALU"][p_lanes] = np.array([x["VCPU"]["ALU_REGISTERS"] for x in splice_vms], dtype=object)
+    p_batch["FPU"][p_lanes] = [x["VCPU"]["FPU_REGISTERS"] for x in splice_vms]
+    p_batch["PRECISION"][p_lanes] = [x["VFLAGS"]["FP_PRECISION"] for x in splice_vms]
+    p_batch["DEBUG"][p_lanes] = [LOG_LEVEL_DEBUG>=x for x in log_levels]
+    p_batch["INFO"][p_lanes] = [LOG_LEVEL_INFO>=x for x in log_levels]
+
+# Writes the lane registers back to their VMs
+def store_batch_lanes(p_batch, p_lanes):
+    alu = p_batch["ALU"][p_lanes].tolist()
+    fpu = p_batch["FPU"][p_lanes].tolist()
+    for i in range(0, len(p_lanes)):
+        splice_vm = p_batch["VMS"][p_lanes[i]]
+        splice_vm["VCPU"]["ALU_REGISTERS"][:] = alu[i]
+        splice_vm["VCPU"]["FPU_REGISTERS"][:] = fpu[i]
+
+def create_batch(p_splice_vms, p_tasks, p_errors):
+    lanes = len(p_splice_vms)
+    batch = {
+        "VMS": p_splice_vms,
+        "TASKS": p_tasks,
+        "ERRORS": p_errors,
+        "HEADER": p_tasks[0][0],
+        "TASK_INFO": get_decoded_task(p_tasks[0])[3],
+        "ALU": np.zeros((lanes, ALU_REG_COUNT), dtype=object),
+        "FPU": np.zeros((lanes, FPU_REG_COUNT)),
+        "PRECISION": np.zeros(lanes),
+        "DEBUG": np.zeros(lanes, dtype=bool),
+        "INFO": np.zeros(lanes, dtype=bool),
+        "ACTIVE": np.zeros(lanes, dtype=bool),
+    }
+    for lane in range(0, lanes):
+        batch["ACTIVE"][lane] = is_batch_lane(p_splice_vms[lane])
+        if not batch["ACTIVE"][lane]:
+            try:
+                vm_execute(p_splice_vms[lane], p_tasks[lane])
+            except Exception as e:
+                p_errors[lane] = e
+    load_batch_lanes(batch, np.flatnonzero(batch["ACTIVE"]))
+    return batch
+
+# the lane finishes the task on its own, from p_ip
+def eject_batch_lane(p_batch, p_lane, p_ip):
+    p_batch["ACTIVE"][p_lane] = False
+    try:
+        vm_interpret_slice(p_batch["VMS"][p_lane], p_batch["TASKS"][p_lane], p_ip, float("inf"), {})
+    except Exception as e:
+        p_batch["ERRORS"][p_lane] = e
+
+def retire_batch_lanes(p_batch, p_lanes):
+    p_batch["ACTIVE"][p_lanes] = False
+    store_batch_lanes(p_batch, p_lanes)
+
+# Ejects the lanes set in p_eject before p_ip runs, then logs the instruction
+# in the remaining lanes. Returns the remaining lanes.
+def begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, p_eject=None):
+    if p_eject is not None and p_eject.any():
+        store_batch_lanes(p_batch, p_lanes[p_eject])
+        for lane in p_lanes[p_eject]:
+            eject_batch_lane(p_batch, lane, p_ip)
+        p_lanes = p_lanes[~p_eject]
+    for lane in p_lanes[p_batch["DEBUG"][p_lanes]]:
+        log_message(p_batch["VMS"][lane], p_debug_info, LOG_LEVEL_DEBUG)
+    return p_lanes
+
+# calls the opcode handler in each lane, as vm_interpret does
+def step_batch_lanes(p_batch, p_lanes, p_ip, p_handler, p_operands):
+    store_batch_lanes(p_batch, p_lanes)
+    for lane in p_lanes:
+        splice_vm = p_batch["VMS"][lane]
+        try:
+            splice_vm, opcode_result = p_handler(splice_vm, *p_operands)
+        except Exception as e:
+            p_batch["ACTIVE"][lane] = False
+            p_batch["ERRORS"][lane] = e
+            continue
+        if opcode_result in TASK_EXIT_RESULTS:
+            p_batch["ACTIVE"][lane] = False
+            terminate_task(splice_vm, p_batch["HEADER"], p_batch["TASK_INFO"], opcode_result)
+        elif is_batch_lane(splice_vm):
+            load_batch_lanes(p_batch, [lane])
+        else:
+            eject_batch_lane(p_batch, lane, p_ip + 1)
+
+def batch_step(p_batch, p_lanes, p_ip, p_debug_info, p_handler, p_operands):
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info)
+    step_batch_lanes(p_batch, p_lanes, p_ip, p_handler, p_operands)
+
+def batch_nop(p_batch, p_lanes, p_ip, p_debug_info):
+    begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info)
+
+# the opcode result does not depend on register values, e.g. HLT or bad operands
+def batch_exit(p_batch, p_lanes, p_ip, p_debug_info, p_result):
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info)
+    for lane in p_lanes:
+        terminate_task(p_batch["VMS"][lane], p_batch["HEADER"], p_batch["TASK_INFO"], p_result)
+    retire_batch_lanes(p_batch, p_lanes)
+
+def batch_fill(p_batch, p_lanes, p_ip, p_debug_info, p_bank, p_reg_id, p_value):
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info)
+    p_batch[p_bank][p_lanes, p_reg_id] = p_value
+
+def batch_mov(p_batch, p_lanes, p_ip, p_debug_info, p_bank, p_reg_id, p_addr):
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info)
+    p_batch[p_bank][p_lanes, p_addr] = p_batch[p_bank][p_lanes, p_reg_id]
+
+# words unpack_float_from_int accepts
+def is_batch_word(p_data):
+    return type(p_data) is int and p_data>=-0x80000000 and p_data<0x80000000
+
+# unpack_float_from_int over many words, as float32 bit patterns. Returns the
+# floats and a mask of the words unpack_float_from_int accepts.
+def unpack_batch_words(p_data):
+    if set(map(type, p_data)) == {int} and -0x80000000<=min(p_data) and max(p_data)<0x80000000:
+        valid = np.ones(len(p_data), dtype=bool)
+        words = np.array(p_data, dtype=np.int64)
+    else:
+        valid = np.array([is_batch_word(x) for x in p_data], dtype=bool)
+        words = np.array([x for x, y in zip(p_data, valid) if y], dtype=np.int64)
+    return words.astype(np.int32).view(np.float32), valid
+
+# data is gathered from each lane's own task memory
+def batch_lea(p_batch, p_lanes, p_ip, p_debug_info, p_reg_id, p_key):
+    tasks = [p_batch["TASKS"][x] for x in p_lanes]
+    eject = np.array([len(x) for x in tasks])<=p_key
+    data = [x[p_key] for x, y in zip(tasks, eject) if not y]
+    if p_reg_id>0x0F:
+        data, valid = unpack_batch_words(data)
+        eject[~eject] = ~valid
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, eject)
+    if p_reg_id>0x0F:
+        p_batch["FPU"][p_lanes, p_reg_id] = data
+    else:
+        for lane, value in zip(p_lanes, data):
+            p_batch["ALU"][lane, p_reg_id] = value
+
+# Data is scattered to each lane's own task memory, as in opcode_mov. Floats
+# are packed in one go, lanes where pack_float_to_int overflows are ejected.
+def batch_mov_ram(p_batch, p_lanes, p_ip, p_debug_info, p_reg_id, p_key):
+    eject = None
+    if p_reg_id>0x0F:
+        floats = p_batch["FPU"][p_lanes, p_reg_id]
+        with np.errstate(all="ignore"):
+            singles = floats.astype(np.float32)
+        eject = np.isinf(singles) & ~np.isinf(floats)
+        data = singles[~eject].view(np.uint32).tolist()
+    else:
+        data = p_batch["ALU"][p_lanes, p_reg_id].tolist()
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, eject)
+    for lane, value in zip(p_lanes, data):
+        task = p_batch["TASKS"][lane]
+        if p_key>=len(task):
+            task.extend([None]*(p_key-len(task)+1))
+        task[p_key] = value
+
+BATCH_ALU_CMP = {
+    ALU_EQ: lambda a, b: a == b,
+    ALU_NE: lambda a, b: a == b, # same as ALU_EQ, see opcode_cmp
+    ALU_GT: lambda a, b: a > b,
+    ALU_LT: lambda a, b: a < b,
+    ALU_GE: lambda a, b: a >= b,
+    ALU_LE: lambda a, b: a <= b,
+}
+
+def batch_cmp(p_batch, p_lanes, p_ip, p_debug_info, p_oper, p_reg_a, p_reg_b, p_handler, p_operands):
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info)
+    if p_oper in BATCH_ALU_CMP:
+        try:
+            truth = BATCH_ALU_CMP[p_oper](p_batch["ALU"][p_lanes, p_reg_a], p_batch["ALU"][p_lanes, p_reg_b]).astype(bool)
+        except Exception:
+            step_batch_lanes(p_batch, p_lanes, p_ip, p_handler, p_operands)
+            return
+    else:
+        fpu_a = p_batch["FPU"][p_lanes, p_reg_a]
+        fpu_b = p_batch["FPU"][p_lanes, p_reg_b]
+        if p_oper == FPU_EQ:
+            truth = np.abs(np.abs(fpu_a) - np.abs(fpu_b)) < p_batch["PRECISION"][p_lanes]
+        elif p_oper == FPU_NE:
+            truth = np.abs(np.abs(fpu_a) - np.abs(fpu_b)) > p_batch["PRECISION"][p_lanes]
+        elif p_oper == FPU_GT:
+            truth = fpu_a > fpu_b
+        else:
+            truth = fpu_a < fpu_b
+    for lane in p_lanes[~truth]:
+        terminate_task(p_batch["VMS"][lane], p_batch["HEADER"], p_batch["TASK_INFO"], EX_CHECK_FALSE)
+    retire_batch_lanes(p_batch, p_lanes[~truth])
+
+# messages are formatted per lane, only where INFO is logged
+def batch_str(p_batch, p_lanes, p_ip, p_debug_info, p_prefix, p_reg_id):
+    info = p_batch["INFO"][p_lanes]
+    eject = np.zeros(len(p_lanes), dtype=bool)
+    if p_prefix == PRE_STR_FPU:
+        values = p_batch["FPU"][p_lanes, p_reg_id].tolist()
+    else:
+        values = p_batch["ALU"][p_lanes, p_reg_id].tolist()
+    if p_prefix == PRE_STR_BIN:
+        for i in np.flatnonzero(info):
+            try:
+                values[i] = "{0:b}".format(values[i])
+            except Exception:
+                eject[i] = True
+    info_lanes = np.flatnonzero(info & ~eject)
+    messages = [values[i] for i in info_lanes]
+    info_lanes = p_lanes[info_lanes]
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, eject)
+    for lane, message in zip(info_lanes, messages):
+        log_message(p_batch["VMS"][lane], "%s%s", LOG_LEVEL_INFO, p_batch["TASK_INFO"], message)
+
+# REG_C is written twice, as in opcode_fma and opcode_fsd, so REG_A may be REG_C
+def batch_fpu_arithmetic(p_batch, p_lanes, p_ip, p_debug_info, p_opcode, p_reg_a, p_reg_b, p_reg_c):
+    fpu = p_batch["FPU"]
+    eject = None
+    if p_opcode == OP_FSD:
+        # opcode_fsd fails on these, see eject_batch_lane
+        eject = (fpu[p_lanes, p_reg_b] <= p_batch["PRECISION"][p_lanes]) | (fpu[p_lanes, p_reg_b] == 0.0)
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, eject)
+    with np.errstate(all="ignore"):
+        if p_opcode == OP_FMA:
+            fpu[p_lanes, p_reg_c] = fpu[p_lanes, p_reg_c] * fpu[p_lanes, p_reg_b]
+            fpu[p_lanes, p_reg_c] = fpu[p_lanes, p_reg_c] + fpu[p_lanes, p_reg_a]
+        else:
+            fpu[p_lanes, p_reg_c] = fpu[p_lanes, p_reg_c] / fpu[p_lanes, p_reg_b]
+            fpu[p_lanes, p_reg_c] = fpu[p_lanes, p_reg_c] - fpu[p_lanes, p_reg_a]
+
+# Python object arithmetic on a copy, lanes are stepped one by one if it raises
+def batch_alu_arithmetic(p_batch, p_lanes, p_ip, p_debug_info, p_opcode, p_reg_a, p_reg_b, p_reg_c, p_handler, p_operands):
+    eject = None
+    if p_opcode == OP_FSD:
+        eject = np.array([x == 0 for x in p_batch["ALU"][p_lanes, p_reg_a]], dtype=bool)
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, eject)
+    alu = p_batch["ALU"][p_lanes]
+    try:
+        if p_opcode == OP_FMA:
+            alu[:, p_reg_c] = alu[:, p_reg_c] * alu[:, p_reg_b]
+            alu[:, p_reg_c] = alu[:, p_reg_c] + alu[:, p_reg_a]
+        elif p_opcode == OP_FSD:
+            alu[:, p_reg_c] = alu[:, p_reg_c] / alu[:, p_reg_b]
+            alu[:, p_reg_c] = alu[:, p_reg_c] - alu[:, p_reg_a]
+        else:
+            alu[:, p_reg_c] = ~(alu[:, p_reg_a] | alu[:, p_reg_b])
+    except Exception:
+        step_batch_lanes(p_batch, p_lanes, p_ip, p_handler, p_operands)
+        return
+    p_batch["ALU"][p_lanes] = alu
+
+# REG_B = p_function(REG_A, REG_B) with math, lanes where it fails are ejected
+def batch_fpu_function(p_batch, p_lanes, p_ip, p_debug_info, p_function, p_reg_a, p_reg_b):
+    values_a = p_batch["FPU"][p_lanes, p_reg_a].tolist()
+    values_b = p_batch["FPU"][p_lanes, p_reg_b].tolist()
+    eject = np.zeros(len(p_lanes), dtype=bool)
+    try:
+        values = list(map(p_function, values_a, values_b))
+    except Exception:
+        values = []
+        for i in range(0, len(p_lanes)):
+            try:
+                values.append(p_function(values_a[i], values_b[i]))
+            except Exception:
+                eject[i] = True
+    p_lanes = begin_batch_instruction(p_batch, p_lanes, p_ip, p_debug_info, eject)
+    p_batch["FPU"][p_lanes, p_reg_b] = values
+
+BATCH_FPU_FUNCTIONS = {
+    OP_SIN: lambda a, b: sin(a),
+    OP_COS: lambda a, b: cos(a),
+    OP_TAN: lambda a, b: tan(a),
+}
+
+# Maps one decoded instruction to its batch operation and arguments, following
+# the operand checks of the opcode handlers
+def plan_batch_instruction(p_opcode, p_handler, p_operands, p_task_id, p_offset):
+    step = [batch_step, (p_handler, p_operands)]
+    if p_opcode == OP_HLT:
+        return [batch_exit, (EX_TASK_HALTED,)]
+    if p_opcode == OP_NOP:
+        return [batch_nop, ()]
+    if p_handler is opcode_unknown:
+        return [batch_exit, (EX_OPC_UNKNOWN,)]
+    if p_opcode == OP_MOV:
+        prefix, reg_id, addr = p_operands[0:3]
+        if prefix == PRE_MOV_REG:
+            if reg_id<0x10 and addr<0x10:
+                return [batch_mov, ("ALU", reg_id, addr)]
+            if reg_id>0x0F and addr>0x0F:
+                if reg_id<0x20 and addr<0x20:
+                    return [batch_mov, ("FPU", reg_id, addr)]
+                return step
+            return [batch_exit, (EX_BAD_OPERAND,)]
+        if prefix == PRE_MOV_RAM:
+            if reg_id<0x20:
+                return [batch_mov_ram, (reg_id, addr + p_offset)]
+            return step
+        return [batch_exit, (EX_OPC_UNKNOWN,)]
+    if p_opcode == OP_LEA:
+        reg_id, source_id, addr = p_operands[0:3]
+        if source_id == p_task_id and reg_id<0x20:
+            return [batch_lea, (reg_id, addr + p_offset)]
+        return step
+    if p_opcode == OP_CMP:
+        oper, reg_a, reg_b = p_operands[0:3]
+        if oper in BATCH_ALU_CMP and reg_a<0x10 and reg_b<0x10:
+            return [batch_cmp, (oper, reg_a, reg_b, p_handler, p_operands)]
+        if oper in (FPU_EQ, FPU_NE, FPU_GT, FPU_LT) and reg_a<0x20 and reg_b<0x20:
+            return [batch_cmp, (oper, reg_a, reg_b, p_handler, p_operands)]
+        if oper in (TSX_EQ, TSX_NE) or oper in BATCH_ALU_CMP or oper in (FPU_EQ, FPU_NE, FPU_GT, FPU_LT):
+            return step
+        return [batch_exit, (EX_BAD_OPERAND,)]
+    if p_opcode == OP_GET:
+        inst_id, param_id, reg_id = p_operands
+        if inst_id == INST_FPU and param_id in FPU_CONSTANTS:
+            if is_fpu_register(reg_id):
+                return [batch_fill, ("FPU", reg_id, FPU_CONSTANTS[param_id])]
+            return [batch_exit, (EX_BAD_OPERAND,)]
+        if inst_id == INST_ADC and param_id in ADC_PARAMETER_REGISTERS:
+            if is_fpu_register(reg_id):
+                return [batch_mov, ("FPU", ADC_PARAMETER_REGISTERS[param_id], reg_id)]
+            return [batch_exit, (EX_BAD_OPERAND,)]
+        return step
+    if p_opcode == OP_STR:
+        prefix, reg_id = p_operands[0:2]
+        if prefix not in [PRE_STR_ALU, PRE_STR_FPU, PRE_STR_BIN]:
+            return [batch_exit, (EX_BAD_OPERAND,)]
+        if reg_id<0x10 or (prefix == PRE_STR_FPU and reg_id<0x20):
+            return [batch_str, (prefix, reg_id)]
+        return step
+    if p_opcode in (OP_FMA, OP_FSD, OP_NOR):
+        registers = p_operands[0:3]
+        if all(x<0x10 for x in registers):
+            return [batch_alu_arithmetic, (p_opcode,) + registers + (p_handler, p_operands)]
+        if p_opcode != OP_NOR and all(is_fpu_register(x) for x in registers):
+            return [batch_fpu_arithmetic, (p_opcode,) + registers]
+        return [batch_exit, (EX_BAD_OPERAND,)]
+    if p_opcode in BATCH_FPU_FUNCTIONS:
+        prefix, reg_a, reg_b = p_operands[1:4]
+        if not (is_fpu_register(reg_a) and is_fpu_register(reg_b)):
+            return [batch_exit, (EX_BAD_OPERAND,)]
+        if prefix == PRE_NORMAL:
+            return [batch_fpu_function, (BATCH_FPU_FUNCTIONS[p_opcode], reg_a, reg_b)]
+        return step
+    if p_opcode == OP_POW:
+        prefix, reg_a, reg_b = p_operands[0:3]
+        if not (is_fpu_register(reg_a) and is_fpu_register(reg_b)):
+            return [batch_exit, (EX_BAD_OPERAND,)]
+        if prefix == PRE_NORMAL:
+            return [batch_fpu_function, (lambda a, b: pow(b, a), reg_a, reg_b)]
+        if prefix == PRE_INVERT:
+            return [batch_fpu_function, (lambda a, b: log(a), reg_a, reg_b)]
+        return [batch_exit, (EX_OPC_UNKNOWN,)]
+    return step
+
+# [operation, debug_info, arguments] up to the HLT, None for tasks that are
+# not straight-line, see get_task_code_end
+@lru_cache(maxsize=DECODED_TASK_CACHE)
+def get_batch_plan(p_header, p_code):
+    last = get_task_code_end(p_header, p_code)
+    if last is None:
+        return None
+    group_id, task_id, offset, task_info, instructions = decode_task(p_header, p_code)
+    plan = []
+    for word, opcode, handler, operands, debug_info in instructions[0:last]:
+        operation, arguments = plan_batch_instruction(opcode, handler, operands, task_id, offset)
+        plan.append((operation, debug_info, arguments))
+    return tuple(plan)
+
+# Runs p_tasks[i] in p_splice_vms[i], all tasks having the same get_task_key.
+# The VMs are modified in place. Returns the exception raised in each VM, None
+# where the task ran fine.
+def vm_execute_batch(p_splice_vms, p_tasks):
+    errors = [None] * len(p_splice_vms)
+    plan = get_batch_plan(*get_task_key(p_tasks[0]))
+    if plan is None or len(p_splice_vms)<VM_BATCH_MIN_LANES:
+        for i in range(0, len(p_splice_vms)):
+            try:
+                vm_execute(p_splice_vms[i], p_tasks[i])
+            except Exception as e:
+                errors[i] = e
+        return errors
+    batch = create_batch(p_splice_vms, p_tasks, errors)
+    ip = 1
+    for operation, debug_info, arguments in plan:
+        lanes = np.flatnonzero(batch["ACTIVE"])
+        if len(lanes) == 0:
+            break
+        operation(batch, lanes, ip, debug_info, *arguments)
+        ip = ip + 1
+    return errors
+
+################################################################################
+############################ SPLICE VM - PROFILER ##############################
+################################################################################
+# With VFLAGS["VM_PROFILE"] set, due tasks run through vm_interpret_slice,
+# which counts opcodes, so profiling costs nothing when it is off.
+# Counters are kept in VRAM["VM_PROFILE"] with string keys, they survive JSON.
+OPCODE_NAMES = {
+    OP_NOP: "NOP", OP_MOV: "MOV", OP_LEA: "LEA", OP_CMP: "CMP",
+    OP_SET: "SET", OP_GET: "GET", OP_ACT: "ACT", OP_HLT: "HLT",
+    OP_STR: "STR", OP_FMA: "FMA", OP_FSD: "FSD", OP_SIN: "SIN",
+    OP_COS: "COS", OP_TAN: "TAN", OP_POW: "POW", OP_NOR: "NOR",
+}
+
+def create_vm_profile():
+    return {
+        "TICKS": 0,
+        "INSTRUCTIONS": 0,
+        "WALL_TIME": 0.0,
+        "LAST_TICK": {"INSTRUCTIONS": 0, "TASKS": []},
+        "TASKS": {},
+        "OPCODES": {},
+    }
+
+def start_profile_tick(p_splice_vm):
+    profile = p_splice_vm["VRAM"].get("VM_PROFILE", None)
+    if profile is None:
+        profile = create_vm_profile()
+        p_splice_vm["VRAM"]["VM_PROFILE"] = profile
+    profile["TICKS"] = profile["TICKS"] + 1
+    profile["LAST_TICK"] = {"INSTRUCTIONS": 0, "TASKS": []}
+    return profile
+
+# resumed slices of a suspended task do not count as new runs
+def record_task_profile(p_profile, p_task, p_opcode_counts, p_wall_time, p_started):
+    group_id, task_id = decode_task_header(p_task[0])[0:2]
+    task_key = "%i:%i" % (group_id, task_id)
+    instructions = sum(p_opcode_counts.values())
+    if task_key not in p_profile["TASKS"]:
+        p_profile["TASKS"][task_key] = {"RUNS": 0, "INSTRUCTIONS": 0, "WALL_TIME": 0.0}
+    task_profile = p_profile["TASKS"][task_key]
+    if p_started:
+        task_profile["RUNS"] = task_profile["RUNS"] + 1
+    task_profile["INSTRUCTIONS"] = task_profile["INSTRUCTIONS"] + instructions
+    task_profile["WALL_TIME"] = task_profile["WALL_TIME"] + p_wall_time
+    for opcode, count in p_opcode_counts.items():
+        name = OPCODE_NAMES.get(opcode, "0x%02x" % opcode)
+        p_profile["OPCODES"][name] = p_profile["OPCODES"].get(name, 0) + count
+    p_profile["INSTRUCTIONS"] = p_profile["INSTRUCTIONS"] + instructions
+    p_profile["WALL_TIME"] = p_profile["WALL_TIME"] + p_wall_time
+    p_profile["LAST_TICK"]["INSTRUCTIONS"] = p_profile["LAST_TICK"]["INSTRUCTIONS"] + instructions
+    p_profile["LAST_TICK"]["TASKS"].append(task_key)
+    return p_profile
+
+def set_vm_profiling(p_splice_vm, p_enabled):
+    p_splice_vm["VFLAGS"]["VM_PROFILE"] = 1 if p_enabled else 0
+    return p_splice_vm
+
+def reset_vm_profile(p_splice_vm):
+    p_splice_vm["VRAM"].pop("VM_PROFILE", None)
+    return p_splice_vm
+
+# instructions run in the last tick, in percent of the nominal rate
+def get_vm_cpu_load(p_splice_vm):
+    profile = p_splice_vm["VRAM"].get("VM_PROFILE", None)
+    if profile is None:
+        return 0.0
+    capacity = VM_NOMINAL_IPS * max(1, p_splice_vm["VFLAGS"]["VM_TIMESLICE"])
+    return round(100.0 * profile["LAST_TICK"]["INSTRUCTIONS"] / capacity, 2)
+
+# profile summary, tasks sorted by the wall time they used
+def get_vm_profile(p_splice_vm):
+    profile = p_splice_vm["VRAM"].get("VM_PROFILE", None)
+    if profile is None:
+        profile = create_vm_profile()
+    tasks = []
+    for task_key, item in profile["TASKS"].items():
+        tasks.append({
+            "task": task_key,
+            "runs": item["RUNS"],
+            "instructions": item["INSTRUCTIONS"],
+            "wall_time": item["WALL_TIME"],
+            "time_per_run": item["WALL_TIME"] / max(1, item["RUNS"]),
+        })
+    tasks.sort(key=lambda x: x["wall_time"], reverse=True)
+    return {
+        "enabled": bool(p_splice_vm["VFLAGS"].get("VM_PROFILE", DEFAULT_VM_PROFILE)),
+        "ticks": profile["TICKS"],
+        "instructions": profile["INSTRUCTIONS"],
+        "instructions_per_tick": profile["INSTRUCTIONS"] / max(1, profile["TICKS"]),
+        "wall_time": profile["WALL_TIME"],
+        "cpu_load": get_vm_cpu_load(p_splice_vm),
+        "tasks_running": list(profile["LAST_TICK"]["TASKS"]),
+        "tasks": tasks,
+        "opcodes": dict(sorted(profile["OPCODES"].items(), key=lambda x: x[1], reverse=True)),
+    }
+
+################################################################################
+########################## SPLICE VM - STATE ENCODING ##########################
+################################################################################
+# VRAM tables are nested {group_id: {task_id: value}} dicts. JSON turns their
+# int keys into strings, so the exported state stores each table as a flat
+# list of [group_id, task_id, value] rows, in task execution order.
+VM_STATE_VERSION = 1
+VRAM_TASK_TABLES = ["TASK_CONTEXT_STATUS", "TASK_CONTEXT_WASRUN", "PROGRAM_CODE_MEMORY"]
+
+def export_vm_state(p_splice_vm):
+    vram = dict(p_splice_vm["VRAM"])
+    for name in VRAM_TASK_TABLES:
+        vram[name] = [[group_id, task_id, value] for group_id, group in vram[name].items() for task_id, value in group.items()]
+    return {
+        "STATE_VERSION": VM_STATE_VERSION,
+        "VCPU": p_splice_vm["VCPU"],
+        "VRAM": vram,
+        "VBUS": p_splice_vm["VBUS"],
+        "VFLAGS": p_splice_vm["VFLAGS"],
+    }
+
+# VMs that went through JSON without being exported
+def restore_vram_keys(p_splice_vm):
+    for name in VRAM_TASK_TABLES:
+        table = p_splice_vm["VRAM"][name]
+        if any([isinstance(x, str) or any([isinstance(y, str) for y in table[x]]) for x in table]):
+            p_splice_vm["VRAM"][name] = {int(group_id):{int(task_id):value for task_id, value in group.items()} for group_id, group in table.items()}
+    return p_splice_vm
+
+# accepts exported states and VMs in memory layout, with or without int keys
+def import_vm_state(p_state):
+    if "STATE_VERSION" not in p_state:
+        return restore_vram_keys(p_state)
+    if p_state["STATE_VERSION"] > VM_STATE_VERSION:
+        raise ValueError("Unsupported Splice VM state version: %s" % p_state["STATE_VERSION"])
+    vram = dict(p_state["VRAM"])
+    for name in VRAM_TASK_TABLES:
+        table = {}
+        for group_id, task_id, value in vram[name]:
+            if group_id not in table:
+                table[group_id] = {}
+            table[group_id][task_id] = value
+        vram[name] = table
+    return {
+        "VCPU": p_state["VCPU"],
+        "VRAM": vram,
+        "VBUS": p_state["VBUS"],
+        "VFLAGS": p_state["VFLAGS"],
+    }
+
+def export_obdh_subsystem(p_obdh_subsystem):
+    exported = dict(p_obdh_subsystem)
+    exported["splice_vm"] = export_vm_state(p_obdh_subsystem["splice_vm"])
+    return exported
+
+def import_obdh_subsystem(p_obdh_subsystem):
+    p_obdh_subsystem["splice_vm"] = import_vm_state(p_obdh_subsystem["splice_vm"])
+    return p_obdh_subsystem
+
+# Satellite subsystems as saved or spilled, every Splice VM exported. Missions
+# are imported once when they are loaded, spilled or posted by a client, the
+# simulation only runs VMs in memory layout.
+def export_vm_subsystems(p_subsystems):
+    return {name:export_obdh_subsystem(item) if "splice_vm" in item else item for name, item in p_subsystems.items()}
+
+def import_vm_subsystems(p_subsystems):
+    for item in p_subsystems.values():
+        if "splice_vm" in item:
+            import_obdh_subsystem(item)
+    return p_subsystems
 
 ################################################################################
 ############################# OBDH SIMULATION CORE #############################
@@ -877,11 +2303,74 @@ def write_to_data_bus(p_satellite_bus, p_splice_vm):
 
     return p_splice_vm, p_satellite_bus
 
-# run forward for the number of seconds provided
+# run forward for the number of seconds provided, the Splice VM is in memory
+# layout, see import_vm_subsystems
 def simulate_obdh_subsystem(p_obdh_subsystem, p_mission, p_seconds):
     data_bus = p_mission["satellite"]["subsystems"]["dbus"]
     for i in range(0, p_seconds):
         p_obdh_subsystem["splice_vm"] = read_from_data_bus(p_obdh_subsystem["splice_vm"], data_bus)
         p_obdh_subsystem["splice_vm"] = run_sheduled_tasks(p_obdh_subsystem["splice_vm"])
         p_obdh_subsystem["splice_vm"], data_bus = write_to_data_bus(data_bus, p_obdh_subsystem["splice_vm"])
+    p_mission["satellite"]["telemetry"]["obdh"] = update_obdh_telemetry(p_mission["satellite"]["telemetry"]["obdh"], p_obdh_subsystem["splice_vm"])
     return p_obdh_subsystem, data_bus
+
+# One second of each mission on its own, errors are returned as by
+# simulate_obdh_batch
+def simulate_obdh_each(p_missions):
+    errors = [None] * len(p_missions)
+    for i in range(0, len(p_missions)):
+        subsystems = p_missions[i]["satellite"]["subsystems"]
+        try:
+            subsystems["obdh"], subsystems["dbus"] = simulate_obdh_subsystem(subsystems["obdh"], p_missions[i], 1)
+        except Exception as e:
+            errors[i] = e
+    return errors
+
+# True when some program is loaded in at least VM_BATCH_MIN_LANES of the VMs,
+# otherwise stepping them together cannot use vm_execute_batch
+def has_batch_lanes(p_splice_vms):
+    lanes = {}
+    for splice_vm in p_splice_vms:
+        keys = set()
+        for group in splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"].values():
+            for task in group.values():
+                keys.add(get_task_key(task))
+        for key in keys:
+            lanes[key] = lanes.get(key, 0) + 1
+            if lanes[key]>=VM_BATCH_MIN_LANES:
+                return True
+    return False
+
+# One second of many missions, VMs due to run the same program run it through
+# vm_execute_batch. Returns the exception raised in each mission, None where
+# the second was simulated fine.
+def simulate_obdh_batch(p_missions):
+    errors = [None] * len(p_missions)
+    for i in range(0, len(p_missions)):
+        subsystems = p_missions[i]["satellite"]["subsystems"]
+        try:
+            subsystems["obdh"]["splice_vm"] = read_from_data_bus(subsystems["obdh"]["splice_vm"], subsystems["dbus"])
+        except Exception as e:
+            errors[i] = e
+    running = [i for i in range(0, len(p_missions)) if errors[i] is None]
+    vm_errors = run_sheduled_tasks_batch([p_missions[i]["satellite"]["subsystems"]["obdh"]["splice_vm"] for i in running])
+    for i, error in zip(running, vm_errors):
+        if error is not None:
+            errors[i] = error
+            continue
+        subsystems = p_missions[i]["satellite"]["subsystems"]
+        try:
+            subsystems["obdh"]["splice_vm"], subsystems["dbus"] = write_to_data_bus(subsystems["dbus"], subsystems["obdh"]["splice_vm"])
+            p_missions[i]["satellite"]["telemetry"]["obdh"] = update_obdh_telemetry(p_missions[i]["satellite"]["telemetry"]["obdh"], subsystems["obdh"]["splice_vm"])
+        except Exception as e:
+            errors[i] = e
+    return errors
+
+# cpu_load and tasks_running are only measured while the VM is profiled
+def update_obdh_telemetry(p_telemetry, p_splice_vm):
+    p_telemetry["budget_overruns"] = p_splice_vm["VRAM"].get("BUDGET_OVERRUNS", 0)
+    if p_splice_vm["VFLAGS"].get("VM_PROFILE", DEFAULT_VM_PROFILE):
+        profile = get_vm_profile(p_splice_vm)
+        p_telemetry["cpu_load"] = profile["cpu_load"]
+        p_telemetry["tasks_running"] = profile["tasks_running"]
+    return p_telemetry
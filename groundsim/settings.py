@@ -80,6 +80,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'groundsim.wsgi.application'
+ASGI_APPLICATION = 'groundsim.asgi.application'
 
 
 # Database
@@ -94,6 +95,39 @@ DATABASES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
+# Mission telemetry history, spilled from in-memory ring buffers
+TELEMETRY_DIR = os.path.join(BASE_DIR, 'telemetry')
+
+# Orbit tracks written by propagate_orbits, one directory per satellite and day
+TRACK_DIR = os.path.join(BASE_DIR, 'tracks')
+
+# missions kept in memory by the session store before spilling to the database
+MISSION_SESSION_CAPACITY = 512
+# a session mission is written to the database every so many steps, when it
+# is evicted and on SessionStore.flush()
+MISSION_SESSION_SPILL_STEPS = 20
+
+# seconds a process serves the satellite and scenario catalog before checking
+# the shared catalog version again
+CATALOG_SYNC_INTERVAL = 1
+
+# threads running simulation work for the mse_* views, plus requests allowed to
+# wait for a thread; beyond that requests are answered with 503 and Retry-After
+SIMULATION_POOL_WORKERS = 4
+SIMULATION_POOL_QUEUE = 16
+SIMULATION_RETRY_AFTER = 1
+
+# mse_step_batch/ steps its missions in lockstep, so Splice VMs running the
+# same program execute together through the batch VM. Lockstep is only used
+# when some program is loaded in at least sys_obdh.VM_BATCH_MIN_LANES VMs.
+SIMULATION_BATCH_VM = True
+
+# mse_vm_profile/ debug endpoint for the Splice VM profiler
+VM_PROFILE_ENDPOINT = DEBUG
+
+# mse_vm_log/ debug endpoint reading and setting the Splice VM log level
+VM_LOG_ENDPOINT = DEBUG
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from groundsim.models import Satellite, MissionScenario
+from groundsim.mse.core_cat import CatalogCache
+
+# Keep the catalog cache in step with update_satellite, init_db and admin edits.
+# The shared catalog version is bumped in the writing transaction, so readers
+# in any process drop entries they cached from the old rows once it commits.
+@receiver(post_save, sender=Satellite)
+@receiver(post_delete, sender=Satellite)
+def satellite_changed(sender, instance, **kwargs):
+    CatalogCache.invalidate_satellite(instance.norad_id)
+
+@receiver(post_save, sender=MissionScenario)
+@receiver(post_delete, sender=MissionScenario)
+def scenario_changed(sender, instance, **kwargs):
+    CatalogCache.invalidate_scenario(instance.scenario_id)
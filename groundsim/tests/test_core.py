@@ -1,9 +1,43 @@
 import os.path
+import copy
+import json
+import asyncio
+import time
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+from hashlib import sha256
 from math import radians, isclose
+from datetime import datetime, timedelta, timezone
 from django.test import TestCase
+from django.db.models import F
+from django.utils.http import http_date
 from skyfield.api import EarthSatellite, load
 from groundsim.mse.core_sim import CMSE_Env, CMSE_Sat, CMSE_SceEng
+from groundsim.mse.core_tlm import CMSE_TlmStore, downsample_lttb, downsample_minmax
+from groundsim.mse.core_ses import CMSE_SessionStore
+from groundsim.mse.core_trk import CMSE_TrackStore
+from groundsim.mse.core_cat import CatalogCache
+from groundsim.models import MissionSession, MissionBlob, MissionInstance, MissionEventLog, Satellite, SatelliteTrackDay, CatalogVersion
 from groundsim.mse.lib_utils import fp_equals
+from groundsim.mse.lib_codec import encode_binary, CONTENT_TYPE_BINARY
+from groundsim.mse.sys_obdh import export_vm_subsystems, import_vm_state
+from groundsim.management.commands.run_missions import run_mission_job, prepare_mission_job
+from groundsim.mse.core_api import (
+    stream_mission_steps,
+    simulate_mission_batch,
+    simulate_mission_steps,
+    save_mission,
+    load_mission,
+    get_mission_logs,
+    export_mission_logs,
+    get_new_events,
+    SessionStore
+)
+from groundsim.mse import core_api
+from groundsim.executor import SimulationExecutor, PoolSaturated
+from groundsim.views import offload_frames, stream_session_steps
 
 SITE_ROOT = os.path.dirname(os.path.realpath(__file__))
 
@@ -22,6 +56,231 @@ class UtilitiesTestCases(TestBaseClass):
         result_2 = self.fp_eq(self.a, self.b)
         assert(result_1==result_2)
 
+class TelemetryStoreTest(TestCase):
+    def setUp(self):
+        self.spill_dir = tempfile.TemporaryDirectory()
+        self.store = CMSE_TlmStore(self.spill_dir.name, p_capacity=1000)
+        self.telemetry = CMSE_Sat().initialize_satellite_telemetry()
+        self.mission_id = "0123456789abcdef0123456789abcdef"
+        for i in range(1, 2501):
+            self.telemetry["power"]["battery_level"] = float(i % 100)
+            self.store.record(self.mission_id, i, self.telemetry)
+
+    def tearDown(self):
+        self.spill_dir.cleanup()
+
+    def test_spill_to_disk(self):
+        chunks = os.listdir(os.path.join(self.spill_dir.name, self.mission_id))
+        assert(len(chunks) == 2)
+        result = self.store.query(self.mission_id, 1, 2500, 5000)
+        assert(result["samples"] == 2500)
+        assert(result["series"]["power.battery_level"]["time"] == list(range(1, 2501)))
+
+    def test_range_query(self):
+        result = self.store.query(self.mission_id, 990, 1010, 100, "minmax", ["power.battery_level"])
+        assert(result["series"]["power.battery_level"]["time"] == list(range(990, 1011)))
+        assert(list(result["series"].keys()) == ["power.battery_level"])
+
+    def test_reload_from_disk(self):
+        self.store.flush()
+        store = CMSE_TlmStore(self.spill_dir.name, p_capacity=1000)
+        result = store.query(self.mission_id, 1, 2500, 5000)
+        assert(result["samples"] == 2500)
+
+    # chunk files are written and read without holding the store lock
+    def test_io_outside_lock(self):
+        lock_held = []
+        save = np.save
+        load = np.load
+        def checked_save(*args, **kwargs):
+            lock_held.append(self.store.lock.locked())
+            return save(*args, **kwargs)
+        def checked_load(*args, **kwargs):
+            lock_held.append(self.store.lock.locked())
+            return load(*args, **kwargs)
+        with mock.patch("groundsim.mse.core_tlm.np.save", side_effect=checked_save), mock.patch("groundsim.mse.core_tlm.np.load", side_effect=checked_load):
+            for i in range(2501, 3501):
+                self.store.record(self.mission_id, i, self.telemetry)
+            result = self.store.query(self.mission_id, 1, 3500, 5000)
+        assert(result["samples"] == 3500 and len(lock_held) == 4)
+        assert(not any(lock_held))
+        assert(self.store.pending == {})
+
+    def test_mission_id_validation(self):
+        for mission_id in ["../test", "..", "test", "0123456789ABCDEF0123456789ABCDEF"]:
+            with self.assertRaises(ValueError):
+                self.store.query(mission_id, 1, 2500, 100)
+        result = self.store.query("fedcba9876543210fedcba9876543210", 1, 2500, 100)
+        assert(result["samples"] == 0)
+        assert(list(self.store.rings.keys()) == [self.mission_id])
+
+    def test_downsampling(self):
+        t = np.arange(0, 1000, dtype=np.float64)
+        v = np.sin(t/50.0)
+        v[500] = 10.0
+        t_lttb, v_lttb = downsample_lttb(t, v, 50)
+        assert(len(t_lttb) == 50)
+        assert(t_lttb[0] == 0 and t_lttb[-1] == 999)
+        assert(10.0 in v_lttb)
+        t_minmax, v_minmax = downsample_minmax(t, v, 50)
+        assert(len(t_minmax) <= 50)
+        assert(10.0 in v_minmax and min(v) in v_minmax)
+        assert(list(t_minmax) == sorted(t_minmax))
+
+class TrackStoreTest(TestCase):
+    def setUp(self):
+        self.track_dir = tempfile.TemporaryDirectory()
+        self.store = CMSE_TrackStore(self.track_dir.name)
+        self.satellite = Satellite.objects.create(norad_id=44878, satellite_tle1="line 1", satellite_tle2="line 2")
+        # 2020-11-28 20:00:00 UTC, six hours at 60s steps cross midnight
+        self.start = 1606593600
+        self.store.write_track(self.satellite, self.make_columns(self.start, 360), 60)
+
+    def tearDown(self):
+        self.track_dir.cleanup()
+
+    def make_columns(self, p_start, p_count):
+        time = p_start + np.arange(0, p_count, dtype=np.int64) * 60
+        return {
+            "time":time,
+            "lat":(time % 90).astype(np.float32),
+            "lng":(time % 180).astype(np.float32),
+            "alt":np.full(p_count, 500.0, dtype=np.float32),
+        }
+
+    def test_day_split(self):
+        days = SatelliteTrackDay.objects.filter(satellite_ref=self.satellite).order_by("day")
+        assert([x.samples for x in days] == [240, 120])
+        assert(self.store.get_last_timestamp(self.satellite) == datetime(2020, 11, 29, 1, 59, tzinfo=timezone.utc))
+
+    def test_range_query(self):
+        start = datetime(2020, 11, 28, 23, 50, tzinfo=timezone.utc)
+        end = datetime(2020, 11, 29, 0, 10, tzinfo=timezone.utc)
+        columns = self.store.read_range(44878, start, end)
+        assert(len(columns["time"]) == 21)
+        assert(columns["time"][0] == int(start.timestamp()))
+        assert(list(columns["lat"]) == list((columns["time"] % 90).astype(np.float32)))
+        result = self.store.query(44878, start, end, 5)
+        assert(result["samples"] == 21 and len(result["time"]) == 5)
+
+    def test_append_overlap(self):
+        self.store.write_track(self.satellite, self.make_columns(self.start + 300*60, 120), 60)
+        columns = self.store.read_range(44878, datetime(2020, 11, 28, tzinfo=timezone.utc), datetime(2020, 12, 1, tzinfo=timezone.utc))
+        assert(len(columns["time"]) == 420)
+        assert(np.all(np.diff(columns["time"]) == 60))
+
+class SessionStoreTest(TestCase):
+    def setUp(self):
+        self.store = CMSE_SessionStore(p_capacity=2)
+        for i in range(0, 3):
+            self.store.put({"environment":{"mission_id":"mission_%i" % i, "elapsed_timer":i}})
+
+    def test_eviction(self):
+        assert(len(self.store.missions)==2)
+        assert("mission_0" not in self.store.missions)
+        assert(MissionSession.objects.filter(mission_id="mission_0").count()==1)
+
+    # evicted missions are spilled when dirty
+    def test_reload(self):
+        with self.store.checkout("mission_0") as mission:
+            assert(mission["environment"]["elapsed_timer"]==0)
+            mission["environment"]["elapsed_timer"] = 10
+        assert("mission_1" not in self.store.missions)
+        reloaded = CMSE_SessionStore()
+        assert(reloaded.get("mission_0")["environment"]["elapsed_timer"]==0)
+        self.store.get("mission_1")
+        self.store.get("mission_2")
+        assert("mission_0" not in self.store.missions)
+        reloaded = CMSE_SessionStore()
+        assert(reloaded.get("mission_0")["environment"]["elapsed_timer"]==10)
+
+    # checkouts only spill every spill_steps, or on flush
+    def test_spill_steps(self):
+        store = CMSE_SessionStore(p_capacity=2, p_spill_steps=2)
+        with store.checkout("mission_2") as mission:
+            mission["environment"]["elapsed_timer"] = 10
+        assert(CMSE_SessionStore().get("mission_2")["environment"]["elapsed_timer"]==2)
+        with store.checkout("mission_2") as mission:
+            mission["environment"]["elapsed_timer"] = 11
+        assert(CMSE_SessionStore().get("mission_2")["environment"]["elapsed_timer"]==11)
+        with store.checkout("mission_2") as mission:
+            mission["environment"]["elapsed_timer"] = 12
+        assert(store.dirty == {"mission_2":1})
+        store.flush()
+        assert(store.dirty == {})
+        assert(CMSE_SessionStore().get("mission_2")["environment"]["elapsed_timer"]==12)
+
+    # a failed checkout leaves the mission as it was last written
+    def test_failed_checkout(self):
+        with self.assertRaises(KeyError):
+            with self.store.checkout("mission_2") as mission:
+                mission["environment"]["elapsed_timer"] = 10
+                raise KeyError("mission_2")
+        with self.store.checkout("mission_2") as mission:
+            assert(mission["environment"]["elapsed_timer"]==2)
+
+    def test_discard(self):
+        self.store.discard("mission_0")
+        self.store.discard("mission_2")
+        with self.store.checkout("mission_0") as mission:
+            assert(mission is None)
+        assert(self.store.get("mission_2") is None)
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        CatalogCache.clear()
+        self.satellite = Satellite.objects.create(
+            norad_id=44878,
+            satellite_tle1="line 1",
+            satellite_tle2="line 2",
+            config_instrument=json.dumps({"imager":{"fov":1.6}})
+        )
+
+    def tearDown(self):
+        CatalogCache.clear()
+
+    def test_read_through(self):
+        config = CatalogCache.get_satellite_config(44878)
+        config["config_instruments"]["imager"]["fov"] = 0
+        # the version is checked once per sync interval
+        with self.assertNumQueries(0):
+            assert(CatalogCache.get_satellite_config(44878)["config_instruments"]["imager"]["fov"] == 1.6)
+            assert(CatalogCache.get_tle_data(44878)["line_1"] == "line 1")
+
+    def test_invalidation(self):
+        CatalogCache.get_tle_data(44878)
+        self.satellite.satellite_tle1 = "line 1b"
+        self.satellite.save()
+        assert(CatalogCache.get_tle_data(44878)["line_1"] == "line 1b")
+        self.satellite.delete()
+        with self.assertRaises(Satellite.DoesNotExist):
+            CatalogCache.get_tle_data(44878)
+
+    # a change made by another process only shows up as a new catalog version
+    def test_shared_version(self):
+        CatalogCache.get_tle_data(44878)
+        Satellite.objects.filter(norad_id=44878).update(satellite_tle1="line 1c")
+        assert(CatalogCache.get_tle_data(44878)["line_1"] == "line 1")
+        CatalogVersion.objects.filter(name="catalog").update(version=F("version") + 1)
+        assert(CatalogCache.get_tle_data(44878)["line_1"] == "line 1")
+        synced = time.monotonic() + CatalogCache.sync_interval
+        with mock.patch("groundsim.mse.core_cat.time.monotonic", return_value=synced):
+            assert(CatalogCache.get_tle_data(44878)["line_1"] == "line 1c")
+
+    def test_conditional_get(self):
+        response = self.client.get("/list/")
+        etag = response["ETag"]
+        assert(response.status_code == 200 and json.loads(response.content)["satelites"][0]["norad_id"] == 44878)
+        with self.assertNumQueries(0):
+            assert(self.client.get("/list/", HTTP_IF_NONE_MATCH=etag).status_code == 304)
+        last_modified = CatalogVersion.objects.get(name="catalog").modified
+        assert(response["Last-Modified"] == http_date(last_modified.timestamp()))
+        self.satellite.satellite_name = "renamed"
+        self.satellite.save()
+        response = self.client.get("/list/", HTTP_IF_NONE_MATCH=etag)
+        assert(response.status_code == 200 and response["ETag"] != etag)
+        assert(json.loads(response.content)["satelites"][0]["sat_name"] == "renamed")
+
 class MissionScenarioTest(TestCase):
     def setUp(self):
         self.norad_id = 44878
@@ -102,6 +361,17 @@ class MissionScenarioTest(TestCase):
             i = i + self.step_time
         assert(self.mission["scenario"]["progress"] == self.mission["scenario"]["points_to_win"])
 
+    def test_objective_scored_once(self):
+        self.test_sample_scenario()
+        sce_sim = CMSE_SceEng()
+        imager = self.mission["satellite"]["instruments"]["imager"]
+        imager["buffer"].append(dict(imager["buffer"][0]))
+        for i in range(0, 3):
+            self.mission["scenario"] = sce_sim.evaluate_progress(self.mission)
+        assert(self.mission["scenario"]["progress"] == self.mission["scenario"]["points_to_win"])
+        assert(self.mission["scenario"]["objectives"][0]["completed"] == True)
+        assert(self.mission["scenario"]["snapshot_mark"] == len(imager["buffer"]))
+
 class OBDHScriptTest(MissionScenarioTest):
     def setUp(self):
         super().setUp()
@@ -266,3 +536,264 @@ class OBDHScriptTest(MissionScenarioTest):
         test_result = ['4:5:0', '4:5:2010501', '4:5:4070401', '4:5:1']
         all_logs = self.mission["satellite"]["subsystems"]["obdh"]["splice_vm"]["VBUS"]["INST_LOGS"]["OUT"][-4:]
         assert(test_result == all_logs)
+
+class BatchRunnerTest(MissionScenarioTest):
+    def create_job(self, p_name, p_scripts, p_actions):
+        env_sim = CMSE_Env()
+        sat_sim = CMSE_Sat()
+        sce_sim = CMSE_SceEng()
+        mission = {}
+        mission["environment"] = env_sim.create_mission_environment(self.norad_id, self.start_date, self.tle_data)
+        mission["satellite"] = sat_sim.create_mission_satellite(self.satellite_config)
+        mission["scenario"] = sce_sim.initialize_scenario(mission, dict(self.scenario_data))
+        return {
+            "name": p_name,
+            "error": "",
+            "mission": mission,
+            "scripts": p_scripts,
+            "actions": p_actions,
+            "duration": self.total_time,
+            "step": self.step_time
+        }
+
+    def test_run_mission_job(self):
+        result = run_mission_job(self.create_job("win", [], [[self.win_time + self.step_time, "take_photo"]]))
+        assert(result["error"] == "")
+        assert(result["completed"] == True)
+        assert(result["elapsed"] == self.total_time)
+        assert(result["power.battery_level"] == 100.0)
+        result = run_mission_job(self.create_job("no_photo", [], []))
+        assert(result["score"] == 0 and result["completed"] == False)
+
+    def test_run_mission_job_error(self):
+        result = run_mission_job(self.create_job("bad_script", [["1,1,10,1", "OP_BAD"]], []))
+        assert(result["error"] != "")
+        assert(result["elapsed"] == 0)
+
+    # a job that cannot be prepared is reported, the other jobs still run
+    def test_prepare_mission_job_error(self):
+        job = prepare_mission_job({"name":"bad_date", "start_date":"2020,11", "duration":10}, SITE_ROOT)
+        assert(job["error"].startswith("IndexError"))
+        result = run_mission_job(job)
+        assert(result["name"] == "bad_date" and result["error"] == job["error"] and result["completed"] == False)
+
+class MissionStepTest(MissionScenarioTest):
+    def create_mission(self, p_start_date):
+        mission = {}
+        mission["environment"] = CMSE_Env().create_mission_environment(self.norad_id, p_start_date, self.tle_data)
+        mission["satellite"] = CMSE_Sat().create_mission_satellite(self.satellite_config)
+        mission["scenario"] = CMSE_SceEng().initialize_scenario(mission, dict(self.scenario_data))
+        return mission
+
+    def test_stream_frames(self):
+        mission = self.create_mission(self.start_date)
+        frames = stream_mission_steps(mission, 25, 10)
+        assert(next(frames)["type"] == "start")
+        frames = list(frames)
+        assert([x["elapsed_timer"] for x in frames[:-1]] == [10, 20, 25])
+        assert(len(frames[0]["events"]) == 1)
+        assert(frames[-1]["type"] == "end" and frames[-1]["version"] == 1)
+        assert(frames[-1]["mission_instance"]["environment"]["elapsed_timer"] == 25)
+
+    # posted Splice VMs are imported once, before the steps are simulated
+    def test_posted_mission(self):
+        mission = self.create_mission(self.start_date)
+        mission["satellite"]["subsystems"] = export_vm_subsystems(mission["satellite"]["subsystems"])
+        with mock.patch("groundsim.mse.sys_obdh.import_vm_state", wraps=import_vm_state) as imported:
+            response = self.client.post("/mse_step/?steps=5", {"mission_instance":json.dumps(mission)})
+        assert(imported.call_count == len([x for x in mission["satellite"]["subsystems"].values() if "splice_vm" in x]))
+        result = json.loads(response.content)
+        assert(result["mission_instance"]["environment"]["elapsed_timer"] == 5)
+
+    def test_corrupt_payload(self):
+        payload = encode_binary(self.create_mission(self.start_date))
+        for body in [payload[:len(payload)//2], payload[:3], payload[:4] + b"not gzip"]:
+            response = self.client.post("/mse_step/?steps=5", body, content_type=CONTENT_TYPE_BINARY)
+            assert(response.status_code == 400)
+            assert(json.loads(response.content)["status"] == "error")
+        assert(self.client.post("/mse_step/?steps=5", {"mission_instance":"{"}).status_code == 400)
+        assert(self.client.post("/mse_step/?steps=5", "[1]", content_type="application/json").status_code == 400)
+
+    def test_vm_log_endpoint(self):
+        mission_id = SessionStore.put(self.create_mission(self.start_date))
+        with self.settings(VM_LOG_ENDPOINT=False):
+            assert(self.client.get("/mse_vm_log/", {"mission_id":mission_id}).status_code == 404)
+        with self.settings(VM_LOG_ENDPOINT=True):
+            response = json.loads(self.client.get("/mse_vm_log/", {"mission_id":mission_id}).content)
+            assert(response["log_level"] == 1)
+            assert(self.client.get("/mse_vm_log/", {"mission_id":mission_id, "level":"x"}).status_code == 400)
+            response = json.loads(self.client.get("/mse_vm_log/", {"mission_id":mission_id, "level":"2"}).content)
+            assert(response["log_level"] == 2)
+            response = json.loads(self.client.get("/mse_vm_log/", {"mission_id":mission_id}).content)
+            assert(response["log_level"] == 2)
+        SessionStore.discard(mission_id)
+
+    # events are found by position, so repeated events are kept
+    def test_new_events(self):
+        environment = self.create_mission(self.start_date)["environment"]
+        log_count = environment["log_count"]
+        for i in range(0, 3):
+            environment = CMSE_Env().log_event(environment, "repeated")
+        assert([x[1] for x in get_new_events(environment, log_count)] == ["repeated"] * 3)
+        assert(get_new_events(environment, environment["log_count"]) == [])
+
+    # session streams do not hold the mission lock between frames
+    def test_stream_session(self):
+        mission_id = SessionStore.put(self.create_mission(self.start_date))
+        frames = stream_session_steps(mission_id, 25, 10)
+        assert(next(frames)["type"] == "start")
+        with SessionStore.checkout(mission_id) as mission:
+            assert(mission["environment"]["elapsed_timer"] == 0)
+        assert(list(frames)[-1]["type"] == "end")
+        assert(SessionStore.get(mission_id)["environment"]["elapsed_timer"] == 25)
+        SessionStore.discard(mission_id)
+
+    def test_batch_shared_propagation(self):
+        later_date = dict(self.start_date, sec=46)
+        missions = [self.create_mission(self.start_date), self.create_mission(self.start_date), self.create_mission(later_date)]
+        expected = simulate_mission_steps(self.create_mission(later_date), 5)
+        with mock.patch.object(core_api, "get_orbital_data", wraps=core_api.get_orbital_data) as propagation:
+            results = simulate_mission_batch(missions, 5)
+        assert(propagation.call_count == 2)
+        assert(results[0]["environment"]["ground_track"] == results[1]["environment"]["ground_track"])
+        assert(results[2]["environment"]["ground_track"] == expected["environment"]["ground_track"])
+        assert(results[2]["environment"]["elapsed_timer"] == 5)
+
+    # missions stepped in lockstep through the batch VM end as if stepped alone
+    def test_batch_lockstep(self):
+        with open(os.path.dirname(os.path.realpath(__file__)) + "/data/test_c5.splc", "r") as f:
+            script = f.read().split("\n")[:-1]
+        later_date = dict(self.start_date, sec=46)
+        missions = [self.create_mission(self.start_date if i % 2 == 0 else later_date) for i in range(0, 4)]
+        for item in missions:
+            CMSE_SceEng().load_obdh_program(item, script)
+        expected = [simulate_mission_steps(copy.deepcopy(x), 12) for x in missions]
+        with self.settings(SIMULATION_BATCH_VM=True), mock.patch("groundsim.mse.sys_obdh.VM_BATCH_MIN_LANES", 2):
+            assert(core_api.use_mission_lockstep(missions) == True)
+            assert(core_api.use_mission_lockstep(missions[0:1]) == False)
+            results = simulate_mission_batch(missions, 12)
+        assert(results == expected)
+        assert(len(results[0]["satellite"]["subsystems"]["obdh"]["splice_vm"]["VBUS"]["INST_LOGS"]["OUT"]) > 0)
+        # too few lanes for the batch VM, missions are stepped one by one
+        assert(core_api.use_mission_lockstep(missions) == False)
+
+class SaveMissionTest(MissionStepTest):
+    def test_incremental_save(self):
+        mission = self.create_mission(self.start_date)
+        save_mission(mission, "user", "user@example.com")
+        assert(MissionBlob.objects.count() == 3)
+        record = MissionInstance.objects.get(mission_hash=mission["environment"]["hash_id"])
+        geometry_ref = record.satellite_ref.geometry_ref_id
+        mission["satellite"]["subsystems"]["obdh"]["cpu_load"] = 50
+        save_mission(mission, "user", "user@example.com")
+        record = MissionInstance.objects.get(mission_hash=mission["environment"]["hash_id"])
+        assert(MissionBlob.objects.count() == 4)
+        assert(record.satellite_ref.geometry_ref_id == geometry_ref)
+        assert(json.loads(record.satellite_ref.subsystems_ref.content)["obdh"]["cpu_load"] == 50)
+        # identical sections are shared between missions
+        save_mission(self.create_mission(self.start_date), "user2", "user2@example.com")
+        assert(MissionBlob.objects.count() == 4)
+
+    # session missions only hash the sections marked as changed
+    def test_dirty_sections(self):
+        mission = self.create_mission(self.start_date)
+        save_mission(mission, "user", "user@example.com", True)
+        assert(mission["environment"]["hash_id"] != sha256(mission["environment"]["mission_id"].encode('utf-8')).hexdigest())
+        assert(mission["environment"]["dirty_sections"] == [])
+        mission = simulate_mission_steps(mission, 1)
+        assert(mission["environment"]["dirty_sections"] == ["subsystems", "instruments"])
+        with mock.patch.object(core_api, "get_section_digest", wraps=core_api.get_section_digest) as digest:
+            save_mission(mission, "user", "user@example.com", True)
+        assert(digest.call_count == 2)
+        # marks posted by a client are not trusted
+        mission["satellite"]["geometry"]["posted"] = True
+        save_mission(mission, "user", "user@example.com")
+        record = MissionInstance.objects.get(mission_hash=mission["environment"]["hash_id"])
+        assert(json.loads(record.satellite_ref.geometry_ref.content) == {"posted":True})
+
+    def test_load_saved_mission(self):
+        Satellite.objects.create(norad_id=self.norad_id, satellite_tle1=self.tle_data["line_1"], satellite_tle2=self.tle_data["line_2"])
+        mission = self.create_mission(self.start_date)
+        mission["satellite"]["subsystems"]["obdh"]["cpu_load"] = 25
+        save_mission(mission, "user", "user@example.com")
+        loaded = load_mission(mission["environment"]["hash_id"])
+        assert(loaded["satellite"]["subsystems"] == mission["satellite"]["subsystems"])
+        assert(loaded["scenario"]["scenario_id"] == 0)
+
+class MissionLogTest(MissionStepTest):
+    def setUp(self):
+        super().setUp()
+        MissionInstance.objects.create(mission_hash="mission")
+        start = datetime(2020, 11, 28, 20, 0, 0, tzinfo=timezone.utc)
+        MissionEventLog.objects.bulk_create([
+            MissionEventLog(mission_ref_id="mission", timestamp=start + timedelta(seconds=i//2), message="event %i" % i)
+            for i in range(0, 250)
+        ])
+        self.start = start
+
+    def test_keyset_pages(self):
+        messages = []
+        page = get_mission_logs("mission", p_limit=100)
+        while True:
+            messages.extend([x[1] for x in page["event_logs"]])
+            if page["next"] is None:
+                break
+            page = get_mission_logs("mission", p_after=page["next"], p_limit=100)
+        assert(messages == ["event %i" % i for i in range(0, 250)])
+
+    def test_filters(self):
+        page = get_mission_logs("mission", p_start=self.start + timedelta(seconds=10), p_end=self.start + timedelta(seconds=19))
+        assert(len(page["event_logs"]) == 20 and page["event_logs"][0][1] == "event 20")
+        page = get_mission_logs("mission", p_text="event 24")
+        assert([x[1] for x in page["event_logs"]] == ["event 24", "event 240", "event 241", "event 242", "event 243", "event 244", "event 245", "event 246", "event 247", "event 248", "event 249"])
+
+    def test_export(self):
+        assert(sum([len(x) for x in export_mission_logs("mission")]) == 250)
+
+    def test_log_endpoint(self):
+        response = json.loads(self.client.get("/mse_mission_logs/").content)
+        assert(response == {"status":"ok", "event_logs":[], "next":None})
+        response = json.loads(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "limit":"10"}).content)
+        assert(len(response["event_logs"]) == 10 and response["next"] is not None)
+        assert(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "limit":"x"}).status_code == 400)
+        assert(self.client.get("/mse_mission_logs/", {"hash_id":"unknown"}).status_code == 404)
+
+    def test_log_endpoint_bad_arguments(self):
+        assert(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "after":"x"}).status_code == 400)
+        assert(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "after":"1_2_3"}).status_code == 400)
+        assert(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "start":"2020,11"}).status_code == 400)
+        assert(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "end":"x", "format":"csv"}).status_code == 400)
+        response = json.loads(self.client.get("/mse_mission_logs/", {"hash_id":"mission", "start":"2020,13,1,0,0,0"}).content)
+        assert(response["status"] == "error")
+
+    def test_step_writes_logs(self):
+        mission = self.create_mission(self.start_date)
+        mission["environment"]["hash_id"] = "mission"
+        simulate_mission_steps(mission, 5)
+        assert(MissionEventLog.objects.filter(mission_ref_id="mission").count() == 251)
+
+class SimulationExecutorTest(TestCase):
+    async def test_backpressure(self):
+        pool = SimulationExecutor(1, 1)
+        release = threading.Event()
+        running = [asyncio.ensure_future(pool.run(release.wait)) for x in range(0, 2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(PoolSaturated):
+            await pool.run(sum, [1, 2])
+        release.set()
+        assert(await asyncio.gather(*running) == [True, True])
+        assert(await pool.run(sum, [1, 2]) == 3)
+
+    # frames of a stream the client left are closed on the pool
+    async def test_stream_disconnect(self):
+        closed = []
+        def frames():
+            try:
+                for i in range(0, 10):
+                    yield i
+            finally:
+                closed.append(threading.current_thread().name)
+        stream = offload_frames(frames())
+        assert(await stream.__anext__() == 0)
+        await stream.aclose()
+        assert(len(closed) == 1 and closed[0].startswith("groundsim-sim"))
@@ -1,3 +1,8 @@
+import os
+import json
+import glob
+import tempfile
+from unittest import mock
 from math import radians, isclose
 from django.test import TestCase
 from groundsim.tests.test_core import TestBaseClass
@@ -11,6 +16,15 @@ from groundsim.mse.lib_splice import (
     decode_register,
     process_code_line,
     process_program_code,
+    assemble_program,
+    assemble_object,
+    decode_object,
+    write_object_file,
+    load_object_file,
+    clear_program_cache,
+    assemble_source,
+    assemble_library,
+    SpliceSyntaxError,
     PREFIXES,
     PARAMETERS,
     REGISTERS,
@@ -23,6 +37,16 @@ from groundsim.mse.lib_astro import (
     compute_orbit_track
 )
 from groundsim.mse.lib_adcs import get_adcs_vectors
+from groundsim.mse.lib_delta import make_delta, apply_delta
+from groundsim.mse.lib_codec import (
+    encode_binary,
+    decode_binary,
+    encode_json,
+    decode_json,
+    negotiate_codec,
+    CONTENT_TYPE_JSON,
+    CONTENT_TYPE_BINARY
+)
 
 class AstroTestCases(TestBaseClass):
     def setUp(self):
@@ -238,3 +262,118 @@ class SpliceTestCases(TestCase):
         while i<len(self.test_program_source):
             assert(self.test_program_code[i]==result[i])
             i = i + 1
+
+    def test_assembler(self):
+        filenames = sorted(glob.glob(os.path.dirname(os.path.realpath(__file__)) + "/data/*.splc"))
+        for item in filenames:
+            with open(item, "r") as f:
+                line_data = f.read().split("\n")[:-1]
+            assert(assemble_source(line_data) == process_program_code(line_data, False))
+            with open(item, "r") as f:
+                assert(assemble_source(f) == process_program_code(line_data, False))
+        errors = [
+            [["1,1,10,7", "OP_LEA, FREG_X, 1, 1"], 2, 9],
+            [["1,1,10,7", "", "  OP_FOO, IREG_A"], 3, 3],
+            [["1,1,300,7"], 1, 5],
+            [["1,1,10,7", "OP_STR, PRE_STR_FPU"], 2, 20],
+            [["1,1,10,7", "OP_MOV, PRE_MOV_REG, FREG_A, FREG_B, FREG_C"], 2, 38],
+            [["1,1,10,7", "OP_HLT", "1.0"], 3, 1],
+            [[], 1, 1],
+        ]
+        for item in errors:
+            with self.assertRaises(SpliceSyntaxError) as context:
+                assemble_source(item[0])
+            assert([context.exception.line, context.exception.column] == item[1:])
+        results = assemble_library(["1,1,10,1\nOP_HLT\n", "1,1,10,1\nOP_HTL\n"])
+        assert(results[0] == process_program_code(["1,1,10,1", "OP_HLT"], False))
+        assert(isinstance(results[1], SpliceSyntaxError))
+
+    def test_object_files(self):
+        filenames = sorted(glob.glob(os.path.dirname(os.path.realpath(__file__)) + "/data/*.splc"))
+        with tempfile.TemporaryDirectory() as object_dir:
+            for item in filenames:
+                with open(item, "r") as f:
+                    line_data = f.read().split("\n")[:-1]
+                object_path = os.path.join(object_dir, os.path.basename(item)[:-5] + ".splb")
+                write_object_file(object_path, line_data)
+                assert(load_object_file(object_path) == process_program_code(line_data, False))
+        # negative data words are kept as assembled
+        source = ["1,1,10,2", "OP_LEA, IREG_A, 1, 1", "OP_HLT", "-5i"]
+        data = assemble_object(source)
+        assert(decode_object(data) == process_program_code(source, False))
+        corrupted = bytearray(data)
+        corrupted[-1] = corrupted[-1] ^ 0x01
+        with self.assertRaises(ValueError):
+            decode_object(corrupted)
+        with self.assertRaises(ValueError):
+            decode_object(data[:-8])
+        with self.assertRaises(ValueError):
+            decode_object(b"SPLC" + data[4:])
+
+    def test_program_cache(self):
+        clear_program_cache()
+        with mock.patch("groundsim.mse.lib_splice.assemble_source", wraps=assemble_source) as assembler:
+            first = assemble_program(self.test_program_source)
+            second = assemble_program(list(self.test_program_source))
+            assert(assembler.call_count == 1)
+        assert(first == second)
+        assert(first is not second)
+        assert(assemble_program(assemble_object(self.test_program_source)) == first)
+
+class DeltaTestCases(TestCase):
+    def setUp(self):
+        self.old_doc = {
+            "environment": {"step_version":1, "event_logs":[["t1", "a"]], "ground_track":{"lat":1.0, "lng":2.0}},
+            "satellite": {"registers":[0, 0, 0], "log_buffer":["a", "b", "c"], "a/b~c":1, "removed":True},
+        }
+        self.new_doc = {
+            "environment": {"step_version":2, "event_logs":[["t1", "a"], ["t2", "b"]], "ground_track":{"lat":1.5, "lng":2.0}},
+            "satellite": {"registers":[0, 7, 0], "log_buffer":["b", "c"], "a/b~c":2, "added":{"x":1}},
+        }
+
+    def test_make_delta(self):
+        delta = make_delta(self.old_doc, self.new_doc)
+        assert({"op":"add", "path":"/environment/event_logs/-", "value":["t2", "b"]} in delta)
+        assert({"op":"replace", "path":"/satellite/registers/1", "value":7} in delta)
+        assert({"op":"replace", "path":"/satellite/a~1b~0c", "value":2} in delta)
+        assert({"op":"remove", "path":"/satellite/removed"} in delta)
+        assert(make_delta(self.new_doc, self.new_doc) == [])
+
+    def test_apply_delta(self):
+        delta = make_delta(self.old_doc, self.new_doc)
+        result = apply_delta(json.loads(json.dumps(self.old_doc)), delta)
+        assert(result == self.new_doc)
+
+class CodecTestCases(TestCase):
+    def setUp(self):
+        self.mission = {
+            "environment": {"step_version":3, "event_logs":[["t1", "a"]], "ground_track":{"lat":1.123456789, "lng":-2.5}},
+            "satellite": {
+                "splice_vm": {
+                    "VCPU": {"ALU_REGISTERS":[0]*16, "FPU_REGISTERS":[0.1]*32},
+                    "VRAM": {"PROGRAM_CODE_MEMORY":{1:{2:[16908801, 0]}}, "TASK_CONTEXT_STATUS":{1:{2:1}}}
+                },
+                "flags": [True, False, None],
+            }
+        }
+
+    def test_binary_round_trip(self):
+        payload = encode_binary(self.mission)
+        assert(payload[0:3] == b"GSM")
+        assert(decode_binary(payload) == self.mission)
+        assert(len(payload) < len(encode_json(self.mission)))
+
+    def test_json_round_trip(self):
+        result = decode_json(encode_json(self.mission))
+        assert(result["environment"] == self.mission["environment"])
+        assert("1" in result["satellite"]["splice_vm"]["VRAM"]["PROGRAM_CODE_MEMORY"])
+
+    def test_invalid_payload(self):
+        with self.assertRaises(ValueError):
+            decode_binary(b"{}")
+
+    def test_negotiation(self):
+        assert(negotiate_codec("text/html, application/x-groundsim-mission;q=0.9")[0] == CONTENT_TYPE_BINARY)
+        assert(negotiate_codec("application/json, */*")[0] == CONTENT_TYPE_JSON)
+        assert(negotiate_codec("*/*")[1] is None)
+        assert(negotiate_codec(None)[1] is None)
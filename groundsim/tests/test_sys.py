@@ -1,4 +1,8 @@
 import os.path
+import glob
+import copy
+import json
+from unittest import mock
 from groundsim.tests.test_core import TestBaseClass
 from groundsim.mse.sys_payload import calculate_camera_gsd, calculate_camera_fov, calculate_swath, get_imager_frame
 from groundsim.mse.sys_obdh import (
@@ -8,10 +12,31 @@ from groundsim.mse.sys_obdh import (
     load_user_task,
     clear_task_list,
     run_sheduled_tasks,
+    run_sheduled_tasks_batch,
     vm_execute,
+    decode_task,
+    compile_task,
+    export_vm_state,
+    import_vm_state,
+    get_vm_profile,
+    drain_vm_log,
+    VM_LOG_CAPACITY,
+    set_vm_profiling,
+    VM_EXEC_INTERPRET,
+    VM_EXEC_COMPILE,
     DEFAULT_VM_LOG_LEVEL,
-    DEFAULT_VM_TIMESLICE
+    DEFAULT_VM_TIMESLICE,
+    DEFAULT_VM_TICK_BUDGET,
+    vm_interpret,
+    vm_interpret_slice,
+    vm_execute_batch,
+    VM_BATCH_MIN_LANES,
+    get_task_diagnostics,
+    get_optimized_task,
+    VM_VERIFY_REJECT,
+    DEFAULT_VM_VERIFY
 )
+from groundsim.mse.lib_splice import assemble_object
 from math import radians, isclose
 
 SITE_ROOT = os.path.dirname(os.path.realpath(__file__))
@@ -113,11 +138,16 @@ class OBDHTestCases(TestBaseClass):
             'VRAM': {
                 'TASK_CONTEXT_STATUS': {},
                 'TASK_CONTEXT_WASRUN': {},
-                'PROGRAM_CODE_MEMORY': {}
+                'PROGRAM_CODE_MEMORY': {},
+                'TASK_SCHEDULE': None,
+                'TASK_RESUME': None,
+                'BUDGET_OVERRUNS': 0
             },
             'VBUS': {
                 "INST_LOGS":{
-                    "OUT":[]
+                    "OUT":[],
+                    "DRAINED":0,
+                    "DROPPED":0,
                 },
                 "INST_ADCS":{
                     "ADCS_MODE":0,
@@ -144,7 +174,11 @@ class OBDHTestCases(TestBaseClass):
             "VFLAGS":{
                 "VM_LOG_LEVEL": DEFAULT_VM_LOG_LEVEL,
                 "VM_TIMESLICE": DEFAULT_VM_TIMESLICE,
-                "FP_PRECISION": 1.0E-07
+                "FP_PRECISION": 1.0E-07,
+                "VM_EXEC_MODE": VM_EXEC_INTERPRET,
+                "VM_PROFILE": 0,
+                "VM_TICK_BUDGET": DEFAULT_VM_TICK_BUDGET,
+                "VM_VERIFY": DEFAULT_VM_VERIFY
             }
         }
         self.test_filenames = [
@@ -215,3 +249,345 @@ class OBDHTestCases(TestBaseClass):
             self.test_vm = run_sheduled_tasks(self.test_vm)
         test_result = ['1:5:1', '1:5:0', '1:5:-10', '1:5:-10', '1:5:-10', '1:5:-1', '1:4:2.0', '1:4:10.0', '1:4:100.0', '1:4:4.605170185988092']
         assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == test_result)
+
+    def test_decoded_task_cache(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        task = self.test_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]
+        hits = decode_task.cache_info().hits
+        self.test_vm = vm_interpret(self.test_vm, task)
+        self.test_vm = vm_interpret(self.test_vm, task)
+        assert(decode_task.cache_info().hits == hits + 2)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == ["1:1:3.0", "1:1:7.0"])
+        # words changed in task memory are decoded again
+        task[6] = task[7]
+        self.test_vm = vm_interpret(self.test_vm, task)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == ["1:1:3.0", "1:1:7.0"])
+        assert(self.test_vm["VRAM"]["TASK_CONTEXT_STATUS"][1][1] == 0xFF)
+        self.test_vm = {}
+
+    def run_script_file(self, p_filename, p_exec_mode, p_log_level, p_lane=0):
+        f = open(p_filename, "r")
+        line_data = f.read().split("\n")[:-1]
+        test_vm = init_vm(create_vm())
+        test_vm["VFLAGS"]["VM_EXEC_MODE"] = p_exec_mode
+        test_vm["VFLAGS"]["VM_LOG_LEVEL"] = p_log_level
+        try:
+            test_vm = load_user_task(test_vm, line_data)
+            for i in range (0,20):
+                test_vm["VCPU"]["FPU_REGISTERS"][0] = i * 0.25 + p_lane * 0.5
+                test_vm = run_sheduled_tasks(test_vm)
+        except Exception as e:
+            return type(e)
+        test_vm["VFLAGS"]["VM_EXEC_MODE"] = None
+        return test_vm
+
+    # compiled tasks must leave the VM exactly as the interpreter does
+    def test_compiled_tasks(self):
+        filenames = sorted(glob.glob(SITE_ROOT + "/data/*.splc"))
+        with mock.patch("groundsim.mse.sys_obdh.get_system_time", return_value=1606595176000):
+            for item in filenames:
+                for log_level in [0, 1]:
+                    interpreted = self.run_script_file(item, VM_EXEC_INTERPRET, log_level)
+                    compiled = self.run_script_file(item, VM_EXEC_COMPILE, log_level)
+                    assert(interpreted == compiled)
+        assert(compile_task.cache_info().currsize > 0)
+
+    # verified tasks run without operand checks, and must end as interpreted
+    def test_optimized_tasks(self):
+        filenames = sorted(glob.glob(SITE_ROOT + "/data/*.splc"))
+        with mock.patch("groundsim.mse.sys_obdh.get_system_time", return_value=1606595176000):
+            for item in filenames:
+                for log_level in [1, 2]:
+                    optimized = self.run_script_file(item, VM_EXEC_INTERPRET, log_level)
+                    with mock.patch("groundsim.mse.sys_obdh.get_optimized_task", return_value=None):
+                        interpreted = self.run_script_file(item, VM_EXEC_INTERPRET, log_level)
+                    assert(interpreted == optimized)
+        assert(get_optimized_task(load_user_task(init_vm(create_vm()), self.test_program)["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]) is not None)
+
+    def test_load_object(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, assemble_object(self.test_program))
+        expected_vm = load_user_task(init_vm(create_vm()), self.test_program)
+        assert(self.test_vm == expected_vm)
+        self.test_vm = {}
+
+    def test_task_verifier(self):
+        bad_program = [
+            "1,1,10,5",
+            "OP_LEA, FREG_A, 1, 1",
+            "OP_FMA, FREG_A, IREG_B, FREG_C",
+            "OP_GET, INST_IMG, P_IMG_STATUS, FREG_A",
+            "OP_LEA, FREG_B, 1, 3",
+            "OP_HLT",
+            "-1.0f"
+        ]
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        assert(get_task_diagnostics(self.test_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]) == ())
+        # errors are logged by default, the task is still loaded
+        self.test_vm = load_user_task(self.test_vm, bad_program)
+        task = self.test_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]
+        assert([x[0:2] for x in get_task_diagnostics(task)] == [(2, 2), (3, 2), (4, 2), (1, 2)])
+        assert(get_optimized_task(task) is None)
+        assert(len(self.test_vm["VBUS"]["INST_LOGS"]["OUT"]) == 4)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"][0].startswith("1:1:WARNING - instruction 2:"))
+        # or rejected before anything is loaded
+        test_vm = init_vm(create_vm())
+        test_vm["VFLAGS"]["VM_VERIFY"] = VM_VERIFY_REJECT
+        with self.assertRaises(Exception):
+            load_user_task(test_vm, bad_program)
+        assert(test_vm["VRAM"]["PROGRAM_CODE_MEMORY"] == {})
+        self.test_vm = {}
+
+    # p_lanes VMs ticked together, each with its own FPU input as in run_script_file
+    def run_script_batch(self, p_filename, p_log_level, p_lanes):
+        f = open(p_filename, "r")
+        line_data = f.read().split("\n")[:-1]
+        test_vms = []
+        for lane in range(0, p_lanes):
+            test_vm = init_vm(create_vm())
+            test_vm["VFLAGS"]["VM_LOG_LEVEL"] = p_log_level
+            try:
+                test_vms.append(load_user_task(test_vm, line_data))
+            except Exception as e:
+                return [type(e)] * p_lanes
+        results = [None] * p_lanes
+        for i in range (0,20):
+            running = [x for x in range(0, p_lanes) if results[x] is None]
+            for lane in running:
+                test_vms[lane]["VCPU"]["FPU_REGISTERS"][0] = i * 0.25 + lane * 0.5
+            errors = run_sheduled_tasks_batch([test_vms[x] for x in running])
+            for lane, error in zip(running, errors):
+                if error is not None:
+                    results[lane] = type(error)
+        for lane in range(0, p_lanes):
+            if results[lane] is None:
+                test_vms[lane]["VFLAGS"]["VM_EXEC_MODE"] = None
+                results[lane] = test_vms[lane]
+        return results
+
+    # batched VMs must end exactly as VMs run one by one
+    def test_batch_execution(self):
+        filenames = sorted(glob.glob(SITE_ROOT + "/data/*.splc"))
+        with mock.patch("groundsim.mse.sys_obdh.get_system_time", return_value=1606595176000):
+            for item in filenames:
+                for log_level in [0, 1]:
+                    expected = [self.run_script_file(item, VM_EXEC_INTERPRET, log_level, x) for x in range(0, 16)]
+                    assert(self.run_script_batch(item, log_level, 16) == expected)
+
+    def test_vm_state_round_trip(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, self.test_program2)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        self.test_vm = run_sheduled_tasks(self.test_vm)
+        expected_vm = run_sheduled_tasks(copy.deepcopy(self.test_vm))
+        restored_vm = import_vm_state(json.loads(json.dumps(export_vm_state(self.test_vm))))
+        assert(restored_vm == self.test_vm)
+        assert(list(restored_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1].keys()) == [2, 1])
+        assert(run_sheduled_tasks(restored_vm) == expected_vm)
+        # VMs serialized as plain JSON get their int keys back
+        legacy_vm = import_vm_state(json.loads(json.dumps(self.test_vm)))
+        assert(legacy_vm == self.test_vm)
+        with self.assertRaises(ValueError):
+            import_vm_state({"STATE_VERSION": 99})
+        self.test_vm = {}
+
+    def test_vm_profile(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        expected_vm = copy.deepcopy(self.test_vm)
+        self.test_vm = set_vm_profiling(self.test_vm, True)
+        for i in range(0, 20):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+            expected_vm = run_sheduled_tasks(expected_vm)
+        profile = get_vm_profile(self.test_vm)
+        assert(profile["ticks"] == 20)
+        assert(profile["tasks"][0]["task"] == "1:1" and profile["tasks"][0]["runs"] == 2)
+        assert(profile["instructions"] == 14)
+        assert(profile["opcodes"]["LEA"] == 6 and profile["opcodes"]["HLT"] == 2)
+        assert(profile["tasks_running"] == ["1:1"] and profile["cpu_load"] == 0.7)
+        # profiled tasks leave the VM as vm_execute does
+        self.test_vm["VRAM"].pop("VM_PROFILE")
+        self.test_vm["VFLAGS"]["VM_PROFILE"] = 0
+        assert(self.test_vm == expected_vm)
+        assert("VM_PROFILE" not in expected_vm["VRAM"])
+        self.test_vm = {}
+
+    # NOP changes nothing, an undecodable opcode ends the task
+    def test_nop_and_unknown_opcodes(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, ["1,1,10,8", "OP_NOP"] + self.test_program[1:])
+        task = self.test_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]
+        self.test_vm = vm_interpret(self.test_vm, task)
+        assert(self.test_vm["VRAM"]["TASK_CONTEXT_STATUS"][1][1] == 0xFF)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == ["1:1:3.0"])
+        task[1] = 0x10000000
+        self.test_vm = vm_interpret(self.test_vm, task)
+        assert(self.test_vm["VRAM"]["TASK_CONTEXT_STATUS"][1][1] == 0x3F)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"][1:] == ["1:1:ERROR - Undecodable opcode!"])
+        self.test_vm = {}
+
+    # sliced tasks may start with a NOP
+    def test_tick_budget_nop_first(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, ["1,1,10,8", "OP_NOP"] + self.test_program[1:])
+        self.test_vm["VFLAGS"]["VM_TICK_BUDGET"] = 1
+        for i in range(0, 17):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(self.test_vm["VRAM"]["TASK_CONTEXT_STATUS"][1][1] == 0xFF)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == ["1:1:3.0"])
+        assert(self.test_vm["VRAM"]["BUDGET_OVERRUNS"] == 7)
+        self.test_vm = {}
+
+    # runs the task once through one of the execution paths
+    def run_execution_path(self, p_path, p_splice_vm, p_task):
+        if p_path == "interpret":
+            return vm_interpret(p_splice_vm, p_task)
+        if p_path == "slice":
+            ip = 1
+            while True:
+                p_splice_vm, ip, executed = vm_interpret_slice(p_splice_vm, p_task, ip, 1, {})
+                if ip == 0:
+                    return p_splice_vm
+        if p_path == "compiled":
+            p_splice_vm["VFLAGS"]["VM_EXEC_MODE"] = VM_EXEC_COMPILE
+            p_splice_vm = vm_execute(p_splice_vm, p_task)
+            p_splice_vm["VFLAGS"]["VM_EXEC_MODE"] = VM_EXEC_INTERPRET
+            return p_splice_vm
+        if p_path == "optimized":
+            return vm_execute(p_splice_vm, p_task)
+        splice_vms = [copy.deepcopy(p_splice_vm) for i in range(0, VM_BATCH_MIN_LANES)]
+        tasks = [x["VRAM"]["PROGRAM_CODE_MEMORY"][p_task[0] >> 24][(p_task[0] >> 16) & 0xFF] for x in splice_vms]
+        assert(vm_execute_batch(splice_vms, tasks) == [None] * VM_BATCH_MIN_LANES)
+        assert(all([x == splice_vms[0] for x in splice_vms]))
+        return splice_vms[0]
+
+    # every execution path runs a task to the same VM state
+    def test_execution_paths(self):
+        programs = [
+            self.test_program,
+            ["1,1,10,11"] + [x.replace(", 2, ", ", 1, ") for x in self.test_program2[1:]],
+            ["1,1,10,8", "OP_NOP"] + self.test_program[1:],
+            ["1,1,10,5", "OP_LEA, FREG_A, 1, 1", "OP_LEA, FREG_B, 1, 2", "OP_CMP, FPU_GT, FREG_A, FREG_B", "OP_STR, PRE_STR_FPU, FREG_A", "OP_HLT", "1.0f", "2.0f"],
+            ["1,1,10,3", "OP_GET, INST_FPU, P_FPU_PIE, FREG_A", "OP_FMA, IREG_A, FREG_A, FREG_B", "OP_HLT"],
+            ["1,1,10,6", "OP_LEA, IREG_A, 1, 1", "OP_LEA, IREG_B, 1, 2", "OP_NOR, IREG_A, IREG_B, IREG_C", "OP_CMP, ALU_GT, IREG_B, IREG_A", "OP_STR, PRE_STR_BIN, IREG_C", "OP_HLT", "5i", "9i"],
+            ["1,1,10,5", "OP_GET, INST_FPU, P_FPU_PIE, FREG_A", "OP_GET, INST_FPU, P_FPU_EXP, FREG_B", "OP_POW, PRE_NORMAL, FREG_A, FREG_B", "OP_STR, PRE_STR_FPU, FREG_B", "OP_HLT"],
+            ["1,1,10,0", "OP_GET, INST_FPU, P_FPU_ONE, FREG_A", "OP_STR, PRE_STR_FPU, FREG_A"],
+        ]
+        # the second instruction is undecodable
+        programs.append(list(self.test_program))
+        for level in [0, DEFAULT_VM_LOG_LEVEL]:
+            statuses = []
+            for i in range(0, len(programs)):
+                splice_vm = load_user_task(init_vm(create_vm()), programs[i])
+                splice_vm["VFLAGS"]["VM_LOG_LEVEL"] = level
+                if i == len(programs) - 1:
+                    splice_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1][2] = 0x10000000
+                expected = None
+                for path in ["interpret", "slice", "compiled", "optimized", "batch"]:
+                    with self.subTest(level=level, program=i, path=path):
+                        result = copy.deepcopy(splice_vm)
+                        result = self.run_execution_path(path, result, result["VRAM"]["PROGRAM_CODE_MEMORY"][1][1])
+                        if expected is None:
+                            expected = result
+                        self.assertEqual(result, expected)
+                statuses.append(expected["VRAM"]["TASK_CONTEXT_STATUS"][1][1])
+            assert(statuses == [0xFF, 0xFF, 0xFF, 0x7F, 0x3F, 0xFF, 0xFF, 0x1F, 0x3F])
+
+    def test_tick_budget(self):
+        self.test_vm = init_vm(self.test_vm)
+        long_program = ["1,1,10,16"] + self.test_program[1:4]
+        for i in range(0, 6):
+            long_program = long_program + ["OP_FMA, FREG_A, FREG_B, FREG_C", "OP_STR, PRE_STR_FPU, FREG_C"]
+        long_program = long_program + ["OP_HLT", "1.0f", "2.0f", "1.0f"]
+        self.test_vm = load_user_task(self.test_vm, long_program)
+        expected_vm = copy.deepcopy(self.test_vm)
+        self.test_vm["VFLAGS"]["VM_TICK_BUDGET"] = 5
+        for i in range(0, 10):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+            expected_vm = run_sheduled_tasks(expected_vm)
+        assert(self.test_vm["VRAM"]["TASK_CONTEXT_STATUS"][1][1] == 0x0F)
+        assert(self.test_vm["VRAM"]["TASK_RESUME"][0:3] == [1, 1, 6])
+        assert(len(self.test_vm["VBUS"]["INST_LOGS"]["OUT"]) == 1)
+        # the task finishes 3 ticks later, as if it had run in one go
+        for i in range(0, 4):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+            expected_vm = run_sheduled_tasks(expected_vm)
+        assert(self.test_vm["VRAM"]["BUDGET_OVERRUNS"] == 3)
+        self.test_vm["VRAM"]["BUDGET_OVERRUNS"] = 0
+        self.test_vm["VFLAGS"]["VM_TICK_BUDGET"] = DEFAULT_VM_TICK_BUDGET
+        assert(self.test_vm == expected_vm)
+        assert(len(expected_vm["VBUS"]["INST_LOGS"]["OUT"]) == 6)
+        self.test_vm = {}
+
+    # a budget used up exactly leaves the next task due, not suspended
+    def test_tick_budget_used_up(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        self.test_vm = load_user_task(self.test_vm, ["1,2,10,7"] + self.test_program[1:])
+        task = self.test_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]
+        self.test_vm["VFLAGS"]["VM_TICK_BUDGET"] = len(task) - 1
+        for i in range(0, 10):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == ["1:1:3.0"])
+        assert(self.test_vm["VRAM"]["TASK_RESUME"] is None)
+        assert(self.test_vm["VRAM"]["BUDGET_OVERRUNS"] == 0)
+        self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"] == ["1:1:3.0", "1:2:7.0"])
+        assert(self.test_vm["VRAM"]["BUDGET_OVERRUNS"] == 0)
+        self.test_vm = {}
+
+    def test_vm_log_ring(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, ["1,1,10,3", "OP_LEA, FREG_A, 1, 1", "OP_STR, PRE_STR_FPU, FREG_A", "OP_HLT", "2.0f"])
+        task = self.test_vm["VRAM"]["PROGRAM_CODE_MEMORY"][1][1]
+        self.test_vm = vm_execute(self.test_vm, task)
+        self.test_vm, messages, dropped = drain_vm_log(self.test_vm)
+        assert(messages == ["1:1:2.0"] and dropped == 0)
+        for i in range(0, VM_LOG_CAPACITY + 9):
+            self.test_vm = vm_execute(self.test_vm, task)
+        self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(len(self.test_vm["VBUS"]["INST_LOGS"]["OUT"]) == VM_LOG_CAPACITY)
+        self.test_vm, messages, dropped = drain_vm_log(self.test_vm)
+        assert(len(messages) == VM_LOG_CAPACITY and dropped == 9)
+        # messages are only formatted at a level that keeps them
+        self.test_vm["VFLAGS"]["VM_LOG_LEVEL"] = 2
+        self.test_vm = vm_execute(self.test_vm, task)
+        self.test_vm, messages, dropped = drain_vm_log(self.test_vm)
+        assert(messages == [] and dropped == 0)
+        self.test_vm = {}
+
+    def test_scheduler_due_tasks(self):
+        self.test_vm = init_vm(self.test_vm)
+        hourly_program = list(self.test_program)
+        for i in range(0, 30):
+            hourly_program[0] = "2,%i,120,7" % (i + 1)
+            self.test_vm = load_user_task(self.test_vm, hourly_program)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(self.test_vm["VRAM"]["TASK_CONTEXT_STATUS"][2][1] == 0x7F)
+        # the 2 hour tasks stay queued behind the 10 second task
+        for i in range(0, 100):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+        schedule = self.test_vm["VRAM"]["TASK_SCHEDULE"]
+        assert(len(schedule) == 31)
+        assert(schedule[0][2:] == [1, 1] and schedule[0][0] <= 111)
+        assert(min([x[0] for x in schedule if x[2] == 2]) == 7200)
+        self.test_vm = {}
+
+    # a task raising must not drop the due tasks from the schedule
+    def test_scheduler_task_error(self):
+        self.test_vm = init_vm(self.test_vm)
+        self.test_vm = start_vm(self.test_vm)
+        self.test_vm = load_user_task(self.test_vm, self.test_program)
+        self.test_vm = load_user_task(self.test_vm, self.test_program2)
+        with mock.patch("groundsim.mse.sys_obdh.vm_execute", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                for i in range(0, 10):
+                    self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(len(self.test_vm["VRAM"]["TASK_SCHEDULE"]) == 2)
+        for i in range(0, 20):
+            self.test_vm = run_sheduled_tasks(self.test_vm)
+        assert(self.test_vm["VBUS"]["INST_LOGS"]["OUT"][0:2] == ["1:1:3.0", "1:2:99.0"])
+        self.test_vm = {}
@@ -33,9 +33,16 @@ urlpatterns = [
     # MSE (Tier 2) API mission selection
     path('mse_mission_list', views.ListMissions.as_view()),
     path('mse_mission_details', views.GetMissionDetails.as_view()),
+    path('mse_mission_logs/', views.GetMissionLog.as_view()),
     path('mse_init/', views.InitializeHandler.as_view()),
     path('mse_step/', views.SimulationController.as_view()),
+    path('mse_step_stream/', views.StreamingSimulationController.as_view()),
+    path('mse_step_batch/', views.BatchSimulationController.as_view()),
     path('mse_reset/', views.ResetController.as_view()),
     path('mse_save/', views.SaveController.as_view()),
     path('mse_action/', views.ActionController.as_view()),
+    path('mse_telemetry/', views.TelemetryController.as_view()),
+    path('mse_orbit_track/', views.OrbitTrackController.as_view()),
+    path('mse_vm_log/', views.VMLogController.as_view()),
+    path('mse_vm_profile/', views.VMProfileController.as_view()),
 ]
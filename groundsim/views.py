@@ -1,25 +1,49 @@
+import io
+import asyncio
+import csv
 import json
+import zlib
+import copy
 import julian
 from math import floor, fmod, pi, atan, sqrt, sin, fabs, cos, atan2, trunc
 from datetime import datetime, timezone, timedelta
 from sgp4.earth_gravity import wgs72, wgs84
 from sgp4.io import twoline2rv
+from django.conf import settings
 from django.views.generic import View
-from django.http import HttpResponse, HttpResponseNotFound
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotFound, StreamingHttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from groundsim.models import Satellite, MissionScenario
+from django.views.decorators.http import condition
+from groundsim.models import Satellite, MissionScenario, MissionInstance
+from groundsim.mse.lib_codec import get_codec, negotiate_codec
+from groundsim.executor import SimulationPool, PoolSaturated
+from groundsim.mse.core_cat import CatalogCache
+from groundsim.mse.sys_obdh import LOG_LEVEL_DEBUG, LOG_LEVEL_INFO, LOG_LEVEL_ERROR
 from groundsim.mse.core_api import (
     create_mission_instance,
     simulate_mission_steps,
+    simulate_mission_batch,
     get_satellite_list,
     update_satellite,
     save_mission,
     load_mission,
+    import_posted_mission,
     get_mission_logs,
+    export_mission_logs,
+    decode_log_cursor,
+    LOG_PAGE_SIZE,
     execute_mission_action,
     get_instrument_list,
-    get_target_passes
+    get_target_passes,
+    get_telemetry_history,
+    get_orbit_track,
+    get_mission_profile,
+    set_mission_log_level,
+    get_step_response,
+    stream_mission_steps,
+    SessionStore
 )
 
 def none_is_zero(obj):
@@ -28,6 +52,145 @@ def none_is_zero(obj):
     else:
         return obj
 
+# raised for request bodies that cannot be decoded, answered with a 400
+class MalformedRequest(ValueError):
+    pass
+
+# Form posts carry the mission as JSON text, codec posts carry all fields in
+# the body. Posted missions are imported once here.
+def get_request_data(request):
+    codec = get_codec(request.content_type)
+    try:
+        if codec is None:
+            request_data = request.POST.dict()
+            for key in ["mission_instance", "missions"]:
+                if key in request_data:
+                    request_data[key] = json.loads(request_data[key])
+        else:
+            request_data = codec["decode"](request.body)
+    except (OSError, EOFError, zlib.error, ValueError, IndexError) as error:
+        raise MalformedRequest("Malformed request body: %s" % error)
+    if not isinstance(request_data, dict):
+        raise MalformedRequest("Malformed request body: not an object")
+    if "mission_instance" in request_data:
+        request_data["mission_instance"] = import_posted_mission(request_data["mission_instance"])
+    if isinstance(request_data.get("missions", None), list):
+        for item in request_data["missions"]:
+            if isinstance(item, dict) and "mission_instance" in item:
+                item["mission_instance"] = import_posted_mission(item["mission_instance"])
+    return request_data
+
+# plain JSON text unless the client accepts one of the codec media types
+def encode_response(request, p_data):
+    content_type, codec = negotiate_codec(request.headers.get("Accept", None))
+    if codec is None:
+        return HttpResponse(json.dumps(p_data))
+    return HttpResponse(codec["encode"](p_data), content_type=content_type)
+
+def get_mission_id(request, p_request_data):
+    return request.GET.get("mission_id", p_request_data.get("mission_id", None))
+
+def get_step_result(p_mission, p_steps, p_since, p_base):
+    p_mission = simulate_mission_steps(p_mission, p_steps)
+    return format_step_result(p_mission, p_since, p_base)
+
+def format_step_result(p_mission, p_since, p_base):
+    if p_since is not None:
+        return get_step_response(p_base, p_mission, int(p_since))
+    return {"status":"ok", "mission_instance":p_mission}
+
+# entries are {"mission_id"} or {"mission_instance"}, each with an optional "since"
+def get_batch_results(p_entries, p_missions, p_steps):
+    results = [None]*len(p_entries)
+    batch = []
+    for i in range(0, len(p_entries)):
+        if p_missions[i] is None:
+            results[i] = {"status":"error", "description":"Satellite mission not initialized"}
+        elif any(p_missions[i] is x[1] for x in batch):
+            results[i] = {"status":"error", "description":"Mission appears twice in batch"}
+        else:
+            since = p_entries[i].get("since", None)
+            base = copy.deepcopy(p_missions[i]) if since is not None else None
+            batch.append([i, p_missions[i], since, base])
+    stepped = simulate_mission_batch([x[1] for x in batch], p_steps)
+    for i in range(0, len(batch)):
+        if isinstance(stepped[i], Exception):
+            results[batch[i][0]] = {"status":"error", "description":"%s: %s" % (type(stepped[i]).__name__, stepped[i])}
+        else:
+            results[batch[i][0]] = format_step_result(stepped[i], batch[i][2], batch[i][3])
+    return {"status":"ok", "results":results}
+
+# Server-side missions are streamed from a snapshot, so their lock is not held
+# while frames are sent. The stepped snapshot is stored at the end unless the
+# mission was stepped by another request meanwhile.
+def stream_session_steps(p_mission_id, p_steps, p_interval):
+    with SessionStore.checkout(p_mission_id) as mission_instance:
+        snapshot = copy.deepcopy(mission_instance)
+    if snapshot is None:
+        yield {"type":"error", "description":"Satellite mission not initialized"}
+        return
+    version = snapshot["environment"].get("step_version", 0)
+    for frame in stream_mission_steps(snapshot, p_steps, p_interval, False):
+        if frame["type"] == "end":
+            with SessionStore.checkout(p_mission_id) as mission_instance:
+                stored = mission_instance is not None and mission_instance["environment"].get("step_version", 0) == version
+                if stored:
+                    mission_instance.clear()
+                    mission_instance.update(snapshot)
+            if not stored:
+                frame = {"type":"error", "description":"Satellite mission changed during the stream"}
+        yield frame
+
+def format_ndjson_frames(p_frames):
+    for frame in p_frames:
+        yield json.dumps(frame) + "\n"
+
+def format_sse_frames(p_frames):
+    for frame in p_frames:
+        yield "event: %s\ndata: %s\n\n" % (frame["type"], json.dumps(frame))
+
+STREAM_FORMATS = {
+    "ndjson": [format_ndjson_frames, "application/x-ndjson"],
+    "sse": [format_sse_frames, "text/event-stream"],
+}
+
+# Stream frames are computed on the simulation pool when served over ASGI, each
+# frame is admitted like a request and waits while the pool is saturated. When
+# the client goes away, the frame being computed is finished and the frame
+# generator is closed on the pool, since closing it may touch the database.
+async def offload_frames(p_frames):
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(SimulationPool.run(next, p_frames, None))
+            try:
+                frame = await asyncio.shield(pending)
+            except PoolSaturated:
+                await asyncio.sleep(settings.SIMULATION_RETRY_AFTER)
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        if pending is not None and not pending.done():
+            await asyncio.wait([pending])
+        await SimulationPool.run(p_frames.close, p_admit=False)
+
+# Heavy controllers keep synchronous handlers; dispatch runs them on the
+# simulation pool so the server stays free for lightweight views.
+class OffloadedView(View):
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await SimulationPool.run(super().dispatch, request, *args, **kwargs)
+        except PoolSaturated:
+            response = HttpResponse(json.dumps({"status":"error", "description":"Simulation server busy"}), status=503)
+            response["Retry-After"] = settings.SIMULATION_RETRY_AFTER
+            return response
+        except MalformedRequest as error:
+            return HttpResponse(json.dumps({"status":"error", "description":str(error)}), status=400)
+
 def get_mission_list():
     mission_scenarios = MissionScenario.objects.all()
     result = {"status":"ok", "data": []}
@@ -46,30 +209,105 @@ def get_mission_details(p_mission_id):
     }
     return result
 
+# the shared catalog version is read once per request
+def get_catalog_state(request):
+    if not hasattr(request, "catalog_state"):
+        request.catalog_state = CatalogCache.sync()
+    return request.catalog_state
+
+def catalog_etag(request, *args, **kwargs):
+    return CatalogCache.get_version_tag(get_catalog_state(request))
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_catalog_state(request)[1]
+
+# catalog responses are cached per catalog version and revalidated by clients
+def catalog_response(p_key, p_builder):
+    response = HttpResponse(CatalogCache.get_response(p_key, p_builder))
+    response["Cache-Control"] = "no-cache"
+    return response
+
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='get')
 class SatelliteListHandler(View):
     def get(self, request):
-        response = get_satellite_list()
-        return HttpResponse(json.dumps(response))
+        return catalog_response("satellites", lambda: json.dumps(get_satellite_list()))
 
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='get')
 class ListMissions(View):
     def get(self, request):
-        response = get_mission_list()
-        return HttpResponse(json.dumps(response))
+        return catalog_response("missions", lambda: json.dumps(get_mission_list()))
 
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='get')
 class GetMissionDetails(View):
     def get(self, request):
         mission_id = int(request.GET.get("mission_id", none_is_zero(None)))
-        response = get_mission_details(mission_id)
-        return HttpResponse(json.dumps(response))
+        return catalog_response("mission:%i" % mission_id, lambda: json.dumps(get_mission_details(mission_id)))
+
+def parse_utc_date(p_str_date):
+    if p_str_date is None:
+        return None
+    split_date = [int(x) for x in p_str_date.split(',')]
+    return datetime(split_date[0], split_date[1], split_date[2], split_date[3], split_date[4], split_date[5], tzinfo=timezone.utc)
+
+def format_csv_logs(p_chunks):
+    output = io.StringIO()
+    csv.writer(output).writerow(["timestamp", "message"])
+    yield output.getvalue()
+    for records in p_chunks:
+        output = io.StringIO()
+        writer = csv.writer(output)
+        for item in records:
+            writer.writerow([item.timestamp.isoformat(), item.message])
+        yield output.getvalue()
+
+def format_ndjson_logs(p_chunks):
+    for records in p_chunks:
+        yield "".join([json.dumps([x.timestamp.isoformat(), x.message]) + "\n" for x in records])
+
+LOG_EXPORT_FORMATS = {
+    "csv": [format_csv_logs, "text/csv"],
+    "ndjson": [format_ndjson_logs, "application/x-ndjson"],
+}
 
 class GetMissionLog(View):
     def get(self, request):
         hash_id = request.GET.get("hash_id", None)
         if hash_id is None:
-            response = {"status":"ok", "logs":[]}
-        else:
-            response = get_mission_logs(hash_id)
-        return HttpResponse(json.dumps(response))
+            return HttpResponse(json.dumps({"status":"ok", "event_logs":[], "next":None}))
+        # logs are only served for saved missions
+        if not MissionInstance.objects.filter(mission_hash=hash_id).exists():
+            result_data = {"status":"error", "description":"Unknown mission: %s" % hash_id}
+            return HttpResponse(json.dumps(result_data), status=404)
+        try:
+            start = parse_utc_date(request.GET.get("start", None))
+            end = parse_utc_date(request.GET.get("end", None))
+        except (ValueError, IndexError):
+            result_data = {"status":"error", "description":"Invalid date range: %s - %s" % (request.GET.get("start", None), request.GET.get("end", None))}
+            return HttpResponse(json.dumps(result_data), status=400)
+        text = request.GET.get("text", None)
+        export_format = request.GET.get("format", None)
+        if export_format is None:
+            after = request.GET.get("after", None)
+            try:
+                if after is not None:
+                    decode_log_cursor(after)
+            except ValueError:
+                result_data = {"status":"error", "description":"Invalid cursor: %s" % after}
+                return HttpResponse(json.dumps(result_data), status=400)
+            try:
+                limit = int(request.GET.get("limit", LOG_PAGE_SIZE))
+            except ValueError:
+                result_data = {"status":"error", "description":"Invalid limit: %s" % request.GET["limit"]}
+                return HttpResponse(json.dumps(result_data), status=400)
+            response = get_mission_logs(hash_id, start, end, text, after, limit)
+            return HttpResponse(json.dumps(response))
+        if export_format not in LOG_EXPORT_FORMATS:
+            return HttpResponse(json.dumps({"status":"error", "description":"Unknown export format: %s" % export_format}))
+        formatter, content_type = LOG_EXPORT_FORMATS[export_format]
+        chunks = formatter(export_mission_logs(hash_id, start, end, text))
+        if isinstance(request, ASGIRequest):
+            chunks = offload_frames(chunks)
+        return StreamingHttpResponse(chunks, content_type=content_type)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class UpdateSatellite(View):
@@ -78,7 +316,7 @@ class UpdateSatellite(View):
         update_satellite(data)
         return {"id":3, "status":"ok", "description":"satellite update succeeded"}
 
-class InitializeHandler(View):
+class InitializeHandler(OffloadedView):
     def get(self, request):
         hash_id = request.GET.get("hash_id", None)
         scenario_id = int(request.GET.get("mission_id", none_is_zero(None)))
@@ -90,25 +328,43 @@ class InitializeHandler(View):
             split_date = [int(x) for x in str_date.split(',')]
             start_date = datetime(split_date[0], split_date[1], split_date[2], split_date[3],split_date[4],split_date[5])
             mission_instance = create_mission_instance(norad_id, scenario_id, start_date)
-        return HttpResponse(json.dumps({"status":"ok", "mission_instance":mission_instance}))
+        mission_id = SessionStore.put(mission_instance)
+        return encode_response(request, {"status":"ok", "mission_id":mission_id, "mission_instance":mission_instance})
 
+# missions are either held server-side (mission_id) or posted by the client
 @method_decorator(csrf_exempt, name='dispatch')
-class SimulationController(View):
+class SimulationController(OffloadedView):
     def post(self, request):
         step_seconds = int(request.GET.get("steps", none_is_zero(None)))
-        mission_instance = json.loads(request.POST.get("mission_instance"))
+        since = request.GET.get("since", None)
+        request_data = get_request_data(request)
+        mission_id = get_mission_id(request, request_data)
+        if mission_id is not None:
+            with SessionStore.checkout(mission_id) as mission_instance:
+                if mission_instance is None:
+                    return encode_response(request, "Satellite mission not initialized")
+                base_instance = copy.deepcopy(mission_instance) if since is not None else None
+                result_data = get_step_result(mission_instance, step_seconds, since, base_instance)
+                return encode_response(request, result_data)
+        mission_instance = request_data.get("mission_instance", None)
         if mission_instance is None:
-            return HttpResponse(json.dumps("Satellite mission not initialized"))
-        else:
-            mission_instance = simulate_mission_steps(mission_instance, step_seconds)
-        return HttpResponse(json.dumps({"status":"ok", "mission_instance":mission_instance}))
+            return encode_response(request, "Satellite mission not initialized")
+        base_instance = copy.deepcopy(mission_instance) if since is not None else None
+        result_data = get_step_result(mission_instance, step_seconds, since, base_instance)
+        return encode_response(request, result_data)
 
 @method_decorator(csrf_exempt, name='dispatch')
-class ResetController(View):
+class ResetController(OffloadedView):
     def post(self, request):
-        mission_instance = json.loads(request.POST.get("mission_instance"))
+        request_data = get_request_data(request)
+        mission_id = get_mission_id(request, request_data)
+        if mission_id is not None:
+            mission_instance = SessionStore.get(mission_id)
+            SessionStore.discard(mission_id)
+        else:
+            mission_instance = request_data.get("mission_instance", None)
         if mission_instance is None:
-            return HttpResponse(json.dumps("Satellite mission not initialized"))
+            return encode_response(request, "Satellite mission not initialized")
         else:
             norad_id = mission_instance["environment"]["norad_id"]
             scenario_id = mission_instance["scenario"]["scenario_id"]
@@ -121,37 +377,164 @@ class ResetController(View):
                 mission_instance["environment"]["start_date"]["sec"]
             )
             mission_instance = create_mission_instance(norad_id, scenario_id, start_date)
-        return HttpResponse(json.dumps({"status":"ok", "mission_instance":mission_instance}))
+        mission_id = SessionStore.put(mission_instance)
+        return encode_response(request, {"status":"ok", "mission_id":mission_id, "mission_instance":mission_instance})
 
 @method_decorator(csrf_exempt, name='dispatch')
-class SaveController(View):
+class SaveController(OffloadedView):
     def post(self, request):
-        mission_instance_str = request.POST.get("mission_instance",None)
-        user = request.POST.get("user", None)
-        email = request.POST.get("email", None)
-        if mission_instance_str is None:
-            return HttpResponse(json.dumps("Satellite mission data not found"))
+        request_data = get_request_data(request)
+        user = request_data.get("user", None)
+        email = request_data.get("email", None)
+        mission_id = get_mission_id(request, request_data)
+        if mission_id is not None:
+            with SessionStore.checkout(mission_id) as mission_instance:
+                if mission_instance is None:
+                    return encode_response(request, "Satellite mission data not found")
+                result_data = save_mission(mission_instance, user, email, True)
+                return encode_response(request, result_data)
+        mission_instance = request_data.get("mission_instance", None)
+        if mission_instance is None:
+            return encode_response(request, "Satellite mission data not found")
         else:
-            mission_instance = json.loads(mission_instance_str)
             result_data = save_mission(mission_instance, user, email)
-        return HttpResponse(json.dumps(result_data))
+        return encode_response(request, result_data)
 
-class ActionController(View):
+class ActionController(OffloadedView):
     def post(self, request):
-        mission_instance_str = request.POST.get("mission_instance",None)
-        action_type = request.POST.get("action_type", None)
-        if mission_instance_str is None:
-            return HttpResponse(json.dumps("Satellite mission data not found"))
+        request_data = get_request_data(request)
+        action_type = request_data.get("action_type", None)
+        mission_id = get_mission_id(request, request_data)
+        if mission_id is not None:
+            with SessionStore.checkout(mission_id) as mission_instance:
+                if mission_instance is None:
+                    return encode_response(request, "Satellite mission not initialized")
+                result_data = execute_mission_action(mission_instance, action_type)
+                return encode_response(request, result_data)
+        mission_instance = request_data.get("mission_instance", None)
+        if mission_instance is None:
+            return encode_response(request, "Satellite mission data not found")
         else:
-            mission_instance = json.loads(mission_instance_str)
             result_data = execute_mission_action(mission_instance, action_type)
+        return encode_response(request, result_data)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchSimulationController(OffloadedView):
+    def post(self, request):
+        step_seconds = int(request.GET.get("steps", none_is_zero(None)))
+        entries = get_request_data(request).get("missions", None)
+        if entries is None:
+            return encode_response(request, "Satellite missions not found")
+        mission_ids = [x["mission_id"] for x in entries if "mission_id" in x]
+        with SessionStore.checkout_many(mission_ids) as session_missions:
+            missions = []
+            for item in entries:
+                if "mission_id" in item:
+                    missions.append(session_missions[mission_ids.index(item["mission_id"])])
+                else:
+                    missions.append(item.get("mission_instance", None))
+            return encode_response(request, get_batch_results(entries, missions, step_seconds))
+
+@method_decorator(csrf_exempt, name='dispatch')
+class StreamingSimulationController(OffloadedView):
+    def post(self, request):
+        step_seconds = int(request.GET.get("steps", none_is_zero(None)))
+        interval = max(1, int(request.GET.get("interval", 10)))
+        stream_format = request.GET.get("format", "ndjson")
+        if stream_format not in STREAM_FORMATS:
+            return HttpResponse(json.dumps({"status":"error", "description":"Unknown stream format: %s" % stream_format}))
+        request_data = get_request_data(request)
+        mission_id = get_mission_id(request, request_data)
+        if mission_id is not None:
+            frames = stream_session_steps(mission_id, step_seconds, interval)
+        else:
+            mission_instance = request_data.get("mission_instance", None)
+            if mission_instance is None:
+                return HttpResponse(json.dumps("Satellite mission not initialized"))
+            frames = stream_mission_steps(mission_instance, step_seconds, interval)
+        formatter, content_type = STREAM_FORMATS[stream_format]
+        if isinstance(request, ASGIRequest):
+            response = StreamingHttpResponse(offload_frames(formatter(frames)), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(formatter(frames), content_type=content_type)
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+class TelemetryController(OffloadedView):
+    def get(self, request):
+        mission_id = request.GET.get("mission_id", None)
+        if mission_id is None:
+            return HttpResponse(json.dumps("Satellite mission not initialized"))
+        method = request.GET.get("method", "lttb")
+        channels = request.GET.get("channels", None)
+        if channels is not None:
+            channels = channels.split(",")
+        try:
+            start = int(request.GET.get("start", 0))
+            end = int(request.GET.get("end", 86400))
+            points = int(request.GET.get("points", 500))
+            result_data = get_telemetry_history(mission_id, start, end, points, method, channels)
+        except ValueError as e:
+            result_data = {"status":"error", "description":str(e)}
+            return HttpResponse(json.dumps(result_data), status=400)
         return HttpResponse(json.dumps(result_data))
 
+class OrbitTrackController(OffloadedView):
+    def get(self, request):
+        norad_id = int(request.GET.get("norad_id", none_is_zero(None)))
+        start = parse_utc_date(request.GET.get("start", None))
+        end = parse_utc_date(request.GET.get("end", None))
+        if start is None or end is None:
+            return HttpResponse(json.dumps({"status":"error", "description":"start and end dates are required"}))
+        points = int(request.GET.get("points", 1000))
+        return HttpResponse(json.dumps(get_orbit_track(norad_id, start, end, points)))
+
+# e.g. level=0 turns on per-instruction debug messages for one mission
+VM_LOG_LEVELS = {str(x):x for x in [LOG_LEVEL_DEBUG, LOG_LEVEL_INFO, LOG_LEVEL_ERROR]}
+
+# debug endpoint, served only when settings.VM_LOG_ENDPOINT is set. The log
+# level is only changed when level is given.
+class VMLogController(View):
+    def get(self, request):
+        if not settings.VM_LOG_ENDPOINT:
+            return HttpResponseNotFound()
+        mission_id = request.GET.get("mission_id", None)
+        if mission_id is None:
+            return HttpResponse(json.dumps("Satellite mission not initialized"))
+        level = request.GET.get("level", None)
+        if level is not None:
+            if level not in VM_LOG_LEVELS:
+                result_data = {"status":"error", "description":"Unknown log level: %s" % level}
+                return HttpResponse(json.dumps(result_data), status=400)
+            level = VM_LOG_LEVELS[level]
+        with SessionStore.checkout(mission_id) as mission_instance:
+            if mission_instance is None:
+                return HttpResponse(json.dumps("Satellite mission not initialized"))
+            return HttpResponse(json.dumps(set_mission_log_level(mission_instance, level)))
+
+# debug endpoint, served only when settings.VM_PROFILE_ENDPOINT is set
+class VMProfileController(View):
+    def get(self, request):
+        if not settings.VM_PROFILE_ENDPOINT:
+            return HttpResponseNotFound()
+        mission_id = request.GET.get("mission_id", None)
+        if mission_id is None:
+            return HttpResponse(json.dumps("Satellite mission not initialized"))
+        enabled = request.GET.get("enable", None)
+        if enabled is not None:
+            enabled = enabled == "1"
+        reset = request.GET.get("reset", "0") == "1"
+        with SessionStore.checkout(mission_id) as mission_instance:
+            if mission_instance is None:
+                return HttpResponse(json.dumps("Satellite mission not initialized"))
+            return HttpResponse(json.dumps(get_mission_profile(mission_instance, enabled, reset)))
+
 #Tier 1 API controllers
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='get')
 class InstrumentListController(View):
     def get(self, request):
-        result_data = get_instrument_list()
-        return HttpResponse(json.dumps(result_data))
+        return catalog_response("instruments", lambda: json.dumps(get_instrument_list()))
 
 class SchedulerController(View):
     def get(self, request):